@@ -0,0 +1,219 @@
+"""
+This module benchmarks the restaurant catalog and the storage backends
+without a display.
+
+usage: python benchmark.py [-s SCALES] [-o OUTPUT] [-c PREVIOUS] [-t THRESHOLD]
+
+Each scale is a number of restaurant locations, 10 / 1k / 100k / 1m, and
+its catalog comes from synthetic.py with a fixed seed, so runs on the same
+scale time the same data. The GUI handlers are timed through the catalog
+calls they make: load_database loads the catalog from the shelve,
+search_restaurant types a query one letter at a time and clears it, and
+calculate_distances sets the customer location and sorts by distance.
+Shelve and SQLite reads and writes are timed on their own.
+
+The shelve record format is compared with the one before it, the plain
+dataclasses pickled whole: bytes per record, the time to decode every
+record and the memory each decoded restaurant takes.
+
+The results are written as JSON. With a previous results file every time
+that got slower by more than the threshold is flagged as a regression and
+the exit status is 1.
+
+Written by Wenbin Wu
+"""
+
+import argparse
+import json
+import os
+import pickle
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime
+from storage import ShelveStorage, SQLiteStorage
+from repository import RestaurantRepository
+from catalog import RestaurantCatalog
+from coordinates import numpy
+from codec import decode, encode_restaurant
+import synthetic
+
+SCALES = {'10': 10, '1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+QUERIES = ('p', 'pi', 'piz', 'pizz', 'pizza', '', 'c', 'cu', 'cur', 'curr', 'curry', '')
+GETS = 100  # random single restaurant reads per backend
+
+
+# ----- the record format before codec.py, the names are a few bytes longer -----
+@dataclass
+class PickledMenu:
+    title : str
+    items : dict
+
+
+@dataclass
+class PickledRestaurant:
+    name : str
+    cuisine : str
+    isfranchise : bool
+    address : list
+    hours : dict
+    menus : list
+
+
+def pickled(restaurant):
+    """return a restaurant as the plain dataclasses the shelve used to pickle"""
+    return PickledRestaurant(
+        restaurant.name, restaurant.cuisine, restaurant.isfranchise, restaurant.address,
+        restaurant.hours, [PickledMenu(menu.title, menu.items) for menu in restaurant.menus]
+        )
+
+
+def timed(function, *args, repeat=1):
+    """return (best time in seconds, result) of calling function repeat times"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def catalog_counts(locations):
+    """return synthetic.generate counts for a number of locations"""
+    restaurants = max(1, locations * 4 // 5)
+    return restaurants, locations, 2 * restaurants, 10 * restaurants
+
+
+def type_queries(catalog):
+    """search the catalog the way a customer types into the search field"""
+    for query in QUERIES:
+        catalog.search(query)
+    return None
+
+
+def locate(catalog):
+    """set the customer location and sort the list by distance"""
+    catalog.set_location((50, 50))
+    catalog.sort(4)
+    return None
+
+
+def decode_all(function, records):
+    """decode every record"""
+    return [function(record) for record in records]
+
+
+def object_bytes(function, records):
+    """return the memory in bytes per decoded object, while every object is alive"""
+    tracemalloc.start()
+    objects = decode_all(function, records)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size / len(objects)
+
+
+def get_many(storage, names):
+    """read restaurants one at a time"""
+    for name in names:
+        storage.get(name)
+    return None
+
+
+def run_scale(locations, folder, seed=0):
+    """run every benchmark on one catalog, return (times, counts)"""
+    times = {}
+    restaurants = list(synthetic.generate(seed, *catalog_counts(locations)))
+    names = random.Random(seed).choices([restaurant.name for restaurant in restaurants], k=GETS)
+    repeat = 3 if locations <= 1_000 else 1
+
+    # ----- record format -----
+    pickles = [pickle.dumps(pickled(restaurant)) for restaurant in restaurants]
+    records = [encode_restaurant(restaurant) for restaurant in restaurants]
+    times['pickle_decode'], _ = timed(decode_all, pickle.loads, pickles, repeat=repeat)
+    times['record_decode'], _ = timed(decode_all, decode, records, repeat=repeat)
+    counts = {
+        'pickle_bytes': sum(map(len, pickles)) / len(pickles),
+        'record_bytes': sum(map(len, records)) / len(records),
+        'pickle_object_bytes': object_bytes(pickle.loads, pickles),
+        'record_object_bytes': object_bytes(decode, records),
+        }
+    del pickles, records
+
+    # ----- storage -----
+    shelve_storage = ShelveStorage(os.path.join(folder, 'restaurants'))
+    times['shelve_write'], _ = timed(shelve_storage.save_many, restaurants)
+    times['shelve_read_all'], _ = timed(shelve_storage.values, repeat=repeat)
+    times['shelve_get'], _ = timed(get_many, shelve_storage, names, repeat=repeat)
+    sqlite_storage = SQLiteStorage(os.path.join(folder, 'restaurants.sqlite3'))
+    times['sqlite_write'], _ = timed(sqlite_storage.save_many, restaurants)
+    times['sqlite_read_all'], _ = timed(sqlite_storage.values, repeat=repeat)
+    times['sqlite_get'], _ = timed(get_many, sqlite_storage, names, repeat=repeat)
+    sqlite_storage.close()
+
+    # ----- customer GUI -----
+    catalog = RestaurantCatalog(RestaurantRepository(os.path.join(folder, 'restaurants')))
+    times['load_database'], _ = timed(catalog.load)
+    times['search_restaurant'], _ = timed(type_queries, catalog, repeat=repeat)
+    times['calculate_distances'], _ = timed(locate, catalog, repeat=repeat)
+    counts.update(restaurants=len(restaurants), rows=len(catalog.rows))
+    return times, counts
+
+
+def compare(previous, current, threshold):
+    """return a message for every time in current that is slower than previous by more than threshold"""
+    regressions = []
+    for scale, results in current['results'].items():
+        for name, seconds in results.items():
+            old = previous['results'].get(scale, {}).get(name)
+            if old and seconds > old * (1 + threshold):
+                regressions.append(f'{scale} {name}: {old:.6f}s -> {seconds:.6f}s (+{seconds / old - 1:.0%})')
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the restaurant catalog without a display.')
+    parser.add_argument('-s', '--scales', default='10,1k', help='comma separated, from 10,1k,100k,1m')
+    parser.add_argument('-o', '--output', default='benchmark.json', help='results file to write')
+    parser.add_argument('-c', '--compare', help='previous results file')
+    parser.add_argument('-t', '--threshold', type=float, default=0.2, help='allowed slowdown, 0.2 is 20%%')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    scales = args.scales.split(',')
+    for scale in scales:
+        if scale not in SCALES:
+            parser.error(f'unknown scale {scale}, use {", ".join(SCALES)}')
+
+    times, counts = {}, {}
+    for scale in scales:
+        with tempfile.TemporaryDirectory() as folder:
+            times[scale], counts[scale] = run_scale(SCALES[scale], folder, args.seed)
+        for name, seconds in times[scale].items():
+            print(f'{scale:>5}  {name:<20} {seconds:.6f}s')
+        for name in ('bytes', 'object_bytes'):
+            before, after = counts[scale][f'pickle_{name}'], counts[scale][f'record_{name}']
+            print(f'{scale:>5}  {name:<20} {before:,.0f} pickled, {after:,.0f} record ({after / before - 1:+.0%})')
+    results = {
+        'suite': 'restaurants',
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': numpy is not None,
+        'results': times,
+        'counts': counts,
+        }
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=2)
+    print(f'results written to {args.output}')
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(json.load(file), results, args.threshold)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
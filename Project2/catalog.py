@@ -0,0 +1,487 @@
+"""
+This module contains the restaurant catalog model behind the customer
+restaurant list.
+
+The catalog holds one row per restaurant address together with the
+spatial, coordinate and search indexes over those rows, and the view:
+the keys of the rows currently shown, in display order. The list control
+only asks the catalog for the text of the rows it draws.
+
+Rows are built from restaurant summaries, so the catalog never holds menu
+items. A search matches names and cuisines in the n-gram index and asks
+the repository for the restaurants with matching menu items. The opening
+hours of every restaurant are kept in an interval index for the open at
+and closing soon filters.
+
+The catalog remembers the database version it was loaded at. Applying
+the changes logged since then replaces only the rows of the restaurants
+that were written or deleted, so catching up with edits made elsewhere
+costs as much as the edits, not as a reload of the whole catalog.
+
+A catalog may be based on a memory-mapped snapshot of the catalog
+exported earlier. Its rows keep their snapshot keys and are read from the
+mapping when drawn, the rows and indexes built in Python hold only the
+restaurants changed since the snapshot, and the snapshot rows of those
+restaurants are hidden. Queries combine the two.
+
+The view is sorted by typed keys, not by the displayed text: names and
+cuisines ignore case, addresses sort by their x, y coordinates, menus by
+the number of menus and distances as numbers. Ties are broken by name.
+The order of every row for a column and direction is a permutation cached
+until the rows or the location change, so sorting the whole list again,
+or reversing it, takes the cached permutation and a filtered view is the
+permutation with the rows it does not show left out.
+
+Queries may run on a background thread, so reads and writes of the rows
+and indexes hold the catalog lock.
+
+Written by Wenbin Wu
+"""
+
+import math
+import threading
+from collections.abc import MutableMapping
+from spatial import GridIndex, parse_address
+from coordinates import CoordinateColumns
+from search import NGramIndex
+from hours import IntervalIndex
+from snapshot import COLUMN_STRINGS
+
+COLUMNS = ('Name', 'Cuisine', 'Address', 'Menus', 'Distance')
+MENU_SEPARATOR = ' | '  # between the menu titles of a row
+SMALL_VIEW = 16  # a view of fewer than 1 / SMALL_VIEW of the rows is sorted by itself
+
+
+def menu_count(menu_titles):
+    """return the number of menus in the menu titles text of a row"""
+    return menu_titles.count(MENU_SEPARATOR) + 1 if menu_titles else 0
+
+
+def sort_keys(keys, names, values, ascending=True):
+    """
+    sort row keys in place by the value of every key, ties by name and then by
+    their order in keys, names and values are lists indexed by row key
+    """
+    if values is not names:
+        keys.sort(key=names.__getitem__)
+    # a sort is stable in both directions, the name order of ties is kept
+    keys.sort(key=values.__getitem__, reverse=not ascending)
+    return None
+
+
+class SnapshotRows(MutableMapping):
+    """the rows of a snapshot that are not hidden, with the rows added since on top"""
+    def __init__(self, snapshot, hidden_rows):
+        self.snapshot = snapshot
+        self.hidden_rows = hidden_rows
+        self.added = {}  # key: row key, value: row
+
+    def __getitem__(self, key):
+        if key in self.added:
+            return self.added[key]
+        if 0 <= key < len(self.snapshot) and key not in self.hidden_rows:
+            return self.snapshot.row(key)
+        raise KeyError(key)
+
+    def __setitem__(self, key, row):
+        self.added[key] = row
+
+    def __delitem__(self, key):
+        if key in self.added:
+            del self.added[key]
+        elif 0 <= key < len(self.snapshot) and key not in self.hidden_rows:
+            self.hidden_rows.add(key)
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        for key in range(len(self.snapshot)):
+            if key not in self.hidden_rows:
+                yield key
+        yield from self.added
+
+    def __len__(self):
+        return len(self.snapshot) - len(self.hidden_rows) + len(self.added)
+
+
+class RestaurantCatalog:
+    """rows of the customer restaurant list and the indexes over them"""
+    def __init__(self, repository, snapshot=None):
+        self.repository = repository
+        self.snapshot = snapshot  # Snapshot the rows are based on, None to read every row from the repository
+        self.clear()
+        self.version = None  # database version the rows are up to date with, None before loading
+        self.view = []  # row keys currently displayed, in display order
+        self.query = ''
+        self.location = None
+        self.hours_filter = None  # (minute of the week, closing within minutes or None)
+        self.nearest = None  # row key of the location closest to the customer
+        self.sort_column = None
+        self.sort_ascending = True
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.view)
+
+    def clear(self):
+        """empty the rows and the indexes, leaving only the rows of the snapshot"""
+        self.hidden = set()  # snapshot restaurants changed or deleted since the snapshot
+        self.hidden_rows = set()  # snapshot row keys of those restaurants and of deleted addresses
+        if self.snapshot is None:
+            self.rows = {}  # key: row key, value: [name, cuisine, address, menu titles]
+        else:
+            self.rows = SnapshotRows(self.snapshot, self.hidden_rows)
+        self.rows_by_name = {}  # key: restaurant name, value: list of row keys, not in the snapshot
+        self.spatial_index = GridIndex()
+        self.coordinates = CoordinateColumns()
+        self.search_index = NGramIndex()  # key: restaurant name
+        self.hours_index = IntervalIndex()  # key: restaurant name
+        self.next_key = 0 if self.snapshot is None else len(self.snapshot)
+        self.clear_sort_orders()
+        return None
+
+    def clear_sort_orders(self, column=None):
+        """drop the cached sort keys and orders of a column, or of every column"""
+        if column is None:
+            self.sort_values = {}  # key: column, value: sort key of every row, indexed by row key
+            self.sort_orders = {}  # key: (column, ascending), value: every row key in that order
+            return None
+        self.sort_values.pop(column, None)
+        self.sort_orders.pop((column, True), None)
+        self.sort_orders.pop((column, False), None)
+        return None
+
+    def populate(self, cancelled=None):
+        """
+        fill the cleared catalog from its snapshot and the changes since, or from
+        every summary in the repository, return False if cancelled
+        """
+        if self.snapshot is not None:
+            # a snapshot newer than the database was exported from another database
+            if self.snapshot.version <= self.repository.version():
+                self.version = self.snapshot.version
+                if self.apply_changes() is not None:
+                    return True
+            self.snapshot = None  # too old to catch up with, every row is read instead
+            self.clear()
+        # the version is read first, a write in between is applied again later
+        self.version = self.repository.version()
+        for summary in self.repository.summaries():
+            if cancelled and cancelled():
+                return False
+            self.add_rows(summary)
+        return True
+
+    def load(self):
+        """load every restaurant from the snapshot or the repository and rebuild the indexes"""
+        with self.lock:
+            self.clear()
+            self.populate()
+            self.update_view()
+        return None
+
+    def reloaded(self, cancelled=None):
+        """
+        return a new catalog loaded from the repository with the same query,
+        location and sort order, or None if cancelled
+        """
+        catalog = RestaurantCatalog(self.repository, self.snapshot)
+        catalog.copy_settings(self)
+        if not catalog.populate(cancelled):
+            return None
+        catalog.update_view()
+        return catalog
+
+    def copy_settings(self, other):
+        """
+        take the query, location, hours filter and sort order of another catalog,
+        return True if any of them differs from the ones the view was computed with
+        """
+        settings = (other.query, other.location, other.hours_filter, other.sort_column, other.sort_ascending)
+        if settings == (self.query, self.location, self.hours_filter, self.sort_column, self.sort_ascending):
+            return False
+        self.query, _, self.hours_filter, self.sort_column, self.sort_ascending = settings
+        self.set_location(other.location, update=False)
+        return True
+
+    def add_rows(self, summary):
+        """add one row per address of a restaurant summary to the rows and the indexes"""
+        menu_titles = MENU_SEPARATOR.join(summary.menu_titles)
+        with self.lock:
+            self.clear_sort_orders()
+            if self.snapshot is not None:
+                self.hide(summary.name)
+            if summary.address:
+                self.search_index.add(summary.name, summary.name, summary.cuisine)
+                self.hours_index.add(summary.name, summary.hours)
+            for address in summary.address:
+                key = self.next_key
+                self.next_key += 1
+                self.rows[key] = [summary.name, summary.cuisine, address, menu_titles]
+                self.rows_by_name.setdefault(summary.name, []).append(key)
+                x, y = parse_address(address)
+                self.spatial_index.insert(key, x, y)
+                self.coordinates.add(key, x, y)
+        return None
+
+    def remove_rows(self, name, address=None):
+        """remove the rows of a restaurant, or only the row at address"""
+        with self.lock:
+            self.clear_sort_orders()
+            if self.snapshot is not None and name not in self.rows_by_name:
+                self.hide(name, address)
+                return None
+            for key in list(self.rows_by_name.get(name, [])):
+                if address is None or self.rows[key][2] == address:
+                    del self.rows[key]
+                    self.spatial_index.remove(key)
+                    self.coordinates.remove(key)
+                    self.rows_by_name[name].remove(key)
+            if not self.rows_by_name.get(name):
+                self.rows_by_name.pop(name, None)
+                if name in self.search_index:
+                    self.search_index.remove(name)
+                if name in self.hours_index:
+                    self.hours_index.remove(name)
+        return None
+
+    def hide(self, name, address=None):
+        """hide the snapshot rows of a restaurant, or only the row at address"""
+        restaurant = self.snapshot.find(name)
+        if restaurant is None or restaurant in self.hidden:
+            return None
+        keys = self.snapshot.rows_of(restaurant)
+        for key in keys:
+            if address is None or self.snapshot.text(key, 2) == address:
+                self.hidden_rows.add(key)
+        if all(key in self.hidden_rows for key in keys):
+            self.hidden.add(restaurant)
+        return None
+
+    def nearest_rows(self, x, y, k=1):
+        """return up to k (distance, row key) tuples closest to x, y, nearest first"""
+        with self.lock:
+            rows = self.spatial_index.nearest(x, y, k)
+            if self.snapshot is not None:
+                rows = sorted(rows + self.snapshot.nearest(x, y, k, self.hidden_rows))[:k]
+        return rows
+
+    def apply_changes(self):
+        """
+        replace the rows of the restaurants changed since the catalog version, return
+        the number of restaurants changed, or None if the catalog is too far behind
+        the change log and has to be reloaded
+        """
+        return self.patch(self.read_changes())
+
+    def read_changes(self, cancelled=None):
+        """
+        return (version read from, version, changes, summaries of the written
+        restaurants) from the repository without touching the rows, changes is None
+        if the change log no longer reaches back to the catalog version
+        """
+        since = self.version
+        if since is None:
+            return None, None, [], []
+        version, changes = self.repository.changes(since)
+        if not changes:
+            return since, version, changes, []
+        kinds = {name: kind for kind, name in changes}
+        return since, version, changes, self.repository.summaries(
+            [name for name, kind in kinds.items() if kind == 'upsert']
+            )
+
+    def patch(self, read):
+        """
+        apply changes returned by read_changes and drop the rows they removed from
+        the view, return the number of restaurants changed, 0 if the catalog moved
+        on since they were read, or None if it has to be reloaded
+        """
+        since, version, changes, summaries = read
+        if since is None or since != self.version:
+            return 0
+        if changes is None:
+            return None
+        kinds = {name: kind for kind, name in changes}  # the last change of a restaurant wins
+        with self.lock:
+            for name in kinds:
+                self.remove_rows(name)
+            for summary in summaries:
+                self.add_rows(summary)
+            self.version = version
+            if kinds:
+                # the view is recomputed later, until then it must not show removed rows
+                self.view = [key for key in self.view if key in self.rows]
+                if self.nearest is not None and self.nearest not in self.rows:
+                    self.nearest = None
+        return len(kinds)
+
+    def compute_view(self, cancelled=None):
+        """
+        return (view, nearest key) for the current search query, location and
+        sort order without changing the displayed view, or None if cancelled
+        """
+        with self.lock:
+            names = self.search_index.search(self.query)
+            snapshot = self.snapshot
+            # restaurants of the snapshot, found in its own indexes, menu items included
+            restaurants = set() if snapshot is None else snapshot.search(self.query) - self.hidden
+            if self.query and snapshot is not None:
+                # only the restaurants changed since the snapshot have their items read
+                query = self.query.lower()
+                names |= {name for name, _, item, _ in self.repository.menu_items(self.rows_by_name)
+                          if query in item.lower()}
+            elif self.query:
+                # menu items are not loaded into the catalog, the repository indexes them
+                names |= self.rows_by_name.keys() & self.repository.item_search(self.query)
+            if self.hours_filter is not None:
+                minute, within = self.hours_filter
+                if within is None:
+                    names &= self.hours_index.open_at(minute)
+                else:
+                    names &= self.hours_index.closing_within(minute, within)
+                if snapshot is not None:
+                    if within is None:
+                        restaurants &= snapshot.open_at(minute)
+                    else:
+                        restaurants &= snapshot.closing_within(minute, within)
+            if cancelled and cancelled():
+                return None
+            view = [key for name in names for key in self.rows_by_name[name]]
+            for restaurant in restaurants:
+                view += [key for key in snapshot.rows_of(restaurant) if key not in self.hidden_rows]
+            view.sort()
+            nearest = None
+            if self.location is not None:
+                rows = self.nearest_rows(*self.location)
+                if rows:
+                    _, nearest = rows[0]
+            if cancelled and cancelled():
+                return None
+            # there is no distance to sort by without a location
+            if self.sort_column is not None and (self.sort_column != 4 or self.location is not None):
+                view = self.sorted_view(view, self.sort_column, self.sort_ascending)
+        return view, nearest
+
+    # ----- sorting -----
+    def values(self, column):
+        """return the sort key of every row for a column, a list indexed by row key, cached"""
+        values = self.sort_values.get(column)
+        if values is not None:
+            return values
+        values = [None] * self.next_key
+        snapshot = self.snapshot
+        if column == 4:
+            # one pass over the coordinate columns instead of a distance per row
+            if snapshot is not None:
+                # the snapshot keys are numbered from 0, as its coordinate columns
+                values[:len(snapshot)] = snapshot.distances(*self.location)
+            for key, d in zip(self.coordinates.keys, self.coordinates.distances(*self.location)):
+                values[key] = d
+        elif column == 2:
+            if snapshot is not None:
+                values[:len(snapshot)] = zip(snapshot.xs, snapshot.ys)
+            for key in self.coordinates.keys:
+                values[key] = self.coordinates.location(key)
+        else:
+            if snapshot is not None:
+                # the columns other than the address are strings of the restaurant, not of the row
+                strings = [snapshot.string(i) for i in getattr(snapshot, COLUMN_STRINGS[column])]
+                strings = [menu_count(text) if column == 3 else text.casefold() for text in strings]
+                values[:len(snapshot)] = map(strings.__getitem__, snapshot.row_restaurants)
+            for keys in self.rows_by_name.values():
+                for key in keys:
+                    text = self.rows[key][column]
+                    values[key] = menu_count(text) if column == 3 else text.casefold()
+        self.sort_values[column] = values
+        return values
+
+    def sort_order(self, column, ascending):
+        """return every row key sorted by column, cached until the rows change"""
+        order = self.sort_orders.get((column, ascending))
+        if order is None:
+            order = sorted(self.rows)
+            sort_keys(order, self.values(0), self.values(column), ascending)
+            self.sort_orders[column, ascending] = order
+        return order
+
+    def sorted_view(self, view, column, ascending):
+        """return the row keys of view, in key order, sorted by column"""
+        if len(view) * SMALL_VIEW < len(self.rows):
+            # cheaper than a pass over the order of every row
+            sort_keys(view, self.values(0), self.values(column), ascending)
+            return view
+        order = self.sort_order(column, ascending)
+        if len(view) == len(order):
+            return list(order)
+        shown = set(view)
+        return [key for key in order if key in shown]
+
+    def update_view(self):
+        """recompute the displayed rows from the search query, location and sort order"""
+        self.view, self.nearest = self.compute_view()
+        return None
+
+    def search(self, query, update=True):
+        """show only the restaurants matching query"""
+        self.query = query
+        if update:
+            self.update_view()
+        return None
+
+    def set_location(self, location, update=True):
+        """set the customer location used for the distance column"""
+        self.location = location
+        with self.lock:
+            self.clear_sort_orders(4)
+        if update:
+            self.update_view()
+        return None
+
+    def set_hours(self, minute, within=None, update=True):
+        """
+        show only the restaurants open at a minute of the week, and closing within
+        the next within minutes if given, a minute of None shows every restaurant
+        """
+        self.hours_filter = None if minute is None else (minute, within)
+        if update:
+            self.update_view()
+        return None
+
+    def sort(self, column, update=True):
+        """sort the view by column, sorting the same column again reverses the order"""
+        if self.sort_column == column:
+            self.sort_ascending = not self.sort_ascending
+        else:
+            self.sort_column = column
+            self.sort_ascending = True
+        if update:
+            self.update_view()
+        return None
+
+    def distance(self, key):
+        """return the distance from the customer location to a row, None without a location"""
+        if self.location is None:
+            return None
+        if key in self.coordinates:
+            x, y = self.coordinates.location(key)
+        else:
+            x, y = self.snapshot.location(key)
+        return round(math.hypot(x - self.location[0], y - self.location[1]), 2)
+
+    def text(self, key, column):
+        """return the display text for a column of a row"""
+        if column == 4:
+            d = self.distance(key)
+            return '' if d is None else str(d)
+        if self.snapshot is not None and key < len(self.snapshot):
+            return self.snapshot.text(key, column)
+        return self.rows[key][column]
+
+    def key_at(self, position):
+        """return the row key displayed at position"""
+        return self.view[position]
+
+    def row(self, position):
+        """return the row displayed at position"""
+        return self.rows[self.view[position]]
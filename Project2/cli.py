@@ -0,0 +1,191 @@
+"""
+This module is a command line interface for querying the restaurant
+database without the GUI.
+
+usage: python cli.py [-d DATABASE] [--json] [--snapshot] search QUERY [-n LIMIT]
+       python cli.py [-d DATABASE] [--json] [--snapshot] nearest X Y [-k K]
+       python cli.py [-d DATABASE] [--json] [--snapshot] open DAY TIME
+       python cli.py [-d DATABASE] [--json] [--snapshot] show NAME
+       python cli.py [-d DATABASE] [--json] [--snapshot] prices [--low L] [--high H] [--cuisine C] [--item I]
+
+It does not import wx and does not load the catalog, every command is one
+query on the repository. With a SQLite database the search, nearest and
+open queries run inside SQLite, so a command starts and answers in well
+under 100 ms. The shelve backend has to scan every restaurant for them.
+
+With --snapshot the search, nearest and open commands are answered by a
+catalog mapped from the snapshot DATABASE.snapshot exported by snapshot.py,
+with the changes logged since the export applied.
+
+Written by Wenbin Wu
+"""
+
+import argparse
+import json
+import sys
+from repository import RestaurantRepository
+from hours import minute_of_week
+from prices import format_amount
+
+
+def search(repository, args):
+    """return the names of restaurants matching the query"""
+    names = repository.search(args.query)
+    return names[:args.limit] if args.limit else names
+
+
+def nearest(repository, args):
+    """return the k restaurant locations nearest to x, y"""
+    rows = repository.nearest(args.x, args.y, args.k)
+    return [{'distance': round(d, 2), 'name': name, 'address': address} for d, name, address in rows]
+
+
+def open_at(repository, args):
+    """return the names of restaurants open at a day and time"""
+    return repository.open_at(minute_of_week(args.day, args.time))
+
+
+def show(repository, args):
+    """return one restaurant as a dict"""
+    restaurant = repository.get(args.name)
+    return {
+        'name': restaurant.name,
+        'cuisine': restaurant.cuisine,
+        'isfranchise': restaurant.isfranchise,
+        'address': restaurant.address,
+        'hours': restaurant.hours,
+        'menus': {menu.title: menu.items for menu in restaurant.menus},
+        }
+
+
+def prices(repository, args):
+    """return the price stats and the cheapest menu items within a dollar range"""
+    low = round(args.low * 100)
+    high = round(args.high * 100) if args.high is not None else 10 ** 12
+    entries = repository.price_range(low, high, args.cuisine, item=args.item)
+    fields = ('amount', 'restaurant', 'menu', 'item', 'variant')
+    return {
+        'stats': repository.price_stats(args.cuisine, item=args.item),
+        'items': [dict(zip(fields, entry)) for entry in entries[:args.limit or None]],
+        }
+
+
+# ----- commands answered by a catalog over a snapshot -----
+def catalog_search(catalog, args):
+    """return the names of restaurants matching the query"""
+    catalog.search(args.query)
+    names = sorted({catalog.text(key, 0) for key in catalog.view})
+    return names[:args.limit] if args.limit else names
+
+
+def catalog_nearest(catalog, args):
+    """return the k restaurant locations nearest to x, y"""
+    return [
+        {'distance': round(d, 2), 'name': catalog.text(key, 0), 'address': catalog.text(key, 2)}
+        for d, key in catalog.nearest_rows(args.x, args.y, args.k)
+        ]
+
+
+def catalog_open_at(catalog, args):
+    """return the names of restaurants open at a day and time"""
+    catalog.set_hours(minute_of_week(args.day, args.time))
+    return sorted({catalog.text(key, 0) for key in catalog.view})
+
+
+def print_result(command, result):
+    """print the result of a command as text"""
+    if command == 'nearest':
+        for row in result:
+            print(f"{row['distance']:>8}  {row['name']}  ({row['address']})")
+    elif command == 'show':
+        print(f"name: {result['name']}  |  cuisine: {result['cuisine']}  |  address: {result['address']}")
+        for day, hours in result['hours'].items():
+            print(f'\t{day},  {hours}')
+        for title, items in result['menus'].items():
+            print(f'\tMenu: {title}')
+            for item, price in items.items():
+                print(f'\t\t{item}\t{price}')
+    elif command == 'prices':
+        stats = result['stats']
+        if stats['count']:
+            print(
+                f"{stats['count']} prices, min {format_amount(stats['min'])}, "
+                f"median {format_amount(stats['median'])}, max {format_amount(stats['max'])}"
+                )
+        for row in result['items']:
+            variant = f" ({row['variant']})" if row['variant'] else ''
+            print(f"{format_amount(row['amount']):>8}  {row['item']}{variant}  -  {row['restaurant']}, {row['menu']}")
+    else:
+        for name in result:
+            print(name)
+    return None
+
+
+def main(argv=None):
+    """run one command, return the exit status"""
+    parser = argparse.ArgumentParser(description='Query the restaurant database.')
+    parser.add_argument('-d', '--database', default='restaurants', help='database to query')
+    parser.add_argument('--json', action='store_true', help='print the result as JSON')
+    parser.add_argument(
+        '--snapshot', action='store_true',
+        help='answer search, nearest and open from the catalog snapshot DATABASE.snapshot'
+        )
+    commands = parser.add_subparsers(dest='command', required=True)
+    command = commands.add_parser('search', help='restaurants whose name, cuisine or items contain a query')
+    command.add_argument('query')
+    command.add_argument('-n', '--limit', type=int, default=0, help='print at most this many names')
+    command = commands.add_parser('nearest', help='restaurant locations nearest to a point')
+    command.add_argument('x', type=int)
+    command.add_argument('y', type=int)
+    command.add_argument('-k', type=int, default=1, help='number of locations')
+    command = commands.add_parser('open', help='restaurants open at a day and time')
+    command.add_argument('day', help='monday ... sunday')
+    command.add_argument('time', help='a time such as 7:00PM')
+    command = commands.add_parser('show', help='one restaurant with its hours and menus')
+    command.add_argument('name')
+    command = commands.add_parser('prices', help='menu items within a price range, cheapest first')
+    command.add_argument('--low', type=float, default=0, help='lowest price in dollars')
+    command.add_argument('--high', type=float, default=None, help='highest price in dollars')
+    command.add_argument('--cuisine', help='only restaurants of this cuisine')
+    command.add_argument('--item', help='only items with this name')
+    command.add_argument('-n', '--limit', type=int, default=20, help='print at most this many items')
+    args = parser.parse_args(argv)
+
+    handlers = {'search': search, 'nearest': nearest, 'open': open_at, 'show': show, 'prices': prices}
+    catalog_handlers = {'search': catalog_search, 'nearest': catalog_nearest, 'open': catalog_open_at}
+    repository = RestaurantRepository(args.database)
+    try:
+        if args.snapshot and args.command in catalog_handlers:
+            # imported here, the catalog needs numpy if installed and most commands do not
+            from catalog import RestaurantCatalog
+            from snapshot import open_snapshot, snapshot_path
+            path = snapshot_path(args.database)
+            snapshot = open_snapshot(path)
+            if snapshot is None:
+                print(f'no snapshot at {path}', file=sys.stderr)
+                return 2
+            catalog = RestaurantCatalog(repository, snapshot)
+            catalog.populate()
+            result = catalog_handlers[args.command](catalog, args)
+        else:
+            result = handlers[args.command](repository, args)
+    except KeyError:
+        # only show looks a restaurant up by name, anywhere else it is a bug
+        if args.command != 'show':
+            raise
+        print(f'no restaurant named {args.name!r}', file=sys.stderr)
+        return 1
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 2
+    finally:
+        repository.close()
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_result(args.command, result)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
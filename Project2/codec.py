@@ -0,0 +1,150 @@
+"""
+This module encodes restaurants and summaries into compact binary records
+for the shelve backend.
+
+A record starts with its format byte, RESTAURANT_RECORD or SUMMARY_RECORD,
+followed by a flags byte and a struct header of counts: addresses, hours,
+menus and the number of items of every menu. The days of the week are one
+byte each, an index into DAYS, and addresses in the usual 'x, y' form are
+packed as two 32 bit integers. Every string follows as UTF-8 in one table
+separated by NUL bytes, so decoding is one split instead of a length read
+per string, and the decoded strings are interned.
+
+A restaurant that does not fit the format, a NUL in a string or a menu of
+more than 65535 items, is pickled instead. Pickles start with 0x80, which
+is no format byte, so decode tells them apart, and the records written
+before this format existed are pickled Restaurant objects that the shelve
+returns as they are.
+
+Written by Wenbin Wu
+"""
+
+import pickle
+import struct
+import sys
+from itertools import islice
+from restaurant import Menu, Restaurant, Summary
+from hours import DAYS
+
+RESTAURANT_RECORD = 1  # format byte of a restaurant, version 1
+SUMMARY_RECORD = 2  # format byte of a summary, version 1
+FRANCHISE = 1  # flag bits
+PACKED_ADDRESSES = 2
+OTHER_DAY = 255  # day index of an hours key that is not in DAYS, the key is in the strings
+HEADER = struct.Struct('<BBHHH')  # format, flags, addresses, hours, menus or menu titles
+DAY_INDEX = {day: i for i, day in enumerate(DAYS)}
+DAY_KEYS = {}  # key: bytes of day indices, value: tuple of day names
+
+
+def pack_addresses(addresses):
+    """return the addresses packed as x, y integers, or None if one is not in 'x, y' form"""
+    coordinates = []
+    for address in addresses:
+        x, _, y = address.partition(', ')
+        try:
+            x, y = int(x), int(y)
+        except ValueError:
+            return None
+        if f'{x}, {y}' != address or not -2 ** 31 <= min(x, y) <= max(x, y) < 2 ** 31:
+            return None
+        coordinates += (x, y)
+    return struct.pack(f'<{len(coordinates)}i', *coordinates)
+
+
+def encode_common(kind, obj, menu_counts, menu_strings):
+    """encode the fields restaurants and summaries share, return None if they do not fit"""
+    flags = FRANCHISE if obj.isfranchise else 0
+    strings = [obj.name, obj.cuisine]
+    packed = pack_addresses(obj.address)
+    if packed is None:
+        packed = b''
+        strings += obj.address
+    else:
+        flags |= PACKED_ADDRESSES
+    days = bytearray()
+    for day, hours in obj.hours.items():
+        if len(hours) != 2:
+            return None
+        days.append(DAY_INDEX.get(day, OTHER_DAY))
+        if days[-1] == OTHER_DAY:
+            strings.append(day)
+        strings += hours
+    strings += menu_strings
+    if any(not isinstance(text, str) or '\0' in text for text in strings):
+        return None
+    if max(len(obj.address), len(obj.hours), len(menu_counts), *menu_counts) > 0xFFFF:
+        return None
+    return b''.join((
+        HEADER.pack(kind, flags, len(obj.address), len(obj.hours), len(menu_counts)),
+        struct.pack(f'<{len(menu_counts)}H', *menu_counts) if kind == RESTAURANT_RECORD else b'',
+        bytes(days), packed, '\0'.join(strings).encode(),
+        ))
+
+
+def encode_restaurant(restaurant):
+    """return the binary record of a restaurant"""
+    strings = []
+    for menu in restaurant.menus:
+        strings.append(menu.title)
+        for item, price in menu.items.items():
+            strings += (item, price)
+    counts = [len(menu.items) for menu in restaurant.menus]
+    record = encode_common(RESTAURANT_RECORD, restaurant, counts, strings)
+    return pickle.dumps(restaurant) if record is None else record
+
+
+def encode_summary(summary):
+    """return the binary record of a summary"""
+    record = encode_common(SUMMARY_RECORD, summary, [0] * len(summary.menu_titles), summary.menu_titles)
+    return pickle.dumps(summary) if record is None else record
+
+
+def day_keys(days):
+    """return the DAYS names of a string of day indices, cached, None if one is OTHER_DAY"""
+    keys = DAY_KEYS.get(days)
+    if keys is None and OTHER_DAY not in days:
+        keys = DAY_KEYS[days] = tuple(DAYS[day] for day in days)
+    return keys
+
+
+def decode(record):
+    """
+    return the Restaurant or Summary of a record, a record that is not bytes is an
+    object pickled by an older version and is returned as it is
+    """
+    if not isinstance(record, bytes):
+        return record
+    kind = record[0]
+    if kind not in (RESTAURANT_RECORD, SUMMARY_RECORD):
+        return pickle.loads(record)
+    _, flags, address_count, hours_count, menu_count = HEADER.unpack_from(record)
+    position = HEADER.size
+    if kind == RESTAURANT_RECORD:
+        item_counts = struct.unpack_from(f'<{menu_count}H', record, position)
+        position += 2 * menu_count
+    days = record[position:position + hours_count]
+    position += hours_count
+    if flags & PACKED_ADDRESSES:
+        coordinates = iter(struct.unpack_from(f'<{2 * address_count}i', record, position))
+        position += 8 * address_count
+    # the strings are consumed in order, the same cuisines, hours, item names and
+    # prices come back in many records so they are interned
+    strings = map(sys.intern, record[position:].decode().split('\0'))
+    name, cuisine = next(strings), next(strings)
+    if flags & PACKED_ADDRESSES:
+        address = [f'{x}, {y}' for x, y in zip(coordinates, coordinates)]
+    else:
+        address = list(islice(strings, address_count))
+    keys = day_keys(days)
+    if keys is not None:
+        hours = dict(zip(keys, map(list, zip(strings, strings))))
+    else:
+        hours = {}
+        for day in days:
+            day = next(strings) if day == OTHER_DAY else DAYS[day]
+            hours[day] = [next(strings), next(strings)]
+    isfranchise = bool(flags & FRANCHISE)
+    if kind == SUMMARY_RECORD:
+        return Summary(name, cuisine, isfranchise, address, hours, list(strings))
+    menus = [Menu(next(strings), dict(zip(islice(strings, count), strings))) for count in item_counts]
+    return Restaurant(name, cuisine, isfranchise, address, hours, menus)
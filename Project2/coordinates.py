@@ -0,0 +1,109 @@
+"""
+This module contains a columnar store of parsed restaurant coordinates.
+
+Locations are kept as two parallel float columns with a third column of
+keys pointing back to the restaurant rows, so distances for one or many
+customer locations are computed in a single pass over the columns.
+NumPy is used when it is installed, otherwise the array module columns
+are scanned in plain Python.
+
+Written by Wenbin Wu
+"""
+
+import math
+from array import array
+
+try:
+    import numpy
+except ImportError:  # numpy is optional
+    numpy = None
+
+
+class CoordinateColumns:
+    """parallel x, y and key columns for every restaurant location"""
+    def __init__(self):
+        self.xs = array('d')
+        self.ys = array('d')
+        self.keys = []
+        self.positions = {}  # key: location key, value: position in the columns
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.positions
+
+    def add(self, key, x, y):
+        """append a location to the columns"""
+        if key in self.positions:
+            self.remove(key)
+        self.positions[key] = len(self.keys)
+        self.keys.append(key)
+        self.xs.append(x)
+        self.ys.append(y)
+        return None
+
+    def remove(self, key):
+        """remove a location by moving the last location into its place"""
+        position = self.positions.pop(key)
+        last_key = self.keys.pop()
+        last_x = self.xs.pop()
+        last_y = self.ys.pop()
+        if last_key != key:
+            self.keys[position] = last_key
+            self.xs[position] = last_x
+            self.ys[position] = last_y
+            self.positions[last_key] = position
+        return None
+
+    def location(self, key):
+        """return the (x, y) point saved for key"""
+        position = self.positions[key]
+        return self.xs[position], self.ys[position]
+
+    def distances(self, x, y):
+        """return the rounded distance from x, y to every location, in column order"""
+        if numpy is not None:
+            xs = numpy.frombuffer(self.xs, dtype=numpy.float64)
+            ys = numpy.frombuffer(self.ys, dtype=numpy.float64)
+            return numpy.round(numpy.hypot(xs - x, ys - y), 2).tolist()
+        hypot = math.hypot
+        return [round(hypot(px - x, py - y), 2) for px, py in zip(self.xs, self.ys)]
+
+    def nearest(self, x, y):
+        """return (distance, key) of the location closest to x, y"""
+        if not self.keys:
+            return None
+        if numpy is not None:
+            xs = numpy.frombuffer(self.xs, dtype=numpy.float64)
+            ys = numpy.frombuffer(self.ys, dtype=numpy.float64)
+            d = numpy.hypot(xs - x, ys - y)
+            position = int(numpy.argmin(d))
+            return float(d[position]), self.keys[position]
+        d = [math.hypot(px - x, py - y) for px, py in zip(self.xs, self.ys)]
+        position = min(range(len(d)), key=d.__getitem__)
+        return d[position], self.keys[position]
+
+    def batch_nearest(self, points, chunk_size=1024):
+        """
+        return (distance, key) of the closest location for each (x, y) in points,
+        points are scored chunk_size at a time to bound the size of the distance matrix
+        """
+        points = list(points)
+        if not self.keys:
+            return [None] * len(points)
+        if numpy is None:
+            return [self.nearest(x, y) for x, y in points]
+        xs = numpy.frombuffer(self.xs, dtype=numpy.float64)
+        ys = numpy.frombuffer(self.ys, dtype=numpy.float64)
+        results = []
+        for start in range(0, len(points), chunk_size):
+            chunk = numpy.asarray(points[start:start + chunk_size], dtype=numpy.float64)
+            d = numpy.hypot(chunk[:, 0:1] - xs, chunk[:, 1:2] - ys)
+            positions = numpy.argmin(d, axis=1)
+            nearest = d[numpy.arange(len(chunk)), positions]
+            results.extend(
+                (float(distance), self.keys[position])
+                for distance, position in zip(nearest, positions.tolist())
+                )
+        return results
@@ -5,27 +5,36 @@ The address for each restaurant location is randomly generated,
 therefore each run of this module will create a slightly
 different data set for the database.
 
+For loading large catalogs from CSV or JSONL files use importer.py, for
+seeded synthetic catalogs of any size use synthetic.py.
+
 Written by Wenbin Wu
 """
 
-import shelve
+import ast
 import random
 from restaurant import *
+from repository import RestaurantRepository
+
+
+used_addresses = set()  # an address belongs to one restaurant
 
 
 def make_random_address():
-    """generate random address tuple"""
-    x = random.randint(1, 99)
-    y = random.randint(1, 99)
-    return f'{x}, {y}'
+    """generate random address tuple, one not generated before"""
+    while True:
+        x = random.randint(1, 99)
+        y = random.randint(1, 99)
+        if (x, y) not in used_addresses:
+            used_addresses.add((x, y))
+            return f'{x}, {y}'
 
 def make_menu(menu_title, menu_data):
     """generate a restaurant menu from input data file"""
     menu = Menu(title=menu_title, items=dict())
     with open('./data/' + menu_data) as file:
         for row in file:
-            data = eval(row)
-            name, price = data
+            name, price = ast.literal_eval(row)  # each row is a [name, price] literal
             menu.add_item(name, price)
     return menu
 
@@ -197,10 +206,12 @@ r10 = Restaurant(
 
 restaurants = [r1, r3, r4, r5, r6, r7, r8, r9, r10]
 
-# save data to database
-with shelve.open('restaurants', writeback=True) as db:
-    for r in restaurants:
-        db[r.name] = r
+# save data to database, through the repository so the address index is kept up to date
+repository = RestaurantRepository('restaurants')
+taken = []  # restaurants at an address another restaurant of the database holds
+repository.save_many(restaurants, errors=taken)
 
 if __name__ == '__main__':
+    for error in taken:
+        print(f'skipped {error.name}, {error}')
     print('done!')
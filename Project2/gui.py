@@ -2,6 +2,9 @@
 GUI classes
 
 - LoginDialog: dialog box for admin login
+- RestaurantListCtrl: virtual list of restaurants read from the catalog
+- MenuListCtrl: virtual list of the menus and items of a restaurant
+- ItemListCtrl: virtual list of the items of the menu being edited
 - CustomerGUI: main customer interface
 - RestaurantGUI: restaurant menu page
 - EditorGUI: restaurant editor interface
@@ -9,14 +12,25 @@ GUI classes
 Written by Wenbin Wu
 """
 
-import math
-import shelve
 import wx
 import wx.lib.intctrl
-import wx.lib.mixins.listctrl as listmixins
+from collections import OrderedDict
 from restaurant import *
+from repository import RestaurantRepository
+from storage import AddressTakenError, ConflictError
+from catalog import RestaurantCatalog
+from menumodel import MenuModel, menu_rows, parse_items
+from importer import group_items, read_items, write_items
+from snapshot import open_snapshot, snapshot_path
+from worker import QueryWorker
+from hours import DAYS, current_minute, minute_of_week
 
 ADMIN_ACCOUNT = ('admin', 'admin')  # hardcoded admin account
+HOURS_CHOICES = ('Any hours', 'Open now', 'Closing soon', 'Open at...')
+CLOSING_SOON = 30  # minutes
+POLL_INTERVAL = 2000  # milliseconds between checks for database changes
+PAGE_CACHE_SIZE = 8  # restaurant pages kept built for reopening
+MENU_FILES = 'CSV files (*.csv)|*.csv|JSON lines files (*.jsonl)|*.jsonl'
 
 class LoginDialog(wx.Dialog):
     def __init__(self, *args, **kw):
@@ -55,9 +69,88 @@ class LoginDialog(wx.Dialog):
         self.CenterOnParent()
 
 
-class CustomerGUI(wx.Frame, listmixins.ColumnSorterMixin):
+class RestaurantListCtrl(wx.ListCtrl):
+    """virtual list control that reads its rows from a RestaurantCatalog"""
+    def __init__(self, parent, catalog, size=wx.DefaultSize):
+        wx.ListCtrl.__init__(self, parent, size=size, style=wx.LC_REPORT | wx.LC_VIRTUAL)
+        self.catalog = catalog
+        self.nearest_attr = wx.ItemAttr()
+        self.nearest_attr.SetTextColour(wx.BLUE)
+
+    def OnGetItemText(self, item, column):
+        """method required by wx.LC_VIRTUAL, return the text of one cell"""
+        return self.catalog.text(self.catalog.key_at(item), column)
+
+    def OnGetItemAttr(self, item):
+        """method required by wx.LC_VIRTUAL, highlight the nearest restaurant"""
+        if self.catalog.key_at(item) == self.catalog.nearest:
+            return self.nearest_attr
+        return None
+
+    def refresh(self):
+        """update the row count and redraw the visible rows"""
+        self.SetItemCount(len(self.catalog))
+        self.Refresh()
+        return None
+
+
+class MenuListCtrl(wx.ListCtrl):
+    """virtual list of menus, a title row followed by the item rows of every menu"""
+    def __init__(self, parent, menus, size=wx.DefaultSize):
+        wx.ListCtrl.__init__(
+            self, parent, size=size, style=wx.LC_REPORT | wx.LC_VIRTUAL | wx.LC_SINGLE_SEL
+            )
+        self.rows = menu_rows(menus)  # (menu title or item, price, True for a title row)
+        self.title_attr = wx.ItemAttr()
+        self.title_attr.SetBackgroundColour('#E6E6FA')
+        self.title_attr.SetFont(parent.GetFont().Bold())
+        self.item_attr = wx.ItemAttr()
+        self.item_attr.SetBackgroundColour('#FFF5EE')
+        self.InsertColumn(0, 'Item', width=300)
+        self.InsertColumn(1, 'Price', width=100)
+        self.SetItemCount(len(self.rows))
+
+    def OnGetItemText(self, item, column):
+        """method required by wx.LC_VIRTUAL, return the text of one cell"""
+        return self.rows[item][column]
+
+    def OnGetItemAttr(self, item):
+        """method required by wx.LC_VIRTUAL, set the menu title rows apart"""
+        return self.title_attr if self.rows[item][2] else self.item_attr
+
+
+class ItemListCtrl(wx.ListCtrl):
+    """virtual list control that reads its rows from a MenuModel"""
+    def __init__(self, parent, model, size=wx.DefaultSize):
+        wx.ListCtrl.__init__(
+            self, parent, size=size, style=wx.LC_REPORT | wx.LC_VIRTUAL | wx.LC_SINGLE_SEL | wx.BORDER_SUNKEN
+            )
+        self.model = model
+
+    def OnGetItemText(self, item, column):
+        """method required by wx.LC_VIRTUAL, return the text of one cell"""
+        return self.model.row(item)[column]
+
+    def refresh(self):
+        """update the row count and redraw the visible rows"""
+        self.SetItemCount(len(self.model))
+        self.Refresh()
+        return None
+
+    def deselect(self):
+        """
+        clear the selection before rows are removed, a virtual list keeps it by
+        position and would select the row moving up into it
+        """
+        index = self.GetFirstSelected()
+        if index != -1:
+            self.SetItemState(index, 0, wx.LIST_STATE_SELECTED)
+        return None
+
+
+class CustomerGUI(wx.Frame):
     """customer GUI interface"""
-    def __init__(self, parent, title, size=(780, 360)):
+    def __init__(self, parent, title, size=(780, 360), database='restaurants', snapshot=None):
         wx.Frame.__init__(
             self, parent, title=title, size=size,
             style=wx.DEFAULT_FRAME_STYLE & ~(wx.RESIZE_BORDER | wx.MAXIMIZE_BOX)
@@ -69,16 +162,27 @@ class CustomerGUI(wx.Frame, listmixins.ColumnSorterMixin):
             self.SetFont(wx.Font(12, wx.SWISS, wx.NORMAL, wx.NORMAL, False, 'Monaco'))
         self.panel = wx.Panel(self)
 
-        self.database = 'restaurants'
+        self.database = database  # a path ending in .sqlite3 uses the SQLite backend
+        self.repository = RestaurantRepository(self.database)
+        # a snapshot exported by snapshot.py is mapped instead of reading every restaurant
+        self.snapshot = open_snapshot(snapshot or snapshot_path(self.database))
+        self.catalog = RestaurantCatalog(self.repository, self.snapshot)
+        self.worker = QueryWorker(error=self.deliver_error)  # runs searches off the main thread
+        # reloads have their own worker, so a search or a sort does not cancel one
+        self.loader = QueryWorker(delay=0, error=self.deliver_error)
+        self.poller = QueryWorker(delay=0, error=self.deliver_error)  # reads the change log for the polls
         self.user_location = None
-        self.itemDataMap = {}
+        self.restaurant_pages = OrderedDict()  # key: restaurant name, value: RestaurantGUI, oldest first
 
         # ----- search field container -----
         search_sizer = wx.BoxSizer(wx.HORIZONTAL)
-        self.search_field = wx.SearchCtrl(self.panel, size=(350, -1), style=wx.TE_PROCESS_ENTER)
+        self.search_field = wx.SearchCtrl(self.panel, size=(220, -1), style=wx.TE_PROCESS_ENTER)
         self.search_field.ShowCancelButton(True)
         self.search_field.ShowSearchButton(True)
         self.search_field.Bind(wx.EVT_TEXT, self.search_restaurant)
+        self.hours_choice = wx.Choice(self.panel, choices=HOURS_CHOICES)
+        self.hours_choice.SetSelection(0)
+        self.hours_choice.Bind(wx.EVT_CHOICE, self.hours_chosen)
         self.location_label = wx.StaticText(
             self.panel, label='Customer Location: Not set  ', 
             size=(200, -1), style=wx.ALL | wx.EXPAND
@@ -88,18 +192,20 @@ class CustomerGUI(wx.Frame, listmixins.ColumnSorterMixin):
         self.login_button = wx.Button(self.panel, label='Login')
         self.login_button.Bind(wx.EVT_BUTTON, self.admin_login)
         search_sizer.Add(self.search_field, 0, wx.ALL | wx.CENTER, 5)
+        search_sizer.Add(self.hours_choice, 0, wx.ALL | wx.CENTER, 5)
         search_sizer.Add(self.location_label, 0 , wx.ALL | wx.EXPAND, 5)
         search_sizer.Add(self.set_location_button, 0, wx.ALL | wx.EXPAND, 5)
         search_sizer.Add(self.login_button, 0, wx.ALL | wx.EXPAND, 5)
 
         # ----- restaurant list container -----
-        self.restaurant_list = wx.ListCtrl(self.panel, size=(780, 250), style=wx.LC_REPORT)
+        self.restaurant_list = RestaurantListCtrl(self.panel, self.catalog, size=(780, 250))
         self.restaurant_list.InsertColumn(0, 'Name', width=200)
         self.restaurant_list.InsertColumn(1, 'Cuisine', width=120)
         self.restaurant_list.InsertColumn(2, 'Address', width=60)
         self.restaurant_list.InsertColumn(3, 'Menus', width=280)
         self.restaurant_list.InsertColumn(4, 'Distance', width=60)
         self.restaurant_list.Bind(wx.EVT_LEFT_DCLICK, self.open_restaurant_page)
+        self.restaurant_list.Bind(wx.EVT_LIST_COL_CLICK, self.sort_column)
 
         # ----- main container -----
         self.main_sizer = wx.BoxSizer(wx.VERTICAL)
@@ -112,55 +218,93 @@ class CustomerGUI(wx.Frame, listmixins.ColumnSorterMixin):
         self.CreateStatusBar()
         self.SetStatusText('Currently in Customer mode.')
 
-        # ----- wxpython built-in listctrl sorter init -----
-        listmixins.ColumnSorterMixin.__init__(self, 5)
+        self.Bind(wx.EVT_CLOSE, self.close_window)
         self.load()
 
-    def GetListCtrl(self):
-        """method required by wx.lib.mixins.listctrl"""
-        return self.restaurant_list
+        # ----- change polling, edits made by other windows and programs -----
+        self.poll_timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.poll_changes, self.poll_timer)
+        self.poll_timer.Start(POLL_INTERVAL)
+
+    def close_window(self, event):
+        """stop the change polling and the query worker before the window closes"""
+        self.poll_timer.Stop()
+        self.worker.shutdown()
+        self.loader.shutdown()
+        self.poller.shutdown()
+        event.Skip()
+        return None
 
     def load_database(self):
-        """load data from database into datamap"""
-        self.itemDataMap = {}
-        with shelve.open(self.database) as db:
-            for restaurant in db.values():
-                menu_titles = [menu.title for menu in restaurant.menus]
-                menu_titles = ' | '.join(menu_titles)
-                for address in restaurant.address:
-                    row = [restaurant.name, restaurant.cuisine, address, menu_titles, '']
-                    index = len(self.itemDataMap)
-                    self.itemDataMap[index] = row
-        return None
-
-    def populate_data(self, datamap):
-        """populate list box with restaurant data"""
-        self.restaurant_list.DeleteAllItems()
-        for key, data in datamap.items():
-            index = self.restaurant_list.InsertItem(self.restaurant_list.GetItemCount(), data[0])
-            self.restaurant_list.SetItem(index, 1, data[1])
-            self.restaurant_list.SetItem(index, 2, data[2])
-            self.restaurant_list.SetItem(index, 3, data[3])
-            self.restaurant_list.SetItem(index, 4, data[4])
-            self.restaurant_list.SetItemData(index, key)
+        """load data from database into the catalog"""
+        self.catalog.load()
+        return None
+
+    def populate_data(self):
+        """show the catalog view in the restaurant list"""
+        self.restaurant_list.refresh()
         return None
 
     def load(self):
-        """load the chosen database data and populate the restaurant list"""
-        self.load_database()
-        if self.user_location:
-            self.calculate_distances(self.user_location)
-        else:
-            self.populate_data(self.itemDataMap)
+        """load the chosen database data in the background and populate the restaurant list"""
+        self.SetStatusText('Loading restaurants...')
+        self.loader.submit(self.catalog.reloaded, self.deliver_catalog)
+        return None
+
+    def deliver_catalog(self, generation, catalog):
+        """called on the worker thread with a freshly loaded catalog"""
+        wx.CallAfter(self.show_catalog, generation, catalog)
+        return None
+
+    def show_catalog(self, generation, catalog):
+        """swap in a loaded catalog unless a newer reload replaced it"""
+        if self.loader.cancelled(generation) or catalog is None:
+            return None
+        # the query, location, hours or sort order may have changed while it loaded
+        changed = catalog.copy_settings(self.catalog)
+        self.catalog = catalog
+        self.restaurant_list.catalog = catalog
+        # a view still computing for the old catalog holds its row keys, not these
+        self.worker.cancel()
+        self.populate_data()
+        if changed:
+            self.update_view()
+        self.SetStatusText(f'{len(catalog.rows)} restaurant locations loaded.')
+        return None
+
+    def deliver_error(self, generation, error):
+        """called on a worker thread when a background load, view or poll failed"""
+        wx.CallAfter(self.SetStatusText, f'Restaurants not updated, {error}.')
+        return None
+
+    def update_view(self):
+        """recompute the catalog view in the background"""
+        self.worker.submit(self.catalog.compute_view, self.deliver_view)
+        return None
+
+    def deliver_view(self, generation, view):
+        """called on the worker thread with a computed view"""
+        wx.CallAfter(self.show_view, generation, view)
+        return None
+
+    def show_view(self, generation, view):
+        """display a computed view unless a newer request replaced it"""
+        if self.worker.cancelled(generation) or view is None:
+            return None
+        self.catalog.view, self.catalog.nearest = view
+        self.populate_data()
         return None
 
     def search_restaurant(self, event):
         """filter list of restaurants by search text"""
-        filter = self.search_field.GetValue()
-        results = {
-            index: data for index, data in self.itemDataMap.items() if filter.lower() in data[0].lower()
-            }
-        self.populate_data(results)
+        self.catalog.search(self.search_field.GetValue(), update=False)
+        self.update_view()
+        return None
+
+    def sort_column(self, event):
+        """sort the restaurant list by the clicked column"""
+        self.catalog.sort(event.GetColumn(), update=False)
+        self.update_view()
         return None
 
     def calculate_distances(self, location):
@@ -168,23 +312,76 @@ class CustomerGUI(wx.Frame, listmixins.ColumnSorterMixin):
         calculate distance from user location to each restaurant 
         and update the restaurant list
         """
-        if not self.restaurant_list.GetItemCount():
-            return None
-        distances = []
-        for index, data in self.itemDataMap.items():
-            x1, y1 = location
-            x2, y2 = data[2].split(',')
-            d = math.sqrt((int(x2) - x1)**2 + (int(y2) - y1)**2)
-            d = round(d, 2)
-            self.itemDataMap[index][4] = str(d)
-            distances.append((d, index))
-        _, index = min(distances)
-        self.populate_data(self.itemDataMap)
-        item = self.restaurant_list.GetItem(index)
-        item.SetTextColour(wx.BLUE)
-        self.restaurant_list.SetItem(item)
+        self.catalog.set_location(location, update=False)
+        self.update_view()
         return None
 
+    def hours_chosen(self, event):
+        """filter the restaurant list by opening hours"""
+        choice = self.hours_choice.GetSelection()
+        if choice == 0:
+            self.catalog.set_hours(None, update=False)
+            self.SetStatusText('Showing restaurants at any hours.')
+        elif choice == 1:
+            self.catalog.set_hours(current_minute(), update=False)
+            self.SetStatusText('Showing restaurants open now.')
+        elif choice == 2:
+            self.catalog.set_hours(current_minute(), CLOSING_SOON, update=False)
+            self.SetStatusText(f'Showing restaurants closing within {CLOSING_SOON} minutes.')
+        else:
+            minute = self.ask_open_at()
+            if minute is None:
+                self.hours_choice.SetSelection(0)
+                self.catalog.set_hours(None, update=False)
+            else:
+                self.catalog.set_hours(minute, update=False)
+        self.update_view()
+        return None
+
+    def ask_open_at(self):
+        """ask for a day and time, return its minute of the week or None if cancelled"""
+        dialog = wx.Dialog(self, title='Open At')
+        dialog.CenterOnParent()
+
+        day_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        day_label = wx.StaticText(dialog, -1, label='Day:')
+        day_field = wx.Choice(dialog, choices=[day.title() for day in DAYS])
+        day_field.SetSelection(0)
+        day_sizer.Add(day_label, 0, wx.ALL | wx.CENTER, 5)
+        day_sizer.Add(day_field, 0, wx.ALL, 5)
+
+        time_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        time_label = wx.StaticText(dialog, -1, label='Time:')
+        time_field = wx.TextCtrl(dialog, value='7:00PM')
+        time_sizer.Add(time_label, 0, wx.ALL | wx.CENTER, 5)
+        time_sizer.Add(time_field, 0, wx.ALL, 5)
+
+        button_sizer = wx.StdDialogButtonSizer()
+        set_button = wx.Button(dialog, wx.ID_OK)
+        set_button.SetDefault()
+        cancel_button = wx.Button(dialog, wx.ID_CANCEL)
+        button_sizer.AddButton(set_button)
+        button_sizer.AddButton(cancel_button)
+        button_sizer.Realize()
+
+        main_sizer = wx.BoxSizer(wx.VERTICAL)
+        main_sizer.Add(day_sizer, 0, wx.ALL | wx.CENTER, 5)
+        main_sizer.Add(time_sizer, 0, wx.ALL | wx.CENTER, 5)
+        main_sizer.Add(button_sizer, 0, wx.ALL | wx.CENTER, 5)
+        main_sizer.Fit(dialog)
+        dialog.SetSizer(main_sizer)
+
+        if dialog.ShowModal() != wx.ID_OK:
+            return None
+        day = DAYS[day_field.GetSelection()]
+        try:
+            minute = minute_of_week(day, time_field.GetValue())
+        except ValueError:
+            wx.MessageBox('Enter a time such as 7:00PM.', 'Open At', wx.OK | wx.ICON_WARNING)
+            return None
+        self.SetStatusText(f'Showing restaurants open {day.title()} {time_field.GetValue()}.')
+        return minute
+
     def set_location_button_pressed(self, event):
         """let customer set the current location and calculate the distance to each restaurant"""
         dialog = wx.Dialog(self, title='Enter Your Location')
@@ -234,16 +431,47 @@ class CustomerGUI(wx.Frame, listmixins.ColumnSorterMixin):
     def open_restaurant_page(self, event):
         """open the menu page for the restaurant"""
         index = self.restaurant_list.GetFirstSelected()
-        restaurant = self.restaurant_list.GetItem(index).GetText()
-        dialog = RestaurantGUI(self, restaurant, self.database)
+        if index == -1:
+            return None
+        restaurant = self.catalog.row(index)[0]
+        try:
+            dialog = self.restaurant_page(restaurant)
+        except KeyError:
+            self.SetStatusText(f'{restaurant} was deleted.')
+            self.apply_changes()
+            return None
         dialog.CenterOnParent()
         dialog.ShowWindowModal()
         return None
 
+    def restaurant_page(self, name):
+        """
+        return the page of a restaurant, the page built before if the restaurant is
+        unchanged, raise KeyError if it was deleted
+        """
+        dialog = self.restaurant_pages.pop(name, None)
+        try:
+            restaurant = self.repository.get(name)
+        except KeyError:
+            if dialog is not None:
+                dialog.Destroy()
+            raise
+        if dialog is not None and dialog.restaurant != restaurant:
+            dialog.Destroy()
+            dialog = None
+        if dialog is None:
+            dialog = RestaurantGUI(self, restaurant)
+        self.restaurant_pages[name] = dialog
+        while len(self.restaurant_pages) > PAGE_CACHE_SIZE:
+            _, oldest = self.restaurant_pages.popitem(last=False)
+            oldest.Destroy()
+        return dialog
+
     def add_restaurant(self, event):
         """display the editor GUI to add a new restaurant"""
         add_dialog = EditorGUI(
-            self, self.database, datamap=self.itemDataMap, title='Add Restaurant'
+            self, self.repository, title='Add Restaurant',
+            on_save=self.restaurant_saved
             )
         add_dialog.CenterOnParent()
         add_dialog.ShowWindowModal()
@@ -254,9 +482,10 @@ class CustomerGUI(wx.Frame, listmixins.ColumnSorterMixin):
         index = self.restaurant_list.GetFirstSelected()
         if index == -1:
             return None
-        restaurant = self.restaurant_list.GetItem(index).GetText()
+        restaurant = self.catalog.row(index)[0]
         edit_dialog = EditorGUI(
-            self, self.database, restaurant, datamap=self.itemDataMap, title='Edit Restaurant'
+            self, self.repository, restaurant, title='Edit Restaurant',
+            on_save=self.restaurant_saved
             )
         edit_dialog.CenterOnParent()
         edit_dialog.ShowWindowModal()
@@ -267,23 +496,72 @@ class CustomerGUI(wx.Frame, listmixins.ColumnSorterMixin):
         index = self.restaurant_list.GetFirstSelected()
         if index == -1:
             return None
-        selected_name = self.restaurant_list.GetItem(index, 0).GetText()
-        selected_address = self.restaurant_list.GetItem(index, 2).GetText()
-        with shelve.open(self.database) as db:
-            for restaurant in db.values():
-                if selected_address in restaurant.address:
-                    if restaurant.isfranchise:
-                        restaurant.address.remove(selected_address)
-                        db[selected_name] = restaurant
-                    else:
-                        del db[selected_name]
-        self.restaurant_list.DeleteItem(index)
-        self.load()
+        selected_name, _, selected_address, _ = self.catalog.row(index)
+        try:
+            # by name as well, a legacy database may have two restaurants at one address
+            name = self.repository.delete_address(selected_address, selected_name)
+        except ConflictError as error:
+            self.SetStatusText(f'Not deleted, {error}.')
+            self.apply_changes()
+            return None
+        if name is not None:
+            self.catalog.remove_rows(name, selected_address)
+        self.worker.cancel()
+        self.catalog.update_view()
+        self.populate_data()
+        return None
+
+    def restaurant_saved(self, old_name, restaurant):
+        """update the rows of a restaurant after it is saved by the editor"""
+        if old_name is not None:
+            self.catalog.remove_rows(old_name)
+        self.catalog.add_rows(restaurant.summary())
+        self.worker.cancel()
+        self.catalog.update_view()
+        self.populate_data()
+        return None
+
+    def apply_changes(self, report=False):
+        """
+        read the database changes logged since the catalog was loaded in the
+        background and patch the catalog with them, report shows the count
+        """
+        self.poller.submit(
+            self.catalog.read_changes,
+            lambda generation, changes: self.deliver_changes(generation, changes, report)
+            )
+        return None
+
+    def deliver_changes(self, generation, changes, report):
+        """called on the worker thread with the changes read from the database"""
+        wx.CallAfter(self.show_changes, generation, changes, report)
+        return None
+
+    def show_changes(self, generation, changes, report):
+        """patch the catalog unless newer changes were asked for, or reload it"""
+        if self.poller.cancelled(generation):
+            return None
+        # patching drops the removed rows from the view before the list draws again
+        changed = self.catalog.patch(changes)
+        if changed is None:
+            self.catalog.version = None  # the catalog being replaced is not patched any more
+            self.load()
+            return None
+        if changed:
+            self.populate_data()
+            self.update_view()
+        if report:
+            self.SetStatusText(f'{changed} restaurants updated.')
+        return None
+
+    def poll_changes(self, event):
+        """apply the changes other windows and programs made to the database"""
+        self.apply_changes()
         return None
 
     def reload_database(self, event):
-        """reload database and update the restaurant list"""
-        self.load()
+        """apply the database changes and update the restaurant list"""
+        self.apply_changes(report=True)
         return None
 
     def admin_logout(self, event):
@@ -337,15 +615,15 @@ class CustomerGUI(wx.Frame, listmixins.ColumnSorterMixin):
 
 
 class RestaurantGUI(wx.Dialog):
-    def __init__(self, parent, restaurant, database=None):
+    def __init__(self, parent, restaurant, repository=None):
         wx.Dialog.__init__(self, parent=parent)
         if wx.Platform == '__WXMSW__':
             self.SetFont(wx.Font(10, wx.SWISS, wx.NORMAL, wx.NORMAL, False, 'courier'))
         else:
             self.SetFont(wx.Font(12, wx.SWISS, wx.NORMAL, wx.NORMAL, False, 'Monaco'))
-        if database:
-            with shelve.open(database) as db:
-                restaurant = db[restaurant]
+        if repository:
+            restaurant = repository.get(restaurant)
+        self.restaurant = restaurant
         self.SetTitle('Restaurant Page')
 
         # ----- restaurant info container -----
@@ -354,13 +632,10 @@ class RestaurantGUI(wx.Dialog):
 
         # ----- opening hours container -----
         hours_sizer = wx.StaticBoxSizer(wx.VERTICAL, self, label='Business Hours\t(Open / Close)')
-        word = iter([
-            'Monday:    ', 'Tuesday:   ', 'Wednesday: ', 'Thursday:  ',
-            'Friday:    ', 'Saturday:  ', 'Sunday:    '
-            ])
         for day, hours in restaurant.hours.items():
             sizer = wx.BoxSizer(wx.HORIZONTAL)
-            label = next(word)
+            # labelled by the day key, a restaurant may list only some days
+            label = f'{day.capitalize() + ":":<11}'
             day_label = wx.StaticText(self, label=label)
             opening = wx.StaticText(self, label=hours[0])
             closing = wx.StaticText(self, label=hours[1])
@@ -374,20 +649,10 @@ class RestaurantGUI(wx.Dialog):
         # ----- separator -----
         vline = wx.StaticLine(self, -1, size=(1, -1), style=wx.LI_VERTICAL)
 
-        # ----- menus container -----
+        # ----- menus container, one virtual list draws only the visible items -----
         right_sizer = wx.BoxSizer(wx.VERTICAL)
-        for menu in restaurant.menus:
-            menu_sizer = wx.StaticBoxSizer(wx.VERTICAL, self, label=menu.title)
-            for item, price in menu.items.items():
-                item_sizer = wx.BoxSizer(wx.HORIZONTAL)
-                name_label = wx.StaticText(self, label=item, size=(300, -1))
-                name_label.SetBackgroundColour('#FFF5EE')
-                prices_label = wx.StaticText(self, label=price, style=wx.ALIGN_LEFT)
-                prices_label.SetBackgroundColour('#E6E6FA')
-                item_sizer.Add(name_label, 0, wx.ALL | wx.EXPAND)
-                item_sizer.Add(prices_label, 0, wx.ALL | wx.EXPAND)
-                menu_sizer.Add(item_sizer, 0, wx.ALL, 2)
-            right_sizer.Add(menu_sizer, 0, wx.ALL | wx.EXPAND, 5)
+        menu_list = MenuListCtrl(self, restaurant.menus, size=(420, 320))
+        right_sizer.Add(menu_list, 0, wx.ALL | wx.EXPAND, 5)
         close_button = wx.Button(self, wx.ID_OK, label='Close')
         right_sizer.Add(close_button, 0, wx.ALL | wx.ALIGN_RIGHT, 10)
 
@@ -401,7 +666,10 @@ class RestaurantGUI(wx.Dialog):
 
 
 class EditorGUI(wx.Dialog):
-    def __init__(self, parent, database, restaurant=None, datamap=None, title='', size=(760, 450)):
+    def __init__(
+            self, parent, repository, restaurant=None, title='', size=(760, 450),
+            on_save=None
+            ):
         wx.Dialog.__init__(
             self, parent, title=title, size=size,
             style=wx.DEFAULT_FRAME_STYLE & ~(wx.RESIZE_BORDER | wx.MAXIMIZE_BOX)
@@ -411,9 +679,11 @@ class EditorGUI(wx.Dialog):
         else:
             self.SetFont(wx.Font(12, wx.SWISS, wx.NORMAL, wx.NORMAL, False, 'Monaco'))
         self.restaurant = restaurant
-        self.database = database
-        self.occupied_addresses = {i[2] for i in datamap.values()}
+        self.repository = repository
+        self.on_save = on_save  # called with (old name, restaurant) after saving
+        self.version = repository.version()  # database version the form was filled at
         self.temp_menus = []  # list of Menu objects
+        self.item_model = MenuModel()  # items of the menu being edited, shown by item_list
 
         # ----- restaurant name container -----
         name_sizer = wx.BoxSizer(wx.HORIZONTAL)
@@ -543,12 +813,15 @@ class EditorGUI(wx.Dialog):
         self.remove_item_button = wx.Button(self, wx.ID_OK, label='Remove Item')
         self.remove_item_button.Bind(wx.EVT_BUTTON, self.remove_item_button_pressed)
         self.remove_item_button.Disable()
+        paste_items_button = wx.Button(self, label='Paste Items')
+        paste_items_button.Bind(wx.EVT_BUTTON, self.paste_items_button_pressed)
         buttons_sizer.Add(self.insert_item_button, 0, wx.ALL | wx.ALIGN_RIGHT, 5)
         buttons_sizer.Add(self.modify_item_button, 0, wx.ALL | wx.ALIGN_RIGHT, 5)
         buttons_sizer.Add(self.remove_item_button, 0, wx.ALL | wx.ALIGN_RIGHT, 5)
+        buttons_sizer.Add(paste_items_button, 0, wx.ALL | wx.ALIGN_RIGHT, 5)
 
         # ----- menu items list container -----
-        self.item_list = wx.ListCtrl(self, size=(700, 200), style=wx.LC_REPORT | wx.BORDER_SUNKEN)
+        self.item_list = ItemListCtrl(self, self.item_model, size=(700, 200))
         self.item_list.InsertColumn(0, 'Menu Item', width=350)
         self.item_list.InsertColumn(1, 'Prices', width=300)
         self.item_list.Bind(wx.EVT_LIST_ITEM_SELECTED, self.populate_item_fields)
@@ -589,6 +862,12 @@ class EditorGUI(wx.Dialog):
         clear_button.Bind(wx.EVT_BUTTON, self.clear_button_pressed)
         cancel_button = wx.Button(self, wx.ID_CANCEL, label='Cancel')
         cancel_button.Bind(wx.EVT_BUTTON, self.cancel_button_pressed)
+        import_menus_button = wx.Button(self, label='Import Menus')
+        import_menus_button.Bind(wx.EVT_BUTTON, self.import_menus_button_pressed)
+        export_menus_button = wx.Button(self, label='Export Menus')
+        export_menus_button.Bind(wx.EVT_BUTTON, self.export_menus_button_pressed)
+        buttons_sizer3.Add(import_menus_button, 0, wx.ALL | wx.ALIGN_RIGHT, 5)
+        buttons_sizer3.Add(export_menus_button, 0, wx.ALL | wx.ALIGN_RIGHT, 5)
         buttons_sizer3.Add(preview_button, 0, wx.ALL | wx.ALIGN_RIGHT, 5)
         buttons_sizer3.Add(save_button, 0, wx.ALL | wx.ALIGN_RIGHT, 5)
         buttons_sizer3.Add(clear_button, 0, wx.ALL | wx.ALIGN_RIGHT, 5)
@@ -643,14 +922,17 @@ class EditorGUI(wx.Dialog):
             if x is None or y is None:
                 return None
             new_address = f'{x}, {y}'
-            address_is_occupied = self.occupied_addresses.intersection([new_address])
+            # the address index of the database answers, the save checks it again
+            address_is_occupied = (
+                self.entered_addresses.FindString(new_address) != wx.NOT_FOUND
+                or not self.repository.address_free(new_address, self.restaurant)
+                )
             if address_is_occupied:
                 self.show_error_message(
                     f'Can not use address {new_address} for this restaurant. Already occupied.'
                     )
                 return None
             self.entered_addresses.Append(new_address)
-            self.occupied_addresses.add(new_address)
             self.x_field.Clear()
             self.y_field.Clear()
         return None
@@ -659,8 +941,6 @@ class EditorGUI(wx.Dialog):
         """remove the selected address from the address list"""
         if self.entered_addresses.GetCount():
             selected = self.entered_addresses.GetCurrentSelection()
-            address = self.entered_addresses.GetString(selected)
-            self.occupied_addresses.discard(address)
             self.entered_addresses.Delete(selected)
         return None
 
@@ -670,65 +950,89 @@ class EditorGUI(wx.Dialog):
         price = self.price_field.GetValue()
         if item == '' or price == '':
             return None
-        for i in range(self.item_list.GetItemCount()):
-            if self.item_list.GetItem(i).GetText() == item:
-                dialog = wx.Dialog(self)
-                dialog.CenterOnParent()
-                sizer = wx.BoxSizer(wx.VERTICAL)
-                label = wx.StaticText(dialog, 0, label=f'Item {item} already exist, replace it?')
-                button_sizer = wx.BoxSizer(wx.HORIZONTAL)
-                yes_button = wx.Button(dialog, wx.ID_OK, label='Yes')
-                no_button = wx.Button(dialog, wx.ID_CANCEL, label='No')
-                button_sizer.Add(yes_button, 0, wx.ALL | wx.EXPAND, 5)
-                button_sizer.Add(no_button, 0, wx.ALL | wx.EXPAND, 5)
-                sizer.Add(label, 0, wx.ALL | wx.EXPAND, 5)
-                sizer.Add(button_sizer, 0, wx.ALL | wx.EXPAND, 5)
-                sizer.Fit(dialog)
-                dialog.SetSizer(sizer)
-                if dialog.ShowModal() == wx.ID_OK:
-                    self.item_list.SetItem(i, 0, item)
-                    self.item_list.SetItem(i, 1, price)
-                    return None
-        self.item_list.Append((item, price))
+        if item in self.item_model and not self.ask_replace(f'Item {item} already exist, replace it?'):
+            return None
+        self.item_model.add(item, price)
+        self.item_list.refresh()
+        self.change_item_buttons(wx.EVT_LIST_ITEM_DESELECTED)
+        return None
+
+    def paste_items_button_pressed(self, event):
+        """insert the items on the clipboard, one 'item<tab>price' per line"""
+        data = wx.TextDataObject()
+        if not wx.TheClipboard.Open():
+            return None
+        try:
+            pasted = wx.TheClipboard.GetData(data)
+        finally:
+            wx.TheClipboard.Close()
+        items = parse_items(data.GetText()) if pasted else []
+        if not items:
+            self.show_error_message('Error. Copy items as lines of item name, a tab and the prices.')
+            return None
+        existing = sum(1 for item, _ in items if item in self.item_model)
+        replace = bool(existing) and self.ask_replace(f'{existing} of the items already exist, replace them?')
+        self.item_model.update(items, replace)
+        self.item_list.refresh()
         self.change_item_buttons(wx.EVT_LIST_ITEM_DESELECTED)
         return None
 
+    def ask_replace(self, message):
+        """ask whether to replace existing items, return True for yes"""
+        dialog = wx.Dialog(self)
+        dialog.CenterOnParent()
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        label = wx.StaticText(dialog, 0, label=message)
+        button_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        yes_button = wx.Button(dialog, wx.ID_OK, label='Yes')
+        no_button = wx.Button(dialog, wx.ID_CANCEL, label='No')
+        button_sizer.Add(yes_button, 0, wx.ALL | wx.EXPAND, 5)
+        button_sizer.Add(no_button, 0, wx.ALL | wx.EXPAND, 5)
+        sizer.Add(label, 0, wx.ALL | wx.EXPAND, 5)
+        sizer.Add(button_sizer, 0, wx.ALL | wx.EXPAND, 5)
+        sizer.Fit(dialog)
+        dialog.SetSizer(sizer)
+        answer = dialog.ShowModal() == wx.ID_OK
+        dialog.Destroy()
+        return answer
+
     def modify_item_button_pressed(self, event):
         """modify the selected menu item"""
         index = self.item_list.GetFirstSelected()
         item = self.item_field.GetValue()
         price = self.price_field.GetValue()
-        if item == '' or price == '':
+        if item == '' or price == '' or index == -1:
             return None
-        self.item_list.SetItem(index, 0, item)
-        self.item_list.SetItem(index, 1, price)
+        try:
+            self.item_model.set(index, item, price)
+        except ValueError as error:
+            self.show_error_message(f'Error. {error}.')
+            return None
+        self.item_list.refresh()
         self.item_list.SetItemState(index, 0, wx.LIST_STATE_SELECTED)
         self.change_item_buttons(wx.EVT_LIST_ITEM_DESELECTED)
         return None
 
     def remove_item_button_pressed(self, event):
         """remove the selected menu item from the items list"""
-        if self.item_list.GetItemCount():
-            index = self.item_list.GetFirstSelected()
-            self.item_list.DeleteItem(index)
+        index = self.item_list.GetFirstSelected()
+        if index != -1:
+            self.item_list.deselect()
+            self.item_model.remove(index)
+            self.item_list.refresh()
         self.change_item_buttons(wx.EVT_LIST_ITEM_DESELECTED)
         return None
 
     def insert_menu_button_pressed(self, event):
         """insert a new menu into the menus list"""
         title = self.title_field.GetValue()
-        num_items = self.item_list.GetItemCount()
+        num_items = len(self.item_model)
         if not title or not num_items:
             self.show_error_message('Error. Can not add an menu with no title or no items.')
             return None
         else:
             self.menu_list.Append((title, str(num_items)))
-        new_menu = Menu(self.title_field.GetValue(), {})
-        for i in range(num_items):
-            name = self.item_list.GetItem(i, 0).GetText()
-            price = self.item_list.GetItem(i, 1).GetText()
-            new_menu.add_item(name, price)
-        self.temp_menus.append(new_menu)
+        self.temp_menus.append(self.item_model.menu(title))
         self.change_menu_buttons(wx.EVT_LIST_ITEM_DESELECTED)
         return None
 
@@ -736,19 +1040,14 @@ class EditorGUI(wx.Dialog):
         """save a modified menu to the menus list"""
         index = self.menu_list.GetFirstSelected()
         title = self.title_field.GetValue()
-        num_items = self.item_list.GetItemCount()
+        num_items = len(self.item_model)
         if title == '' or not num_items:
             self.show_error_message('Error. A menu must a title and at least 1 item.')
             return None
         else:
             self.menu_list.SetItem(index, 0, title)
             self.menu_list.SetItem(index, 1, str(num_items))
-        modified_menu = Menu(self.title_field.GetValue(), {})
-        for i in range(num_items):
-            name = self.item_list.GetItem(i, 0).GetText()
-            price = self.item_list.GetItem(i, 1).GetText()
-            modified_menu.add_item(name, price)
-        self.temp_menus[index] = modified_menu
+        self.temp_menus[index] = self.item_model.menu(title)
         self.change_menu_buttons(wx.EVT_LIST_ITEM_DESELECTED)
         return None
 
@@ -757,12 +1056,78 @@ class EditorGUI(wx.Dialog):
         index = self.menu_list.GetFirstSelected()
         if not index == -1:
             self.title_field.Clear()
-            self.item_list.DeleteAllItems()
+            self.item_list.deselect()
+            self.item_model.clear()
+            self.item_list.refresh()
             self.menu_list.DeleteItem(index)
             self.temp_menus.pop(index)
         self.change_menu_buttons(wx.EVT_LIST_ITEM_DESELECTED)
         return None
 
+    def import_menus_button_pressed(self, event):
+        """merge the menus of this restaurant from a CSV or JSONL menu item file"""
+        with wx.FileDialog(
+                self, 'Import Menus', wildcard=MENU_FILES,
+                style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST) as dialog:
+            if dialog.ShowModal() != wx.ID_OK:
+                return None
+            path = dialog.GetPath()
+        name = self.name_field.GetValue()
+        errors = []
+        try:
+            imported = group_items(item for item in read_items(path, errors) if item[0] == name)
+        except (OSError, ValueError) as error:
+            self.show_error_message(f'Error. {error}')
+            return None
+        if not imported:
+            self.show_error_message(f'Error. The file has no menu items of {name!r}.')
+            return None
+        # the imported items are diffed against the menus in the editor
+        models = {menu.title: MenuModel(menu.items) for menu in self.temp_menus}
+        added = changed = unlisted = 0
+        for (_, title), items in imported.items():
+            model = models.get(title)
+            if model is None:
+                model = models[title] = MenuModel()
+                self.temp_menus.append(Menu(title, {}))
+            unlisted += sum(1 for item in model.names if item not in items)
+            new, replaced = model.update(items.items())
+            added += new
+            changed += replaced
+        removed = 0
+        if unlisted and self.ask_replace(f'{unlisted} items of these menus are not in the file, remove them?'):
+            for (_, title), items in imported.items():
+                removed += len(models[title]) - len(items)
+                models[title].load(items)
+        self.temp_menus = [models[menu.title].menu(menu.title) for menu in self.temp_menus]
+        self.menu_list.DeleteAllItems()
+        for menu in self.temp_menus:
+            self.menu_list.Append((menu.title, str(len(menu.items))))
+        self.change_menu_buttons(wx.EVT_LIST_ITEM_DESELECTED)
+        message = f'{added} items added, {changed} changed, {removed} removed.'
+        if errors:
+            message += f' {len(errors)} bad lines skipped, the first: {errors[0]}'
+        wx.MessageBox(message, 'Import Menus', style=wx.OK | wx.CENTER, parent=self)
+        return None
+
+    def export_menus_button_pressed(self, event):
+        """write the menus in the editor to a CSV or JSONL menu item file"""
+        with wx.FileDialog(
+                self, 'Export Menus', wildcard=MENU_FILES,
+                style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT) as dialog:
+            if dialog.ShowModal() != wx.ID_OK:
+                return None
+            path = dialog.GetPath()
+        name = self.name_field.GetValue()
+        try:
+            write_items(path, (
+                (name, menu.title, item, price)
+                for menu in self.temp_menus for item, price in menu.items.items()
+                ))
+        except (OSError, ValueError) as error:
+            self.show_error_message(f'Error. {error}')
+        return None
+
     def preview_button_pressed(self, event):
         """preview restaurant info"""
         restaurant = self.create_restaurant()
@@ -794,12 +1159,21 @@ class EditorGUI(wx.Dialog):
         if not restaurant.menus:
             self.show_error_message('Error. Can not save restaurant with no menu.')
             return None
-        with shelve.open(self.database) as db:
-            if self.restaurant:
-                # in the case of editing and exisiting restaurant and the restaurant name is changed
-                # delete the original and save the edited version
-                del db[self.restaurant]
-            db[restaurant.name] = restaurant
+        # in the case of editing and exisiting restaurant and the restaurant name is changed
+        # the original is deleted and the edited version is saved
+        try:
+            self.repository.save(restaurant, old_name=self.restaurant, version=self.version)
+        except ConflictError as error:
+            self.show_error_message(
+                f'Error. {error}, someone else saved it while you were editing. '
+                'Cancel and open the restaurant again.'
+                )
+            return None
+        except AddressTakenError as error:
+            self.show_error_message(f'Error. Can not save restaurant, {error}.')
+            return None
+        if self.on_save:
+            self.on_save(self.restaurant, restaurant)
         self.Destroy()
         return None
 
@@ -827,7 +1201,8 @@ class EditorGUI(wx.Dialog):
         self.title_field.Clear()
         self.item_field.Clear()
         self.price_field.Clear()
-        self.item_list.DeleteAllItems()
+        self.item_model.clear()
+        self.item_list.refresh()
         self.menu_list.DeleteAllItems()
         self.temp_menus.clear()
         self.change_item_buttons(wx.EVT_LIST_ITEM_DESELECTED)
@@ -843,10 +1218,8 @@ class EditorGUI(wx.Dialog):
         """populate the items list with items from the selected menu"""
         self.item_field.Clear()
         self.price_field.Clear()
-        self.item_list.DeleteAllItems()
-        menu = self.temp_menus[event.Index]
-        for item, price in menu.items.items():
-            self.item_list.Append((item, price))
+        self.item_model.load(self.temp_menus[event.Index].items)
+        self.item_list.refresh()
         self.title_field.SetValue(event.GetText())
         self.insert_menu_button.Disable()
         self.save_menu_button.Enable()
@@ -855,9 +1228,7 @@ class EditorGUI(wx.Dialog):
 
     def populate_item_fields(self, event):
         """populate item and price fields with the selected item"""
-        index = self.item_list.GetFirstSelected()
-        name = self.item_list.GetItem(index, 0).GetText()
-        price = self.item_list.GetItem(index, 1).GetText()
+        name, price = self.item_model.row(event.Index)
         self.item_field.SetValue(name)
         self.price_field.SetValue(price)
         self.insert_item_button.Disable()
@@ -879,7 +1250,9 @@ class EditorGUI(wx.Dialog):
         self.insert_menu_button.Enable()
         self.save_menu_button.Disable()
         self.remove_menu_button.Disable()
-        self.item_list.DeleteAllItems()
+        self.item_list.deselect()
+        self.item_model.clear()
+        self.item_list.refresh()
         self.title_field.Clear()
         self.item_field.Clear()
         self.price_field.Clear()
@@ -923,8 +1296,7 @@ class EditorGUI(wx.Dialog):
 
     def populate_form(self):
         """populate the editor with data"""
-        with shelve.open(self.database) as db:
-            restaurant = db[self.restaurant]
+        self.version, restaurant = self.repository.get_for_update(self.restaurant)
         self.name_field.SetValue(restaurant.name)
         self.cuisine_field.SetValue(restaurant.cuisine)
         if restaurant.isfranchise:
@@ -955,9 +1327,8 @@ if __name__ == '__main__':
     app = wx.App()
     form = EditorGUI(
         None,
-        database='restaurants',
+        repository=RestaurantRepository('restaurants'),
         restaurant='Fiery Wok',
-        datamap={},
         title='Editor Form'
         )
     form.ShowModal()
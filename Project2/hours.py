@@ -0,0 +1,154 @@
+"""
+This module converts the free text business hours of a restaurant into
+minute-of-week intervals.
+
+Minute 0 is Monday 12:00AM and the week has 10080 minutes. A closing time
+at or before the opening time closes after midnight, and an interval that
+runs past Sunday midnight wraps around to Monday. IntervalIndex files the
+intervals of many restaurants by hour of the week, so the restaurants open
+at a minute, or closing soon after it, are found without reading every
+hours dict.
+
+Written by Wenbin Wu
+"""
+
+import time
+
+DAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+
+def parse_time(text):
+    """convert a time string such as '7:00AM' into minutes after midnight, None if not a time"""
+    text = text.strip().upper().replace(' ', '')
+    suffix = text[-2:]
+    if suffix in ('AM', 'PM'):
+        text = text[:-2]
+    hour, _, minute = text.partition(':')
+    if not hour.isdigit() or (minute and not minute.isdigit()):
+        return None
+    hour, minute = int(hour), int(minute or 0)
+    if suffix in ('AM', 'PM'):
+        if not 0 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if suffix == 'PM' else 0)
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        return None
+    return hour * 60 + minute
+
+
+def day_interval(day, opening, closing):
+    """
+    return the (start, end) minute-of-week interval for one day of hours,
+    None for a closed day or hours that can not be parsed
+    """
+    start = parse_time(opening)
+    end = parse_time(closing)
+    if start is None or end is None:
+        return None
+    if end <= start:  # closes after midnight
+        end += MINUTES_PER_DAY
+    offset = DAYS.index(day) * MINUTES_PER_DAY
+    return offset + start, offset + end
+
+
+def week_intervals(hours):
+    """return the sorted minute-of-week intervals for a restaurant hours dict"""
+    intervals = []
+    for day, (opening, closing) in hours.items():
+        if day not in DAYS:
+            continue
+        interval = day_interval(day, opening, closing)
+        if interval is None:
+            continue
+        start, end = interval
+        if end > MINUTES_PER_WEEK:  # sunday night into monday morning
+            intervals.append((start, MINUTES_PER_WEEK))
+            intervals.append((0, end - MINUTES_PER_WEEK))
+        else:
+            intervals.append((start, end))
+    intervals.sort()
+    return intervals
+
+
+def minute_of_week(day, time):
+    """convert a day name and a time string into a minute of the week"""
+    minutes = parse_time(time)
+    if day.lower() not in DAYS or minutes is None:
+        raise ValueError(f'not a day and time: {day} {time}')
+    return DAYS.index(day.lower()) * MINUTES_PER_DAY + minutes
+
+
+def current_minute():
+    """return the minute of the week right now, in local time"""
+    now = time.localtime()
+    return now.tm_wday * MINUTES_PER_DAY + now.tm_hour * 60 + now.tm_min
+
+
+def closing_minute(intervals, minute):
+    """
+    return the minute an open restaurant closes, counted on from minute so it may
+    pass the end of the week, None if none of the intervals is open at minute
+    """
+    end = minute
+    # overlapping or back to back intervals keep it open, also across the end of the week
+    while end - minute < MINUTES_PER_WEEK:
+        at = end % MINUTES_PER_WEEK
+        longest = max((e - at for s, e in intervals if s <= at < e), default=0)
+        if not longest:
+            break
+        end += longest
+    return None if end == minute else end
+
+
+class IntervalIndex:
+    """
+    minute-of-week opening intervals of many keys, each interval is filed under
+    every bucket of bucket_size minutes it overlaps so a minute looks in one bucket
+    """
+    def __init__(self, bucket_size=60):
+        self.bucket_size = bucket_size
+        self.buckets = [set() for _ in range(MINUTES_PER_WEEK // bucket_size)]  # of (start, end, key)
+        self.intervals = {}  # key: indexed key, value: list of (start, end)
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def __contains__(self, key):
+        return key in self.intervals
+
+    def add(self, key, hours):
+        """index the opening intervals of an hours dict under key, replacing any before"""
+        if key in self.intervals:
+            self.remove(key)
+        self.intervals[key] = week_intervals(hours)
+        for start, end in self.intervals[key]:
+            for bucket in range(start // self.bucket_size, (end - 1) // self.bucket_size + 1):
+                self.buckets[bucket].add((start, end, key))
+        return None
+
+    def remove(self, key):
+        """remove key from the index"""
+        for start, end in self.intervals.pop(key):
+            for bucket in range(start // self.bucket_size, (end - 1) // self.bucket_size + 1):
+                self.buckets[bucket].discard((start, end, key))
+        return None
+
+    def open_at(self, minute):
+        """return the set of keys open at a minute of the week"""
+        minute %= MINUTES_PER_WEEK
+        bucket = self.buckets[minute // self.bucket_size]
+        return {key for start, end, key in bucket if start <= minute < end}
+
+    def closing_within(self, minute, minutes):
+        """return the set of keys open at minute that close within the next minutes"""
+        minute %= MINUTES_PER_WEEK
+        bucket = self.buckets[minute // self.bucket_size]
+        # only keys with an open interval ending soon can close soon, check just those
+        candidates = {key for start, end, key in bucket if start <= minute < end <= minute + minutes}
+        keys = set()
+        for key in candidates:
+            if closing_minute(self.intervals[key], minute) <= minute + minutes:
+                keys.add(key)
+        return keys
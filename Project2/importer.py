@@ -0,0 +1,378 @@
+"""
+This module imports restaurants and menu items in bulk from CSV and JSONL
+files of any size.
+
+usage: python importer.py [-d DATABASE] [-w WORKERS] [-b BATCH_SIZE] [--replace-menus] FILE [FILE ...]
+       python importer.py [-d DATABASE] --export FILE [-r RESTAURANT ...]
+
+Two kinds of records are understood, a file holds one kind:
+
+- restaurant: name, cuisine, isfranchise, address, and the hours of each day
+- menu item: restaurant, menu, item, price
+
+In a JSONL file every line is a JSON object. A restaurant object has an
+address list and an hours dict in the same shape as Restaurant, or one
+field per day. In a CSV file the first row is the header, the address
+column holds the addresses separated by ';' and each day column holds
+'7:00AM-9:00PM' or 'Closed'. Records can not span lines.
+
+Files are read in batches of lines, the batches are parsed in a process
+pool and every batch is written in one transaction. Restaurant files are
+imported before menu item files so items always find their restaurant, and
+an imported restaurant that is already saved keeps its menus.
+
+Menu items are diffed against the items already saved: a batch reads the
+menus of its restaurants and writes only the items that are new or have a
+new price, so refreshing a menu that barely changed writes next to
+nothing. With --replace-menus an imported menu replaces the saved menu of
+the same title, the saved items the files do not list are removed at the
+end. --export writes the menu items of every restaurant, or of the named
+ones, in the same formats, so a file exported here imports back.
+
+Written by Wenbin Wu
+"""
+
+import argparse
+import csv
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from restaurant import *
+from hours import DAYS
+from spatial import parse_address
+
+ITEM_FIELDS = ('restaurant', 'menu', 'item', 'price')
+EXPORT_CHUNK = 500  # restaurants whose menu items are read at a time
+
+
+def file_format(path):
+    """return 'csv' or 'jsonl' for a file path"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.jsonl', '.json', '.ndjson'):
+        return 'jsonl'
+    raise ValueError(f'{path}: unknown file format, use .csv or .jsonl')
+
+
+def file_kind(path):
+    """return 'restaurant' or 'item' for the records in a file, None for an empty file"""
+    with open(path, newline='', encoding='utf-8') as file:
+        if file_format(path) == 'csv':
+            fields = next(csv.reader(file), None)
+        else:
+            # the first line holding a JSON object decides, bad lines are reported by parse_lines
+            fields = None
+            for line in file:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                if isinstance(record, dict):
+                    fields = record
+                    break
+                fields = fields or {}
+    if fields is None:
+        return None
+    return 'item' if 'item' in fields else 'restaurant'
+
+
+def parse_bool(value):
+    """convert a yes / no field into a bool"""
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'y', 'yes', 'true')
+
+
+def parse_day(value):
+    """convert the hours of one day into [opening, closing]"""
+    if isinstance(value, (list, tuple)):
+        opening, closing = value
+        return [str(opening).strip(), str(closing).strip()]
+    value = str(value or '').strip()
+    if not value or value.lower() == 'closed':
+        return ['', 'Closed']
+    opening, separator, closing = value.partition('-')
+    if not separator:
+        raise ValueError(f'hours must look like 7:00AM-9:00PM, got {value!r}')
+    return [opening.strip(), closing.strip()]
+
+
+def make_restaurant(record):
+    """build a Restaurant without menus from a restaurant record"""
+    name = str(record.get('name') or '').strip()
+    cuisine = str(record.get('cuisine') or '').strip()
+    if not name or not cuisine:
+        raise ValueError('a restaurant needs a name and a cuisine')
+    isfranchise = parse_bool(record.get('isfranchise', False))
+    addresses = record.get('address') or []
+    if isinstance(addresses, str):
+        addresses = [address for address in addresses.split(';') if address.strip()]
+    if not isinstance(addresses, list):
+        raise ValueError(f'address must be a string or a list, got {addresses!r}')
+    address = []
+    for text in addresses:
+        if not isinstance(text, str):
+            raise ValueError(f'bad address {text!r}, addresses look like "x, y"')
+        try:
+            x, y = parse_address(text)
+        except ValueError:
+            raise ValueError(f'bad address {text!r}, addresses look like "x, y"') from None
+        address.append(f'{x}, {y}')
+    if not isfranchise and len(address) > 1:
+        raise ValueError(f'{name} is not a franchise but has {len(address)} addresses')
+    hours = record.get('hours') or {}
+    if not isinstance(hours, dict):
+        raise ValueError(f'hours must map days to their hours, got {hours!r}')
+    hours = {day: parse_day(hours.get(day, record.get(day))) for day in DAYS}
+    return Restaurant(name, cuisine, isfranchise, address, hours, [])
+
+
+def make_item(record):
+    """build a (restaurant, menu title, item, price) tuple from a menu item record"""
+    item = tuple(str(record.get(field) or '').strip() for field in ITEM_FIELDS)
+    if not all(item):
+        raise ValueError('a menu item needs a restaurant, menu, item and price')
+    return item
+
+
+def parse_lines(path, fmt, header, lines, first_line):
+    """
+    parse a batch of lines, this runs in the worker processes,
+    return (restaurants, items, errors)
+    """
+    restaurants, items, errors = [], [], []
+    if fmt == 'csv':
+        records = ((i, row) for i, row in enumerate(csv.DictReader(lines, fieldnames=header)))
+    else:
+        records = ((i, line) for i, line in enumerate(lines) if line.strip())
+    for i, record in records:
+        try:
+            if fmt == 'jsonl':
+                record = json.loads(record)
+                if not isinstance(record, dict):
+                    raise ValueError('each line must hold a JSON object')
+            if 'item' in record:
+                items.append(make_item(record))
+            else:
+                restaurants.append(make_restaurant(record))
+        except ValueError as error:
+            errors.append(f'{path}:{first_line + i}: {error}')
+    return restaurants, items, errors
+
+
+def read_batches(path, batch_size):
+    """yield the arguments of parse_lines for each batch of lines in a file"""
+    fmt = file_format(path)
+    with open(path, newline='', encoding='utf-8') as file:
+        header = None
+        line_number = 1
+        if fmt == 'csv':
+            header = next(csv.reader([file.readline()]), None)
+            line_number = 2
+        lines = []
+        for line in file:
+            lines.append(line)
+            if len(lines) == batch_size:
+                yield path, fmt, header, lines, line_number
+                line_number += len(lines)
+                lines = []
+        if lines:
+            yield path, fmt, header, lines, line_number
+
+
+def read_items(path, errors=None, batch_size=5000):
+    """yield the (restaurant, menu, item, price) tuples of a menu item file, bad records go to errors"""
+    for batch in read_batches(path, batch_size):
+        _, items, batch_errors = parse_lines(*batch)
+        if errors is not None:
+            errors += batch_errors
+        yield from items
+
+
+def write_items(path, items):
+    """write (restaurant, menu, item, price) tuples to a CSV or JSONL file, return the count"""
+    fmt = file_format(path)
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        if fmt == 'csv':
+            writer = csv.writer(file)
+            writer.writerow(ITEM_FIELDS)
+            for item in items:
+                writer.writerow(item)
+                count += 1
+        else:
+            for item in items:
+                file.write(json.dumps(dict(zip(ITEM_FIELDS, item))) + '\n')
+                count += 1
+    return count
+
+
+def export_items(repository, path, names=None):
+    """write the menu items of every restaurant, or of the restaurants in names, return the count"""
+    if names is None:
+        names = sorted(summary.name for summary in repository.summaries())
+    names = list(names)
+
+    def items():
+        for i in range(0, len(names), EXPORT_CHUNK):
+            yield from repository.menu_items(names[i:i + EXPORT_CHUNK])
+
+    return write_items(path, items())
+
+
+def group_items(items):
+    """return {(restaurant, menu): {item: price}} of (restaurant, menu, item, price) tuples"""
+    menus = {}
+    for restaurant, title, item, price in items:
+        menus.setdefault((restaurant, title), {})[item] = price
+    return menus
+
+
+def diff_items(saved, items):
+    """
+    return (changed, unchanged): the (restaurant, menu, item, price) items that are
+    not in the saved {(restaurant, menu): {item: price}} menus with the same price,
+    and the number that are, an item listed twice counts once with its last price
+    """
+    latest = {}
+    for restaurant, title, item, price in items:
+        latest[restaurant, title, item] = price
+    changed = []
+    unchanged = 0
+    for (restaurant, title, item), price in latest.items():
+        if saved.get((restaurant, title), {}).get(item) == price:
+            unchanged += 1
+        else:
+            changed.append((restaurant, title, item, price))
+    return changed, unchanged
+
+
+def remove_unlisted_items(repository, listed):
+    """
+    remove the saved items of the menus in listed, {(restaurant, menu): set of items},
+    that are not in their set, return the number removed
+    """
+    names = sorted({restaurant for restaurant, _ in listed})
+    unlisted = []
+    for i in range(0, len(names), EXPORT_CHUNK):
+        for restaurant, title, item, _ in repository.menu_items(names[i:i + EXPORT_CHUNK]):
+            items = listed.get((restaurant, title))
+            if items is not None and item not in items:
+                unlisted.append((restaurant, title, item))
+    return repository.remove_menu_items(unlisted) if unlisted else 0
+
+
+def import_files(repository, paths, workers=None, batch_size=5000, report=None, replace_menus=False):
+    """
+    import restaurant and menu item files into the repository, workers is the
+    number of parsing processes (0 parses in this process), report is called with
+    a progress message after every batch, with replace_menus the saved items of
+    an imported menu that the files do not list are removed,
+    return a dict of counts and errors
+    """
+    stats = {
+        'restaurants': 0, 'items': 0, 'unchanged': 0, 'removed': 0, 'rows': 0,
+        'errors': [], 'seconds': 0.0
+        }
+    listed = {}  # key: (restaurant, menu), value: set of imported items, with replace_menus
+    kinds = {path: file_kind(path) for path in paths}
+    ordered = [path for path in paths if kinds[path] == 'restaurant']
+    ordered += [path for path in paths if kinds[path] == 'item']
+    start = time.perf_counter()
+
+    def write(result):
+        restaurants, items, errors = result
+        if restaurants:
+            taken = []
+            stats['restaurants'] += repository.save_many(restaurants, keep_menus=True, errors=taken)
+            errors += [f'restaurant {error.name!r} was skipped, {error}' for error in taken]
+        if items:
+            saved = group_items(repository.menu_items({restaurant for restaurant, _, _, _ in items}))
+            changed, unchanged = diff_items(saved, items)
+            stats['unchanged'] += unchanged
+            if changed:
+                count, missing = repository.add_menu_items(changed)
+                stats['items'] += count
+                errors += [f'unknown restaurant {name!r}, its menu items were skipped' for name in missing]
+            if replace_menus:
+                for restaurant, title, item, _ in items:
+                    listed.setdefault((restaurant, title), set()).add(item)
+        stats['rows'] += len(restaurants) + len(items)
+        stats['errors'] += errors
+        stats['seconds'] = time.perf_counter() - start
+        if report:
+            rate = stats['rows'] / stats['seconds'] if stats['seconds'] else 0
+            report(f"{stats['rows']:,} rows imported, {rate:,.0f} rows/s")
+        return None
+
+    batches = (batch for path in ordered for batch in read_batches(path, batch_size))
+    if workers == 0:
+        for batch in batches:
+            write(parse_lines(*batch))
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            # only a few batches are in flight at a time so memory stays bounded
+            window = 2 * (workers or os.cpu_count() or 1)
+            pending = deque()
+            for batch in batches:
+                pending.append(pool.submit(parse_lines, *batch))
+                if len(pending) >= window:
+                    write(pending.popleft().result())
+            while pending:
+                write(pending.popleft().result())
+    if listed:
+        stats['removed'] = remove_unlisted_items(repository, listed)
+        stats['seconds'] = time.perf_counter() - start
+    return stats
+
+
+if __name__ == '__main__':
+    from repository import RestaurantRepository
+
+    parser = argparse.ArgumentParser(description='Import restaurants and menu items in bulk.')
+    parser.add_argument('files', nargs='*', help='CSV or JSONL files')
+    parser.add_argument('-d', '--database', default='restaurants', help='database to import into')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='parsing processes')
+    parser.add_argument('-b', '--batch-size', type=int, default=5000, help='lines per batch')
+    parser.add_argument(
+        '--replace-menus', action='store_true',
+        help='remove the saved items of an imported menu that the files do not list'
+        )
+    parser.add_argument('--export', metavar='FILE', help='export menu items to a CSV or JSONL file instead')
+    parser.add_argument(
+        '-r', '--restaurant', action='append', help='export only this restaurant, may be repeated'
+        )
+    args = parser.parse_args()
+    if not args.files and not args.export:
+        parser.error('give files to import or --export FILE')
+
+    repository = RestaurantRepository(args.database)
+    if args.export:
+        start = time.perf_counter()
+        try:
+            count = export_items(repository, args.export, args.restaurant)
+        finally:
+            repository.close()
+        seconds = time.perf_counter() - start
+        print(f'{count:,} menu items exported to {args.export} in {seconds:.2f}s ({count / seconds:,.0f} items/s)')
+    else:
+        stats = import_files(
+            repository, args.files, args.workers, args.batch_size, report=print,
+            replace_menus=args.replace_menus
+            )
+        repository.close()
+        for error in stats['errors'][:20]:
+            print(error)
+        if len(stats['errors']) > 20:
+            print(f"... {len(stats['errors']) - 20} more errors")
+        rate = stats['rows'] / stats['seconds'] if stats['seconds'] else 0
+        print(
+            f"{stats['restaurants']:,} restaurants and {stats['items']:,} menu items imported "
+            f"in {stats['seconds']:.2f}s ({rate:,.0f} rows/s), {stats['unchanged']:,} items unchanged, "
+            f"{stats['removed']:,} removed, {len(stats['errors'])} errors"
+            )
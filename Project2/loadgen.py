@@ -0,0 +1,126 @@
+"""
+This module is a load generator for server.py.
+
+usage: python loadgen.py [--host HOST] [-p PORT] [-c CONNECTIONS] [-n REQUESTS] [--seed SEED]
+
+Every connection is a kiosk keeping one keep-alive connection open and
+sending its requests one after another. The requests are a mix of
+searches, nearest queries, restaurant pages and menus, with restaurant
+names taken from the server's own search results. At the end the requests
+per second and the p50 and p99 latency are printed.
+
+Written by Wenbin Wu
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from urllib.parse import quote
+
+QUERIES = ('pizza', 'curry', 'burger', 'fried rice', 'salad', 'sushi', 'cake', 'wings', 'taco', 'bar')
+
+
+async def request(reader, writer, path):
+    """send one GET request on an open connection, return (status, decoded JSON body)"""
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        key, _, value = line.decode('latin-1').partition(':')
+        if key.lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+def make_path(rng, names):
+    """return a random request path"""
+    roll = rng.random()
+    if roll < 0.3:
+        return f'/search?q={quote(rng.choice(QUERIES))}&limit=20'
+    if roll < 0.6:
+        return f'/nearest?x={rng.randint(0, 100)}&y={rng.randint(0, 100)}&k=5'
+    if roll < 0.85:
+        return f'/restaurants/{quote(rng.choice(names), safe="")}'
+    return f'/restaurants/{quote(rng.choice(names), safe="")}/menus'
+
+
+async def kiosk(host, port, count, rng, names, latencies, errors):
+    """send count requests on one connection, recording each latency in seconds"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(count):
+            path = make_path(rng, names)
+            start = time.perf_counter()
+            status, _ = await request(reader, writer, path)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(f'{status} {path}')
+    finally:
+        writer.close()
+    return None
+
+
+def percentile(values, fraction):
+    """return the value below which a fraction of the sorted values fall, None without values"""
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def run(host, port, connections, requests, seed=0):
+    """run the load, return a dict of results"""
+    reader, writer = await asyncio.open_connection(host, port)
+    names = []
+    for query in QUERIES:
+        _, found = await request(reader, writer, f'/search?q={quote(query)}&limit=50')
+        names += found
+    writer.close()
+    if not names:
+        raise SystemExit('the server found no restaurants to request')
+
+    latencies, errors = [], []
+    # the first requests % connections kiosks make one request more
+    per_connection, remainder = divmod(requests, connections)
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        kiosk(host, port, per_connection + (i < remainder), random.Random(seed + i), names, latencies, errors)
+        for i in range(connections)
+        ))
+    seconds = time.perf_counter() - start
+    latencies = [latency * 1000 for latency in sorted(latencies)]
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'seconds': seconds,
+        'rps': len(latencies) / seconds,
+        'p50_ms': percentile(latencies, 0.50),  # None if no request was made
+        'p99_ms': percentile(latencies, 0.99),
+        }
+
+
+def format_ms(value):
+    """format a latency in milliseconds, n/a if there is none"""
+    return 'n/a' if value is None else f'{value:.1f} ms'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test the restaurant JSON API.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('-p', '--port', type=int, default=8080)
+    parser.add_argument('-c', '--connections', type=int, default=50, help='concurrent kiosks')
+    parser.add_argument('-n', '--requests', type=int, default=10000, help='total requests')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.host, args.port, args.connections, args.requests, args.seed))
+    print(
+        f"{results['requests']:,} requests in {results['seconds']:.2f}s: "
+        f"{results['rps']:,.0f} requests/s, p50 {format_ms(results['p50_ms'])}, "
+        f"p99 {format_ms(results['p99_ms'])}, {results['errors']} errors"
+        )
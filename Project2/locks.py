@@ -0,0 +1,86 @@
+"""
+This module contains a file lock shared by every process that opens the
+same shelve database.
+
+dbm.dumb has no locking of its own: a writer rewrites the .dir file when
+it closes the shelve, so a second writer, or a reader opening the shelve
+at that moment, can lose or tear records. Readers take the lock shared,
+so any number of kiosks read at once, and a writer takes it exclusive.
+POSIX systems use fcntl.flock. Windows only has exclusive byte range
+locks in msvcrt, there readers take turns.
+
+The lock is reentrant within a thread, a storage method holding it may
+call another one, but a thread holding it shared can not upgrade it.
+
+Written by Wenbin Wu
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def lock_file(fd, exclusive):
+    """block until the open lock file is locked"""
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        return None
+    while True:
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return None
+        except OSError:
+            time.sleep(0.01)
+
+
+def unlock_file(fd):
+    """unlock an open lock file"""
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    return None
+
+
+class FileLock:
+    """a lock file, shared by readers and exclusive for a writer"""
+    def __init__(self, path):
+        self.path = path
+        self.held = threading.local()  # the mode this thread holds the lock in
+
+    @contextmanager
+    def acquire(self, exclusive):
+        """hold the lock for a with block"""
+        mode = getattr(self.held, 'mode', None)
+        if mode is not None:
+            if exclusive and mode != 'exclusive':
+                raise RuntimeError(f'{self.path} is held shared and can not be upgraded')
+            yield
+            return
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT)
+        try:
+            lock_file(fd, exclusive)
+            self.held.mode = 'exclusive' if exclusive else 'shared'
+            try:
+                yield
+            finally:
+                self.held.mode = None
+                unlock_file(fd)
+        finally:
+            os.close(fd)
+
+    def shared(self):
+        """hold the lock shared, for reading"""
+        return self.acquire(False)
+
+    def exclusive(self):
+        """hold the lock exclusive, for writing"""
+        return self.acquire(True)
@@ -0,0 +1,129 @@
+"""
+This module contains the model of the menu being edited in the editor.
+
+The items are kept in two parallel lists in display order, with a dict
+from item name to position, so finding a duplicate or the row of an item
+is one lookup instead of reading every row back out of the list control.
+The list control is only a view, it asks the model for the rows it draws.
+menu_rows flattens the menus of a restaurant page the same way, a title
+row followed by the item rows of every menu.
+
+Written by Wenbin Wu
+"""
+
+from restaurant import Menu
+
+
+def parse_items(text):
+    """
+    return (item, price) pairs from pasted text, one item per line with the
+    price after a tab, lines without a tab or with an empty field are skipped
+    """
+    items = []
+    for line in text.splitlines():
+        item, tab, price = line.partition('\t')
+        item, price = item.strip(), price.strip()
+        if tab and item and price:
+            items.append((item, price))
+    return items
+
+
+def menu_rows(menus):
+    """return the (menu title or item, price, True for a title row) rows of menus"""
+    rows = []
+    for menu in menus:
+        rows.append((menu.title, '', True))
+        rows += [(item, price, False) for item, price in menu.items.items()]
+    return rows
+
+
+class MenuModel:
+    """the items of one menu in order, with an index on item name"""
+    def __init__(self, items=None):
+        self.names = []  # item names in display order
+        self.prices = []
+        self.positions = {}  # key: item name, value: position in the lists
+        if items:
+            self.load(items)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.positions
+
+    def row(self, position):
+        """return the (item, price) at a position"""
+        return self.names[position], self.prices[position]
+
+    def position(self, name):
+        """return the position of an item, None if there is no item of that name"""
+        return self.positions.get(name)
+
+    def clear(self):
+        """remove every item"""
+        self.names = []
+        self.prices = []
+        self.positions = {}
+        return None
+
+    def load(self, items):
+        """replace every item with the items of a dict of item: price"""
+        self.names = list(items)
+        self.prices = list(items.values())
+        self.positions = {name: i for i, name in enumerate(self.names)}
+        return None
+
+    def add(self, name, price):
+        """append an item, or change the price of the item of that name, return its position"""
+        position = self.positions.get(name)
+        if position is not None:
+            self.prices[position] = price
+            return position
+        self.positions[name] = len(self.names)
+        self.names.append(name)
+        self.prices.append(price)
+        return len(self.names) - 1
+
+    def set(self, position, name, price):
+        """change the item at a position, ValueError if it is renamed to another item's name"""
+        other = self.positions.get(name)
+        if other is not None and other != position:
+            raise ValueError(f'item {name} already exists')
+        del self.positions[self.names[position]]
+        self.positions[name] = position
+        self.names[position] = name
+        self.prices[position] = price
+        return None
+
+    def remove(self, position):
+        """remove the item at a position"""
+        del self.positions[self.names.pop(position)]
+        self.prices.pop(position)
+        for i in range(position, len(self.names)):
+            self.positions[self.names[i]] = i
+        return None
+
+    def update(self, items, replace=True):
+        """
+        add many (item, price) pairs, items that exist already get the new price if
+        replace is true and are skipped otherwise, return (added, replaced) counts
+        """
+        added = replaced = 0
+        for name, price in items:
+            position = self.positions.get(name)
+            if position is None:
+                self.add(name, price)
+                added += 1
+            elif replace and self.prices[position] != price:
+                self.prices[position] = price
+                replaced += 1
+        return added, replaced
+
+    def items(self):
+        """return the items as a dict of item: price, in order"""
+        return dict(zip(self.names, self.prices))
+
+    def menu(self, title):
+        """return a Menu of the items"""
+        return Menu(title, self.items())
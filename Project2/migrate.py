@@ -0,0 +1,40 @@
+"""
+This module copies the restaurants shelve into a SQLite database.
+
+usage: python migrate.py [shelve database] [sqlite database]
+
+The defaults are the restaurants shelve and restaurants.sqlite3 in the
+current folder. Restaurants already in the SQLite database are replaced.
+A restaurant at an address another restaurant already holds, which a
+legacy shelve may contain, is skipped and reported.
+
+Written by Wenbin Wu
+"""
+
+import sys
+from storage import ShelveStorage, SQLiteStorage
+
+
+def migrate(source, target, errors=None):
+    """
+    copy every restaurant from a shelve into a SQLite database, return the number
+    copied, a restaurant at a taken address raises AddressTakenError, or with an
+    errors list is skipped and its error appended
+    """
+    shelve_storage = ShelveStorage(source)
+    sqlite_storage = SQLiteStorage(target)
+    try:
+        count = sqlite_storage.save_many(shelve_storage.values(), errors=errors)
+    finally:
+        sqlite_storage.close()
+    return count
+
+
+if __name__ == '__main__':
+    source = sys.argv[1] if len(sys.argv) > 1 else 'restaurants'
+    target = sys.argv[2] if len(sys.argv) > 2 else 'restaurants.sqlite3'
+    errors = []
+    count = migrate(source, target, errors)
+    print(f'{count} restaurants copied from {source} to {target}')
+    for error in errors:
+        print(f'skipped {error.name}, {error}')
@@ -0,0 +1,153 @@
+"""
+This module parses the free text prices of menu items and indexes them.
+
+A price such as '6 inches $50   9 inches $70' holds one (variant, amount)
+entry per dollar amount, the variant being the text in front of it and
+the amount a whole number of cents. A price without a variant, '$12.99',
+has the empty variant and a price without any dollar amount has no entry.
+
+PriceIndex keeps the entries sorted by amount for every cuisine, menu and
+item name, so a price range is two binary searches and the minimum and
+median of a group are read off its sorted list.
+
+Written by Wenbin Wu
+"""
+
+import re
+from bisect import bisect_left, insort
+
+PRICE = re.compile(r'([^$]*?)\s*\$\s*(\d+(?:\.\d*)?)')
+
+
+def parse_amount(text):
+    """convert a dollar amount such as '9.99' or '4.5' into cents"""
+    dollars, _, cents = text.partition('.')
+    return int(dollars) * 100 + int((cents + '00')[:2])
+
+
+def parse_price(text):
+    """return the (variant, amount in cents) entries of a price string"""
+    return [(variant.strip(), parse_amount(amount)) for variant, amount in PRICE.findall(text)]
+
+
+def format_amount(cents):
+    """convert cents into a price string such as '$12.99'"""
+    return f'${cents // 100}.{cents % 100:02d}'
+
+
+def price_entries(restaurant):
+    """
+    return the (amount, restaurant name, menu title, item, variant) entries of
+    every menu item of a restaurant
+    """
+    entries = []
+    for menu in restaurant.menus:
+        for item, price in menu.items.items():
+            for variant, amount in parse_price(price):
+                entries.append((amount, restaurant.name, menu.title, item, variant))
+    return entries
+
+
+def group_keys(cuisine, entry):
+    """return the keys of the groups an entry is sorted into, None is every entry"""
+    _, restaurant, title, item, _ = entry
+    return None, ('cuisine', cuisine), ('menu', restaurant, title), ('item', item.lower())
+
+
+class PriceIndex:
+    """
+    price entries of many restaurants, each group kept sorted by amount, the
+    entries are (amount, restaurant name, menu title, item, variant) tuples
+    """
+    def __init__(self):
+        self.groups = {None: []}  # key: group key, value: sorted list of entries
+        self.restaurants = {}  # key: restaurant name, value: (cuisine, list of entries)
+
+    def __len__(self):
+        return len(self.groups[None])
+
+    def __contains__(self, name):
+        return name in self.restaurants
+
+    def add(self, restaurant):
+        """index the menu item prices of a restaurant, replacing any indexed before"""
+        if restaurant.name in self.restaurants:
+            self.remove(restaurant.name)
+        entries = price_entries(restaurant)
+        self.restaurants[restaurant.name] = (restaurant.cuisine, entries)
+        for entry in entries:
+            for key in group_keys(restaurant.cuisine, entry):
+                insort(self.groups.setdefault(key, []), entry)
+        return None
+
+    def add_many(self, restaurants):
+        """index many restaurants, sorting each group once at the end"""
+        touched = set()
+        for restaurant in restaurants:
+            if restaurant.name in self.restaurants:
+                self.remove(restaurant.name)
+            entries = price_entries(restaurant)
+            self.restaurants[restaurant.name] = (restaurant.cuisine, entries)
+            for entry in entries:
+                for key in group_keys(restaurant.cuisine, entry):
+                    self.groups.setdefault(key, []).append(entry)
+                    touched.add(key)
+        for key in touched:
+            self.groups[key].sort()
+        return None
+
+    def remove(self, name):
+        """remove the prices of a restaurant"""
+        cuisine, entries = self.restaurants.pop(name)
+        for entry in entries:
+            for key in group_keys(cuisine, entry):
+                group = self.groups[key]
+                del group[bisect_left(group, entry)]
+                if not group and key is not None:
+                    del self.groups[key]
+        return None
+
+    def select(self, cuisine=None, menu=None, item=None):
+        """
+        return (sorted group, entry filter) for the filters, the narrowest group
+        is searched and any other filter checks its entries
+        """
+        filters = []
+        if menu is not None:
+            group = self.groups.get(('menu', *menu), [])
+        elif item is not None:
+            group = self.groups.get(('item', item.lower()), [])
+        elif cuisine is not None:
+            group = self.groups.get(('cuisine', cuisine), [])
+        else:
+            group = self.groups[None]
+        if cuisine is not None and (menu is not None or item is not None):
+            filters.append(lambda entry: self.restaurants[entry[1]][0] == cuisine)
+        if item is not None and menu is not None:
+            filters.append(lambda entry: entry[3].lower() == item.lower())
+        if filters:
+            return group, lambda entry: all(check(entry) for check in filters)
+        return group, None
+
+    def price_range(self, low, high, cuisine=None, menu=None, item=None):
+        """
+        return the entries priced from low to high cents, cheapest first, menu is a
+        (restaurant name, menu title) pair and item an item name
+        """
+        group, check = self.select(cuisine, menu, item)
+        entries = group[bisect_left(group, (low,)):bisect_left(group, (high + 1,))]
+        return entries if check is None else [entry for entry in entries if check(entry)]
+
+    def price_stats(self, cuisine=None, menu=None, item=None):
+        """return the count, min, lower median and max amount of the filtered entries"""
+        group, check = self.select(cuisine, menu, item)
+        if check is not None:
+            group = [entry for entry in group if check(entry)]
+        if not group:
+            return {'count': 0, 'min': None, 'median': None, 'max': None}
+        return {
+            'count': len(group),
+            'min': group[0][0],
+            'median': group[(len(group) - 1) // 2][0],
+            'max': group[-1][0],
+            }
@@ -0,0 +1,308 @@
+"""
+This module contains the repository class used by the GUI to access the
+restaurant database.
+
+The repository keeps the decoded Restaurant objects in memory, so opening
+a restaurant page or the editor does not go back to the storage backend
+and decode the record again. Writes go straight to the storage backend
+and replace the cached entry. The repository may be used from the
+background query thread, so storage access holds the repository lock.
+
+The storage backend is picked from the database path, see storage.py.
+Both backends keep an index from every address to the name of the
+restaurant at that address, so finding or deleting the restaurant at an
+address reads one record instead of every restaurant. The same index
+checks that an address is free, a save of a restaurant at an address of
+another restaurant raises AddressTakenError, see storage.py.
+
+The customer list is built from restaurant summaries, the menus of a
+restaurant are only read and cached when it is opened or edited. The menu
+item names are read once, on the first item search, into an ItemIndex,
+see search.py. Every later item search reads the change log first and
+indexes again only the restaurants written since, so a search does not
+scan the database.
+
+Another program may write the same database. Reading the change log with
+changes drops the cached copies of the restaurants it names, so they are
+read again on the next get. A restaurant that is going to be written is
+read with get_for_update, which returns the database version it was read
+at, and saving it with that version fails with ConflictError if someone
+else wrote it in the meantime.
+
+Written by Wenbin Wu
+"""
+
+import threading
+from storage import AddressTakenError, ConflictError, open_storage
+from search import ItemIndex
+
+
+class RestaurantRepository:
+    """cached access to the restaurant storage backend"""
+    def __init__(self, database):
+        self.database = database
+        self.storage = open_storage(database)
+        self.cache = {}  # key: restaurant name, value: Restaurant object
+        self.complete = False  # True once every stored record is cached
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.RLock()
+        self.item_index = None  # ItemIndex built on the first item search
+        self.item_version = None  # database version the ItemIndex is up to date with
+
+    def __contains__(self, name):
+        if name in self.cache:
+            return True
+        if self.complete:
+            return False
+        with self.lock:
+            return name in self.storage
+
+    def get(self, name):
+        """return the restaurant saved under name, reading the storage only on a cache miss"""
+        # a save in another thread cannot come between the read and the store
+        with self.lock:
+            if name in self.cache:
+                self.hits += 1
+                return self.cache[name]
+            restaurant = self.storage.get(name)
+            self.misses += 1
+            self.cache[name] = restaurant
+            return restaurant
+
+    def get_for_update(self, name):
+        """
+        return (database version, restaurant) for a restaurant about to be edited,
+        the restaurant is read from the storage, never from the cache
+        """
+        with self.lock:
+            version = self.storage.version()
+            self.cache.pop(name, None)
+            return version, self.get(name)
+
+    def values(self):
+        """return a list of every restaurant in the database"""
+        with self.lock:
+            if self.complete:
+                self.hits += 1
+            else:
+                self.misses += 1
+                self.cache = {restaurant.name: restaurant for restaurant in self.storage.values()}
+                self.complete = True
+            return list(self.cache.values())
+
+    def summaries(self, names=None):
+        """
+        return a Summary of every restaurant, or of the restaurants in names,
+        without reading or caching any menu items
+        """
+        with self.lock:
+            return self.storage.summaries(names)
+
+    def version(self):
+        """return the version of the database, it goes up with every write"""
+        with self.lock:
+            return self.storage.version()
+
+    def changes(self, since):
+        """
+        return (version, list of (kind, name) changes after version since) and drop
+        the changed restaurants from the cache, the list is None if since is too old
+        """
+        with self.lock:
+            version, changes = self.storage.changes(since)
+            if changes is None:
+                self.invalidate()
+            elif changes:
+                for _, name in changes:
+                    self.cache.pop(name, None)
+                self.complete = False
+        return version, changes
+
+    def save(self, restaurant, old_name=None, version=None):
+        """
+        write a restaurant to the database, if old_name is given the record
+        saved under that name is replaced, if version is given ConflictError
+        is raised when either name was written after that version, and
+        AddressTakenError when one of its addresses belongs to another restaurant
+        """
+        with self.lock:
+            try:
+                self.storage.save(restaurant, old_name, version)
+            except ConflictError:
+                self.cache.pop(old_name, None)
+                self.cache.pop(restaurant.name, None)
+                raise
+            if old_name is not None:
+                self.cache.pop(old_name, None)
+            self.cache[restaurant.name] = restaurant
+        return None
+
+    def save_many(self, restaurants, keep_menus=False, errors=None):
+        """
+        write many restaurants at once, return the number written, with keep_menus
+        a restaurant that is already saved keeps its menus, AddressTakenError is
+        raised and nothing written if an address belongs to another restaurant,
+        or with an errors list that restaurant is skipped and its error appended
+        """
+        with self.lock:
+            try:
+                count = self.storage.save_many(restaurants, keep_menus, errors)
+            finally:
+                self.invalidate()
+        return count
+
+    def add_menu_items(self, items):
+        """
+        add or replace menu items given as (restaurant, menu title, item, price) tuples,
+        return (items written, names of unknown restaurants)
+        """
+        with self.lock:
+            result = self.storage.add_menu_items(items)
+            self.invalidate()
+        return result
+
+    def menu_items(self, names):
+        """return the (restaurant, menu title, item, price) items of the restaurants in names"""
+        with self.lock:
+            return self.storage.menu_items(names)
+
+    def remove_menu_items(self, items):
+        """remove menu items given as (restaurant, menu title, item) tuples, return the number removed"""
+        with self.lock:
+            count = self.storage.remove_menu_items(items)
+            self.invalidate()
+        return count
+
+    def delete(self, name, version=None):
+        """
+        remove a restaurant from the database, if version is given ConflictError
+        is raised when it was written after that version
+        """
+        with self.lock:
+            try:
+                self.storage.delete(name, version)
+            finally:
+                self.cache.pop(name, None)
+        return None
+
+    def find_by_address(self, address):
+        """return the name of the restaurant at address, or None if the address is free"""
+        with self.lock:
+            return self.storage.find_by_address(address)
+
+    def address_free(self, address, name=None):
+        """return True if no restaurant but the one saved under name is at address"""
+        return self.find_by_address(address) in (None, name)
+
+    def delete_address(self, address, name=None):
+        """
+        remove address from the restaurant saved under name, or from the restaurant
+        the address index finds there, a franchise keeps its other locations and any
+        other restaurant is deleted, return the restaurant name or None if no
+        restaurant was there, raise ConflictError if name is not at address
+        """
+        with self.lock:
+            if name is None:
+                name = self.find_by_address(address)
+                if name is None:
+                    return None
+            try:
+                version, restaurant = self.get_for_update(name)
+            except KeyError:
+                raise ConflictError(f'{name} was deleted') from None
+            if address not in restaurant.address:
+                raise ConflictError(f'{name} was moved away from {address}')
+            if restaurant.isfranchise and len(restaurant.address) > 1:
+                restaurant.address.remove(address)
+                self.save(restaurant, version=version)
+            else:
+                self.delete(name, version)
+        return name
+
+    def rebuild_address_index(self):
+        """rebuild the address index from every restaurant in the database"""
+        with self.lock:
+            self.storage.rebuild_address_index()
+        return None
+
+    def search(self, query):
+        """return the sorted names of restaurants whose name, cuisine or menu items contain query"""
+        with self.lock:
+            return self.storage.search(query)
+
+    def item_search(self, query):
+        """
+        return the set of names of restaurants with a menu item containing query,
+        from the ItemIndex brought up to date with the changes since it was built
+        """
+        with self.lock:
+            if self.item_index is not None:
+                version, changes = self.storage.changes(self.item_version)
+                if changes is None:
+                    self.item_index = None  # too far behind, it is built again
+                elif changes:
+                    self.index_items({name for _, name in changes})
+                    self.item_version = version
+            if self.item_index is None:
+                # the version is read first, a write in between is indexed again later
+                version = self.storage.version()
+                self.item_index = ItemIndex()
+                self.index_items([summary.name for summary in self.storage.summaries()])
+                self.item_version = version
+            return self.item_index.search(query)
+
+    def index_items(self, names):
+        """index the menu item names of the restaurants in names, a deleted one leaves the index"""
+        items = {name: [] for name in names}
+        for name, _, item, _ in self.storage.menu_items(list(items)):
+            items[name].append(item)
+        for name, served in items.items():
+            if served:
+                self.item_index.add(name, served)
+            else:
+                self.item_index.remove(name)
+        return None
+
+    def nearest(self, x, y, k=1):
+        """return up to k (distance, name, address) tuples closest to x, y, nearest first"""
+        with self.lock:
+            return self.storage.nearest(x, y, k)
+
+    def open_at(self, minute):
+        """return the sorted names of restaurants open at a minute of the week"""
+        with self.lock:
+            return self.storage.open_at(minute)
+
+    def price_range(self, low, high, cuisine=None, menu=None, item=None):
+        """
+        return the (amount, restaurant, menu title, item, variant) entries priced
+        from low to high cents, cheapest first, menu is a (restaurant, title) pair
+        """
+        with self.lock:
+            return self.storage.price_range(low, high, cuisine, menu, item)
+
+    def price_stats(self, cuisine=None, menu=None, item=None):
+        """return the count, min, lower median and max amount in cents of the filtered entries"""
+        with self.lock:
+            return self.storage.price_stats(cuisine, menu, item)
+
+    def invalidate(self, name=None):
+        """drop one cached restaurant, or the whole cache when no name is given"""
+        with self.lock:
+            if name is None:
+                self.cache.clear()
+            else:
+                self.cache.pop(name, None)
+            self.complete = False
+        return None
+
+    def close(self):
+        """close the storage backend"""
+        with self.lock:
+            self.storage.close()
+        return None
+
+    def stats(self):
+        """return the cache hit and miss counters"""
+        return {'hits': self.hits, 'misses': self.misses, 'cached': len(self.cache)}
@@ -1,17 +1,35 @@
 """
 This module contain classes for building a restaurant object
 
+The classes have __slots__, so an object holds its fields without a
+__dict__. Records pickled before the slots were added still load, their
+state is a plain dict and __setstate__ copies it into the slots.
+
 Written by Wenbin Wu
 """
 
 from dataclasses import dataclass
 
 
+def set_slots(obj, state):
+    """set the slots of obj from pickled state, a (dict, slots) pair or an old __dict__"""
+    if isinstance(state, tuple):
+        dict_state, slot_state = state
+        state = {**(dict_state or {}), **(slot_state or {})}
+    for key, value in state.items():
+        setattr(obj, key, value)
+    return None
+
+
 @dataclass
 class Menu:
+    __slots__ = ('title', 'items')
     title : str
     items : dict  # item : price
 
+    def __setstate__(self, state):
+        set_slots(self, state)
+
     def add_item(self, item, price):
         self.items[item] = price
         return None
@@ -19,6 +37,7 @@ class Menu:
 
 @dataclass
 class Restaurant:
+    __slots__ = ('name', 'cuisine', 'isfranchise', 'address', 'hours', 'menus')
     name : str
     cuisine : str
     isfranchise : bool
@@ -26,7 +45,30 @@ class Restaurant:
     hours : dict  # key: day, value: [open hour, closing hour]
     menus : list  # list of Menu objects
 
+    def __setstate__(self, state):
+        set_slots(self, state)
+
     def add_menu(self, new_menu):
         if isinstance(new_menu, Menu):
             self.menus.append(new_menu)
         return None
+
+    def summary(self):
+        return Summary(
+            self.name, self.cuisine, self.isfranchise, list(self.address),
+            dict(self.hours), [menu.title for menu in self.menus]
+            )
+
+
+@dataclass
+class Summary:
+    __slots__ = ('name', 'cuisine', 'isfranchise', 'address', 'hours', 'menu_titles')
+    name : str
+    cuisine : str
+    isfranchise : bool
+    address : list  # list of address string: 'x, y'
+    hours : dict  # key: day, value: [open hour, closing hour]
+    menu_titles : list  # list of menu titles, without the menu items
+
+    def __setstate__(self, state):
+        set_slots(self, state)
@@ -0,0 +1,128 @@
+"""
+This module contains an inverted n-gram index for as-you-type searching.
+
+Every substring of up to n characters in the indexed text is mapped to
+the keys containing it. A query of n characters or fewer is answered by a
+single posting list lookup, a longer query intersects the posting lists
+of its n-grams and checks the few remaining candidates. When a query
+extends the previous one, the previous result is refined instead of
+searching again.
+
+ItemIndex files menu item names the same way, every distinct item name is
+indexed once and points to the restaurants serving it, so a query finds
+the restaurants with a matching item without reading any menu.
+
+Written by Wenbin Wu
+"""
+
+SEPARATOR = '\x00'  # joins the indexed fields so a query never spans two fields
+
+
+class NGramIndex:
+    """inverted n-gram index over text fields, keys can be any hashable value"""
+    def __init__(self, n=3):
+        self.n = n
+        self.postings = {}  # key: n-gram, value: set of keys
+        self.texts = {}  # key: indexed key, value: lowercased text
+        self.last_query = None
+        self.last_result = None
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __contains__(self, key):
+        return key in self.texts
+
+    def grams(self, text):
+        """return every substring of text up to n characters long"""
+        grams = set()
+        for size in range(1, self.n + 1):
+            for i in range(len(text) - size + 1):
+                gram = text[i:i + size]
+                if SEPARATOR not in gram:
+                    grams.add(gram)
+        return grams
+
+    def add(self, key, *fields):
+        """index the text fields under key, replacing anything indexed for key before"""
+        if key in self.texts:
+            self.remove(key)
+        text = SEPARATOR.join(field.lower() for field in fields)
+        self.texts[key] = text
+        for gram in self.grams(text):
+            self.postings.setdefault(gram, set()).add(key)
+        self.last_query = None
+        return None
+
+    def remove(self, key):
+        """remove key from the index"""
+        text = self.texts.pop(key)
+        for gram in self.grams(text):
+            keys = self.postings[gram]
+            keys.discard(key)
+            if not keys:
+                del self.postings[gram]
+        self.last_query = None
+        return None
+
+    def search(self, query):
+        """return the set of keys whose text contains query, ignoring case"""
+        query = query.lower()
+        if not query:
+            result = set(self.texts)
+        elif self.last_query and query.startswith(self.last_query):
+            # the previous result already holds every key that can match
+            result = {key for key in self.last_result if query in self.texts[key]}
+        elif len(query) <= self.n:
+            result = set(self.postings.get(query, ()))
+        else:
+            grams = {query[i:i + self.n] for i in range(len(query) - self.n + 1)}
+            postings = sorted((self.postings.get(gram, set()) for gram in grams), key=len)
+            candidates = set.intersection(*postings)
+            result = {key for key in candidates if query in self.texts[key]}
+        self.last_query = query
+        self.last_result = result
+        return set(result)
+
+
+class ItemIndex:
+    """n-gram index of menu item names, a search returns the restaurants serving a matching item"""
+    def __init__(self, n=3):
+        self.grams = NGramIndex(n)  # key: item name
+        self.restaurants = {}  # key: item name, value: set of restaurant names
+        self.items = {}  # key: restaurant name, value: set of item names
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, name):
+        return name in self.items
+
+    def add(self, name, items):
+        """index the item names of a restaurant, replacing anything indexed for it before"""
+        self.remove(name)
+        self.items[name] = set(items)
+        for item in self.items[name]:
+            names = self.restaurants.get(item)
+            if names is None:
+                names = self.restaurants[item] = set()
+                self.grams.add(item, item)
+            names.add(name)
+        return None
+
+    def remove(self, name):
+        """remove the items of a restaurant, an item no other restaurant serves leaves the index"""
+        for item in self.items.pop(name, ()):
+            names = self.restaurants[item]
+            names.discard(name)
+            if not names:
+                del self.restaurants[item]
+                self.grams.remove(item)
+        return None
+
+    def search(self, query):
+        """return the set of restaurant names serving an item whose name contains query"""
+        names = set()
+        for item in self.grams.search(query):
+            names |= self.restaurants[item]
+        return names
@@ -0,0 +1,236 @@
+"""
+This module serves the restaurant database as a JSON API over HTTP.
+
+usage: python server.py [-d DATABASE] [--host HOST] [-p PORT] [-w WORKERS]
+
+Endpoints, all GET:
+
+- /search?q=pizza&limit=20: names of restaurants matching a query
+- /nearest?x=50&y=50&k=5: restaurant locations nearest to a point
+- /open?day=friday&time=9:00PM: names of restaurants open at a day and time
+- /restaurants/<name>: a restaurant without its menu items
+- /restaurants/<name>/menus: the menus of a restaurant with their items
+
+limit and k are at least 1 and at most MAX_RESULTS, larger values are cut
+down to it and a missing limit is MAX_RESULTS.
+
+The server runs on asyncio and speaks HTTP/1.1 with keep-alive, so a kiosk
+keeps one connection open for all its requests. Storage reads block, so
+they run in a thread pool, each thread borrowing a repository from a pool
+of open handles instead of opening the database for every request. The
+restaurants are read from the storage of the handle, not through its
+cache, so a restaurant another program writes is served as written and
+the handles do not each end up holding the whole catalog.
+
+Written by Wenbin Wu
+"""
+
+import argparse
+import asyncio
+import json
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+from repository import RestaurantRepository
+from hours import minute_of_week
+
+IDLE_TIMEOUT = 30  # seconds a keep-alive connection may wait for its next request
+MAX_RESULTS = 100  # most names or locations one request returns
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+
+
+class HTTPError(Exception):
+    """an error answered with an HTTP status and a JSON message"""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class RepositoryPool:
+    """a fixed number of open repositories shared by the worker threads"""
+    def __init__(self, database, size):
+        self.repositories = queue.Queue()
+        for _ in range(size):
+            self.repositories.put(RestaurantRepository(database))
+
+    def run(self, function, *args):
+        """call function with a borrowed repository and the args, return its result"""
+        repository = self.repositories.get()
+        try:
+            return function(repository, *args)
+        finally:
+            self.repositories.put(repository)
+
+    def close(self):
+        """close every repository"""
+        while not self.repositories.empty():
+            self.repositories.get().close()
+        return None
+
+
+# ----- endpoints, called on a worker thread with a repository -----
+def result_count(params, name, default):
+    """return the count parameter name, capped at MAX_RESULTS, below 1 is an error"""
+    count = int(params.get(name, default))
+    if count < 1:
+        raise HTTPError(400, f'{name} must be at least 1')
+    return min(count, MAX_RESULTS)
+
+
+def search(repository, params):
+    """names of restaurants whose name, cuisine or menu items contain q"""
+    limit = result_count(params, 'limit', MAX_RESULTS)
+    return repository.search(params.get('q', ''))[:limit]
+
+
+def nearest(repository, params):
+    """the k restaurant locations nearest to x, y"""
+    try:
+        x, y = int(params['x']), int(params['y'])
+    except KeyError:
+        raise HTTPError(400, 'x and y are required') from None
+    rows = repository.nearest(x, y, result_count(params, 'k', 1))
+    return [{'distance': round(d, 2), 'name': name, 'address': address} for d, name, address in rows]
+
+
+def open_at(repository, params):
+    """names of restaurants open at a day and time"""
+    return repository.open_at(minute_of_week(params.get('day', ''), params.get('time', '')))
+
+
+def read_restaurant(repository, name):
+    """return the restaurant saved under name from the storage, bypassing the cache"""
+    with repository.lock:
+        return repository.storage.get(name)
+
+
+def restaurant_detail(repository, name):
+    """a restaurant with its menu titles but without the menu items"""
+    restaurant = read_restaurant(repository, name)
+    return {
+        'name': restaurant.name,
+        'cuisine': restaurant.cuisine,
+        'isfranchise': restaurant.isfranchise,
+        'address': restaurant.address,
+        'hours': restaurant.hours,
+        'menus': [menu.title for menu in restaurant.menus],
+        }
+
+
+def restaurant_menus(repository, name):
+    """the menus of a restaurant with their items"""
+    return [{'title': menu.title, 'items': menu.items} for menu in read_restaurant(repository, name).menus]
+
+
+ROUTES = {'/search': search, '/nearest': nearest, '/open': open_at}
+
+
+class RestaurantServer:
+    """asyncio HTTP server answering JSON requests from a repository pool"""
+    def __init__(self, database, workers=8):
+        self.pool = RepositoryPool(database, workers)
+        self.executor = ThreadPoolExecutor(workers)
+        self.requests = 0
+
+    async def query(self, function, *args):
+        """run an endpoint on a worker thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.pool.run, function, *args)
+
+    async def respond(self, method, target):
+        """return (status, JSON body) for a request"""
+        if method != 'GET':
+            raise HTTPError(405, 'only GET is supported')
+        url = urlsplit(target)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        parts = [unquote(part) for part in url.path.split('/') if part]
+        if url.path in ROUTES:
+            function, args = ROUTES[url.path], (params,)
+        elif len(parts) == 2 and parts[0] == 'restaurants':
+            function, args = restaurant_detail, (parts[1],)
+        elif len(parts) == 3 and parts[0] == 'restaurants' and parts[2] == 'menus':
+            function, args = restaurant_menus, (parts[1],)
+        else:
+            raise HTTPError(404, f'no endpoint {url.path}')
+        try:
+            return 200, await self.query(function, *args)
+        except KeyError:
+            raise HTTPError(404, f'no restaurant named {parts[1]!r}') from None
+        except ValueError as error:
+            raise HTTPError(400, str(error)) from None
+
+    async def handle(self, reader, writer):
+        """answer the requests of one connection until it closes or idles out"""
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line:
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip().lower()
+                if 'content-length' in headers:
+                    await reader.readexactly(int(headers['content-length']))
+                keep_alive = headers.get('connection', '') != 'close' and version == 'HTTP/1.1'
+                keep_alive = keep_alive or headers.get('connection', '') == 'keep-alive'
+
+                try:
+                    status, result = await self.respond(method, target)
+                except HTTPError as error:
+                    status, result = error.status, {'error': str(error)}
+                self.requests += 1
+                body = json.dumps(result).encode()
+                writer.write(
+                    f'HTTP/1.1 {status} {REASONS[status]}\r\n'
+                    'Content-Type: application/json\r\n'
+                    f'Content-Length: {len(body)}\r\n'
+                    f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'.encode()
+                    + body
+                    )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+            pass  # a broken or malformed connection is dropped
+        finally:
+            writer.close()
+        return None
+
+    async def serve(self, host='127.0.0.1', port=8080):
+        """serve until cancelled"""
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f'serving on http://{host}:{port}')
+        async with server:
+            await server.serve_forever()
+        return None
+
+    def close(self):
+        """stop the worker threads and close the repositories"""
+        self.executor.shutdown()
+        self.pool.close()
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve the restaurant database as a JSON API.')
+    parser.add_argument('-d', '--database', default='restaurants', help='database to serve')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('-p', '--port', type=int, default=8080)
+    parser.add_argument('-w', '--workers', type=int, default=8, help='storage threads and handles')
+    args = parser.parse_args()
+
+    restaurant_server = RestaurantServer(args.database, args.workers)
+    try:
+        asyncio.run(restaurant_server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        restaurant_server.close()
@@ -0,0 +1,427 @@
+"""
+This module writes and maps catalog snapshots, immutable files holding the
+rows of the customer restaurant list together with their indexes.
+
+usage: python snapshot.py [-d DATABASE] [-o OUTPUT]
+
+Loading the catalog reads every restaurant summary and builds the rows and
+indexes as Python objects, so every kiosk pays for it at startup and holds
+its own copy. The export step does that work once and writes flat arrays:
+
+- strings: a UTF-8 pool and the offset of every string in it
+- restaurants: string ids of the name, cuisine, menu titles and search
+  text, the first row and the first opening interval of each restaurant,
+  the search text holds the menu item names too
+- rows: the restaurant, the address string id and the x, y columns
+- names: an open addressing hash table from name to restaurant
+- grams: a hash table from n-gram to its posting list of restaurants
+- hours: the opening intervals of each restaurant, and every interval
+  again sorted by start with its restaurant
+- grid: the row keys sorted by the cell of a dense grid, with the offset
+  of every cell
+
+The file is a header, a table of section offsets and the sections, each
+aligned to 8 bytes and in native byte order. A Snapshot maps the file read
+only and casts a memoryview over every section, nothing is copied or
+decoded until a row is drawn, so it opens in milliseconds and the pages
+are shared by every process mapping the same file. Exporting writes a new
+file and renames it over the old one, a process still mapping the old one
+keeps reading it.
+
+A snapshot records the database version it was exported at. The catalog
+uses it as the base of its rows and applies the changes logged since then
+on top, so it does not have to be exported again after every edit.
+
+Written by Wenbin Wu
+"""
+
+import argparse
+import bisect
+import heapq
+import math
+import mmap
+import os
+import struct
+import zlib
+from array import array
+from repository import RestaurantRepository
+from spatial import parse_address
+from search import NGramIndex, SEPARATOR
+from hours import MINUTES_PER_WEEK, closing_minute, week_intervals
+
+try:
+    import numpy
+except ImportError:  # numpy is optional
+    numpy = None
+
+MAGIC = b'RESTSNAP'
+FORMAT_VERSION = 2
+BYTE_ORDER_MARK = 0x01020304  # reads back differently on a machine of the other byte order
+# magic, format, byte order mark, database version, restaurants, rows, n-gram size,
+# longest interval, grid cell size, min cell x, min cell y, grid width, grid height
+HEADER = struct.Struct('=8sIIQIIIIIiiII')
+SECTION = struct.Struct('=QQ')  # offset and length in bytes of a section
+SECTIONS = (  # name and array typecode of every section, in file order
+    ('string_offsets', 'Q'), ('string_data', 'B'),
+    ('names', 'I'), ('cuisines', 'I'), ('menus', 'I'), ('texts', 'I'),
+    ('row_offsets', 'I'), ('interval_offsets', 'I'),
+    ('row_restaurants', 'I'), ('addresses', 'I'), ('xs', 'd'), ('ys', 'd'),
+    ('name_table', 'I'),
+    ('gram_table', 'I'), ('grams', 'I'), ('posting_offsets', 'I'), ('postings', 'I'),
+    ('intervals', 'i'), ('starts', 'i'), ('ends', 'i'), ('owners', 'I'),
+    ('cell_offsets', 'I'), ('cell_rows', 'I'),
+    )
+COLUMN_STRINGS = ('names', 'cuisines', 'addresses', 'menus')  # string ids of the catalog columns
+EXPORT_CHUNK = 500  # restaurants whose menu items are read at a time
+CELL_SIZE = 10  # smallest grid cell, doubled until the grid has few empty cells
+MIN_CELLS = 1024
+
+
+def snapshot_path(database):
+    """return the default snapshot path of a database"""
+    return database + '.snapshot'
+
+
+class StringPool:
+    """UTF-8 strings stored once each, in the order they are first added"""
+    def __init__(self):
+        self.ids = {}  # key: string, value: string id
+        self.offsets = array('Q', [0])
+        self.data = bytearray()
+
+    def add(self, text):
+        """return the id of text, adding it to the pool"""
+        string_id = self.ids.get(text)
+        if string_id is None:
+            string_id = self.ids[text] = len(self.offsets) - 1
+            self.data += text.encode()
+            self.offsets.append(len(self.data))
+        return string_id
+
+
+def hash_table(keys):
+    """
+    return an open addressing table of the crc32 of the encoded keys, a slot
+    holds the index of its key plus one, 0 is an empty slot
+    """
+    size = 8
+    while size < 2 * len(keys):
+        size *= 2
+    table = array('I', bytes(4 * size))
+    mask = size - 1
+    for i, key in enumerate(keys):
+        slot = zlib.crc32(key) & mask
+        while table[slot]:
+            slot = (slot + 1) & mask
+        table[slot] = i + 1
+    return table
+
+
+def export(repository, path):
+    """write a snapshot of every restaurant in the repository to path, return its version"""
+    # the version is read first, a write in between is applied again by the catalog
+    version = repository.version()
+    summaries = [summary for summary in repository.summaries() if summary.address]
+    items = {}  # key: restaurant name, value: the names of its menu items
+    for i in range(0, len(summaries), EXPORT_CHUNK):
+        names = [summary.name for summary in summaries[i:i + EXPORT_CHUNK]]
+        for name, _, item, _ in repository.menu_items(names):
+            items.setdefault(name, []).append(item)
+    columns = {name: array(code) for name, code in SECTIONS}
+    strings = StringPool()
+    indexer = NGramIndex()
+    postings = {}  # key: n-gram, value: array of restaurants
+    entries = []  # (start, end, restaurant) of every opening interval
+    points = []
+    for r, summary in enumerate(summaries):
+        fields = [summary.name, summary.cuisine] + items.get(summary.name, [])
+        text = SEPARATOR.join(field.lower() for field in fields)
+        columns['names'].append(strings.add(summary.name))
+        columns['cuisines'].append(strings.add(summary.cuisine))
+        columns['menus'].append(strings.add(' | '.join(summary.menu_titles)))
+        columns['texts'].append(strings.add(text))
+        for gram in indexer.grams(text):
+            postings.setdefault(gram, array('I')).append(r)
+        columns['row_offsets'].append(len(columns['row_restaurants']))
+        for address in summary.address:
+            x, y = parse_address(address)
+            columns['row_restaurants'].append(r)
+            columns['addresses'].append(strings.add(address))
+            columns['xs'].append(x)
+            columns['ys'].append(y)
+            points.append((x, y))
+        columns['interval_offsets'].append(len(columns['intervals']) // 2)
+        for start, end in week_intervals(summary.hours):
+            columns['intervals'].extend((start, end))
+            entries.append((start, end, r))
+    columns['row_offsets'].append(len(columns['row_restaurants']))
+    columns['interval_offsets'].append(len(columns['intervals']) // 2)
+    columns['name_table'] = hash_table([summary.name.encode() for summary in summaries])
+
+    # ----- n-gram posting lists -----
+    grams = sorted(postings)
+    columns['gram_table'] = hash_table([gram.encode() for gram in grams])
+    columns['posting_offsets'].append(0)
+    for gram in grams:
+        columns['grams'].append(strings.add(gram))
+        columns['postings'].extend(postings[gram])
+        columns['posting_offsets'].append(len(columns['postings']))
+
+    # ----- opening intervals by start -----
+    entries.sort()
+    longest = max((end - start for start, end, _ in entries), default=0)
+    for start, end, r in entries:
+        columns['starts'].append(start)
+        columns['ends'].append(end)
+        columns['owners'].append(r)
+
+    # ----- dense grid, rows sorted by cell -----
+    cell_size, min_cx, min_cy, width, height = CELL_SIZE, 0, 0, 0, 0
+    while points:
+        cells = [(int(x // cell_size), int(y // cell_size)) for x, y in points]
+        min_cx, min_cy = min(cx for cx, _ in cells), min(cy for _, cy in cells)
+        width = max(cx for cx, _ in cells) - min_cx + 1
+        height = max(cy for _, cy in cells) - min_cy + 1
+        if width * height <= max(MIN_CELLS, 2 * len(points)):
+            break
+        cell_size *= 2
+    counts = [0] * (width * height + 1)
+    positions = [(cx - min_cx) * height + cy - min_cy for cx, cy in cells] if points else []
+    for position in positions:
+        counts[position + 1] += 1
+    for i in range(1, len(counts)):
+        counts[i] += counts[i - 1]
+    columns['cell_offsets'] = array('I', counts)
+    cell_rows = array('I', bytes(4 * len(positions)))
+    for key, position in enumerate(positions):
+        cell_rows[counts[position]] = key
+        counts[position] += 1
+    columns['cell_rows'] = cell_rows
+
+    columns['string_offsets'] = strings.offsets
+    columns['string_data'] = array('B', strings.data)
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, BYTE_ORDER_MARK, version, len(summaries), len(points),
+        indexer.n, longest, cell_size, min_cx, min_cy, width, height
+        )
+    offset = HEADER.size + SECTION.size * len(SECTIONS)
+    table = []
+    for name, _ in SECTIONS:
+        offset += -offset % 8
+        length = len(columns[name]) * columns[name].itemsize
+        table.append((offset, length))
+        offset += length
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(header)
+        for entry in table:
+            file.write(SECTION.pack(*entry))
+        for (offset, _), (name, _) in zip(table, SECTIONS):
+            file.write(bytes(offset - file.tell()))
+            columns[name].tofile(file)
+    os.replace(temporary, path)
+    return version
+
+
+class Snapshot:
+    """a snapshot file mapped read only, restaurants and rows are numbered from 0"""
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.map) < HEADER.size + SECTION.size * len(SECTIONS):
+            self.map.close()
+            raise ValueError(f'{path} is not a restaurant snapshot')
+        (
+            magic, format_version, mark, self.version, self.restaurant_count, self.row_count,
+            self.gram_size, self.longest, self.cell_size, self.min_cx, self.min_cy,
+            self.width, self.height
+            ) = HEADER.unpack_from(self.map)
+        if magic != MAGIC or format_version != FORMAT_VERSION or mark != BYTE_ORDER_MARK:
+            self.map.close()
+            raise ValueError(f'{path} is not a restaurant snapshot of this version and byte order')
+        self.view = memoryview(self.map)
+        for i, (name, code) in enumerate(SECTIONS):
+            offset, length = SECTION.unpack_from(self.map, HEADER.size + i * SECTION.size)
+            if offset + length > len(self.map):
+                self.close()
+                raise ValueError(f'{path} is truncated')
+            setattr(self, name, self.view[offset:offset + length].cast(code))
+
+    def __len__(self):
+        return self.row_count
+
+    def close(self):
+        """release the section views and unmap the file"""
+        for name, _ in SECTIONS:
+            if hasattr(self, name):
+                getattr(self, name).release()
+        self.view.release()
+        self.map.close()
+        return None
+
+    def string(self, string_id):
+        """return a string of the pool"""
+        return str(self.string_data[self.string_offsets[string_id]:self.string_offsets[string_id + 1]], 'utf-8')
+
+    def lookup(self, table, string_ids, text):
+        """return the index whose string is text from a hash table over string_ids, or None"""
+        data = text.encode()
+        mask = len(table) - 1
+        slot = zlib.crc32(data) & mask
+        while table[slot]:
+            i = table[slot] - 1
+            string_id = string_ids[i]
+            if self.string_data[self.string_offsets[string_id]:self.string_offsets[string_id + 1]] == data:
+                return i
+            slot = (slot + 1) & mask
+        return None
+
+    # ----- restaurants and rows -----
+    def find(self, name):
+        """return the restaurant named name, None if there is none"""
+        return self.lookup(self.name_table, self.names, name)
+
+    def name(self, restaurant):
+        """return the name of a restaurant"""
+        return self.string(self.names[restaurant])
+
+    def restaurant_of(self, key):
+        """return the restaurant of a row"""
+        return self.row_restaurants[key]
+
+    def rows_of(self, restaurant):
+        """return the row keys of a restaurant"""
+        return range(self.row_offsets[restaurant], self.row_offsets[restaurant + 1])
+
+    def text(self, key, column):
+        """return the text of a catalog column of a row"""
+        if column == 2:
+            return self.string(self.addresses[key])
+        return self.string(getattr(self, COLUMN_STRINGS[column])[self.row_restaurants[key]])
+
+    def row(self, key):
+        """return a row as [name, cuisine, address, menu titles]"""
+        return [self.text(key, column) for column in range(4)]
+
+    def location(self, key):
+        """return the (x, y) point of a row"""
+        return self.xs[key], self.ys[key]
+
+    # ----- search -----
+    def posting(self, gram):
+        """return the restaurants containing an n-gram"""
+        g = self.lookup(self.gram_table, self.grams, gram)
+        if g is None:
+            return ()
+        return self.postings[self.posting_offsets[g]:self.posting_offsets[g + 1]]
+
+    def search(self, query):
+        """return the set of restaurants whose name, cuisine or a menu item contains query, ignoring case"""
+        query = query.lower()
+        if not query:
+            return set(range(self.restaurant_count))
+        if len(query) <= self.gram_size:
+            return set(self.posting(query))
+        n = self.gram_size
+        grams = {query[i:i + n] for i in range(len(query) - n + 1)}
+        postings = sorted((self.posting(gram) for gram in grams), key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+        return {r for r in candidates if query in self.string(self.texts[r])}
+
+    # ----- opening hours -----
+    def intervals_of(self, restaurant):
+        """return the sorted (start, end) opening intervals of a restaurant"""
+        first, last = self.interval_offsets[restaurant], self.interval_offsets[restaurant + 1]
+        bounds = iter(self.intervals[2 * first:2 * last])
+        return list(zip(bounds, bounds))
+
+    def open_intervals(self, minute):
+        """return the positions of the intervals by start that are open at minute"""
+        # an open interval started at most the longest interval before minute
+        first = bisect.bisect_right(self.starts, minute - self.longest)
+        last = bisect.bisect_right(self.starts, minute)
+        return [i for i in range(first, last) if self.ends[i] > minute]
+
+    def open_at(self, minute):
+        """return the set of restaurants open at a minute of the week"""
+        minute %= MINUTES_PER_WEEK
+        return {self.owners[i] for i in self.open_intervals(minute)}
+
+    def closing_within(self, minute, minutes):
+        """return the set of restaurants open at minute that close within the next minutes"""
+        minute %= MINUTES_PER_WEEK
+        candidates = {self.owners[i] for i in self.open_intervals(minute) if self.ends[i] <= minute + minutes}
+        return {r for r in candidates if closing_minute(self.intervals_of(r), minute) <= minute + minutes}
+
+    # ----- locations -----
+    def ring(self, cx, cy, radius):
+        """yield the grid positions of the cells exactly radius cells away from cell cx, cy"""
+        if radius == 0:
+            cells = [(cx, cy)]
+        else:
+            cells = [(i, j) for i in range(cx - radius, cx + radius + 1) for j in (cy - radius, cy + radius)]
+            cells += [(i, j) for j in range(cy - radius + 1, cy + radius) for i in (cx - radius, cx + radius)]
+        for i, j in cells:
+            i, j = i - self.min_cx, j - self.min_cy
+            if 0 <= i < self.width and 0 <= j < self.height:
+                yield i * self.height + j
+
+    def nearest(self, x, y, k=1, hidden=()):
+        """return up to k (distance, key) tuples closest to x, y, nearest first, skipping hidden keys"""
+        if not self.row_count or k < 1:
+            return []
+        cx, cy = int(x // self.cell_size), int(y // self.cell_size)
+        max_radius = max(
+            cx - self.min_cx, self.min_cx + self.width - 1 - cx,
+            cy - self.min_cy, self.min_cy + self.height - 1 - cy
+            )
+        best = []  # max heap of (-distance, key) holding the k closest so far
+        for radius in range(max_radius + 1):
+            for cell in self.ring(cx, cy, radius):
+                for key in self.cell_rows[self.cell_offsets[cell]:self.cell_offsets[cell + 1]]:
+                    if key in hidden:
+                        continue
+                    d = math.hypot(self.xs[key] - x, self.ys[key] - y)
+                    if len(best) < k:
+                        heapq.heappush(best, (-d, key))
+                    elif d < -best[0][0]:
+                        heapq.heapreplace(best, (-d, key))
+            # every point outside the rings searched so far is at least this far away
+            if len(best) == k and -best[0][0] <= radius * self.cell_size:
+                break
+        return sorted((-d, key) for d, key in best)
+
+    def distances(self, x, y):
+        """return the rounded distance from x, y to every row, in key order"""
+        if numpy is not None:
+            xs = numpy.frombuffer(self.xs, dtype=numpy.float64)
+            ys = numpy.frombuffer(self.ys, dtype=numpy.float64)
+            return numpy.round(numpy.hypot(xs - x, ys - y), 2).tolist()
+        hypot = math.hypot
+        return [round(hypot(px - x, py - y), 2) for px, py in zip(self.xs, self.ys)]
+
+
+def open_snapshot(path):
+    """return the Snapshot at path, None if there is no path or no readable snapshot there"""
+    if path is None:
+        return None
+    try:
+        return Snapshot(path)
+    except (OSError, ValueError):
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export a memory-mapped snapshot of the restaurant catalog.')
+    parser.add_argument('-d', '--database', default='restaurants', help='database to export')
+    parser.add_argument('-o', '--output', help='snapshot file, DATABASE.snapshot by default')
+    args = parser.parse_args()
+
+    output = args.output or snapshot_path(args.database)
+    repository = RestaurantRepository(args.database)
+    try:
+        exported = export(repository, output)
+    finally:
+        repository.close()
+    print(f'exported version {exported} of {args.database} to {output}')
@@ -0,0 +1,135 @@
+"""
+This module contains a uniform grid index over restaurant locations.
+
+The x, y plane is split into square cells, each cell holds the keys of
+the locations inside it. Nearest, radius and bounding box queries only
+visit the cells around the query point instead of every location.
+
+Written by Wenbin Wu
+"""
+
+import heapq
+import math
+
+
+def parse_address(address):
+    """convert an address string 'x, y' into a tuple of ints"""
+    x, y = address.split(',')
+    return int(x), int(y)
+
+
+class GridIndex:
+    """uniform grid spatial index, keys can be any hashable value"""
+    def __init__(self, cell_size=10):
+        self.cell_size = cell_size
+        self.cells = {}  # key: (cell x, cell y), value: set of keys
+        self.points = {}  # key: location key, value: (x, y)
+        self.bounds = None  # occupied cell range: [min cx, min cy, max cx, max cy]
+
+    def __len__(self):
+        return len(self.points)
+
+    def __contains__(self, key):
+        return key in self.points
+
+    def cell_of(self, x, y):
+        """return the cell coordinates for a point"""
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def insert(self, key, x, y):
+        """add a location to the index, replacing any previous location for key"""
+        if key in self.points:
+            self.remove(key)
+        cell = self.cell_of(x, y)
+        self.cells.setdefault(cell, set()).add(key)
+        self.points[key] = (x, y)
+        cx, cy = cell
+        if self.bounds is None:
+            self.bounds = [cx, cy, cx, cy]
+        else:
+            self.bounds = [
+                min(self.bounds[0], cx), min(self.bounds[1], cy),
+                max(self.bounds[2], cx), max(self.bounds[3], cy)
+                ]
+        return None
+
+    def remove(self, key):
+        """remove a location from the index"""
+        x, y = self.points.pop(key)
+        cell = self.cell_of(x, y)
+        self.cells[cell].discard(key)
+        if not self.cells[cell]:
+            del self.cells[cell]
+        return None
+
+    def location(self, key):
+        """return the (x, y) point saved for key"""
+        return self.points[key]
+
+    def ring(self, center, radius):
+        """yield the occupied cells exactly radius cells away from center"""
+        cx, cy = center
+        if radius == 0:
+            if center in self.cells:
+                yield center
+            return
+        for i in range(cx - radius, cx + radius + 1):
+            for j in (cy - radius, cy + radius):
+                if (i, j) in self.cells:
+                    yield i, j
+        for j in range(cy - radius + 1, cy + radius):
+            for i in (cx - radius, cx + radius):
+                if (i, j) in self.cells:
+                    yield i, j
+
+    def nearest(self, x, y, k=1):
+        """return up to k (distance, key) tuples closest to x, y, nearest first"""
+        if not self.points or k < 1:
+            return []
+        center = self.cell_of(x, y)
+        min_cx, min_cy, max_cx, max_cy = self.bounds
+        max_radius = max(
+            center[0] - min_cx, max_cx - center[0], center[1] - min_cy, max_cy - center[1]
+            )
+        best = []  # max heap of (-distance, key) holding the k closest so far
+        for radius in range(max_radius + 1):
+            for cell in self.ring(center, radius):
+                for key in self.cells[cell]:
+                    px, py = self.points[key]
+                    d = math.hypot(px - x, py - y)
+                    if len(best) < k:
+                        heapq.heappush(best, (-d, key))
+                    elif d < -best[0][0]:
+                        heapq.heapreplace(best, (-d, key))
+            # every point outside the rings searched so far is at least this far away
+            if len(best) == k and -best[0][0] <= radius * self.cell_size:
+                break
+        return sorted((-d, key) for d, key in best)
+
+    def within_box(self, x1, y1, x2, y2):
+        """return the keys of every location inside the box, edges included"""
+        if not self.points:
+            return []
+        min_cx, min_cy = self.cell_of(min(x1, x2), min(y1, y2))
+        max_cx, max_cy = self.cell_of(max(x1, x2), max(y1, y2))
+        min_cx, min_cy = max(min_cx, self.bounds[0]), max(min_cy, self.bounds[1])
+        max_cx, max_cy = min(max_cx, self.bounds[2]), min(max_cy, self.bounds[3])
+        keys = []
+        for i in range(min_cx, max_cx + 1):
+            for j in range(min_cy, max_cy + 1):
+                for key in self.cells.get((i, j), ()):
+                    px, py = self.points[key]
+                    if min(x1, x2) <= px <= max(x1, x2) and min(y1, y2) <= py <= max(y1, y2):
+                        keys.append(key)
+        return keys
+
+    def within_radius(self, x, y, radius):
+        """return (distance, key) tuples for locations within radius of x, y, nearest first"""
+        results = []
+        for key in self.within_box(x - radius, y - radius, x + radius, y + radius):
+            px, py = self.points[key]
+            d = math.hypot(px - x, py - y)
+            if d <= radius:
+                results.append((d, key))
+        results.sort()
+        return results
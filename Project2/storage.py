@@ -0,0 +1,1209 @@
+"""
+This module contains the storage backends behind RestaurantRepository.
+
+- ShelveStorage: the original dbm shelve, holding binary records, see codec.py
+- SQLiteStorage: restaurants, addresses, hours, menus and items in indexed tables
+- open_storage: pick the backend for a database path
+
+Both backends have the same methods. Search, nearest and open-at queries
+run inside SQLite with the SQLite backend, the shelve backend has to scan
+every record for them. Both keep a summary of every restaurant apart from
+its menu items, so the customer list loads without reading any menu.
+Menu item prices are parsed into (variant, amount) entries for price
+range queries, see prices.py. SQLite stores the entries in an indexed
+table when the items are written, the shelve backend builds a PriceIndex
+on the first price query and drops it on the next write.
+
+Every write bumps the version of the database and logs an ('upsert' or
+'delete', name) change per restaurant it touched, so an open catalog can
+fetch only the restaurants changed since the version it loaded. The last
+CHANGE_LOG_SIZE changes are kept, a client further behind reloads. The
+shelve backend also writes the version to DATABASE.version, so asking for
+it, or for the changes of a client that is up to date, does not open the
+change log.
+
+Many programs may open the same database, say an admin and a few kiosks.
+The shelve backend takes a file lock around every shelve it opens, shared
+for reads and exclusive for writes, see locks.py. SQLite locks the file
+itself and lets readers go on during a write in WAL mode. A save or delete
+given the version its restaurant was read at raises ConflictError when
+someone else wrote that restaurant since, instead of overwriting it.
+
+An address belongs to one restaurant. Both backends keep an index from
+address to restaurant, a save checks the addresses it writes against that
+index while it holds the write lock and raises AddressTakenError if one is
+already another restaurant's, so two admins can not claim the same place.
+save_many checks every restaurant of a batch the same way, against the
+store and the restaurants before it in the batch, and writes nothing if
+one is taken, unless it is given a list to report the taken ones in.
+
+Written by Wenbin Wu
+"""
+
+import dbm
+import math
+import os
+import shelve
+import sqlite3
+from contextlib import contextmanager
+from restaurant import *
+from hours import MINUTES_PER_DAY, week_intervals
+from spatial import parse_address
+from prices import PriceIndex, parse_price
+from locks import FileLock
+from codec import decode, encode_restaurant, encode_summary
+
+SQLITE_SUFFIXES = ('.sqlite', '.sqlite3')  # restaurants.db is taken by an old dbm file
+CHANGE_LOG_SIZE = 10_000  # changes kept for clients catching up
+
+
+def open_storage(database):
+    """return the storage backend for a database path"""
+    if database.endswith(SQLITE_SUFFIXES):
+        return SQLiteStorage(database)
+    return ShelveStorage(database)
+
+
+class ConflictError(Exception):
+    """a restaurant was written by someone else after the version a write was based on"""
+
+
+class AddressTakenError(Exception):
+    """an address being saved belongs to another restaurant"""
+    def __init__(self, address, owner, name=None):
+        Exception.__init__(self, f'{address} is taken by {owner}')
+        self.address = address
+        self.owner = owner
+        self.name = name  # the restaurant being saved
+
+
+def check_addresses(restaurant, old_name, owner_of):
+    """
+    raise AddressTakenError if an address of restaurant belongs to a restaurant other
+    than itself or old_name, owner_of returns the name at an address or None
+    """
+    for address in restaurant.address:
+        owner = owner_of(address)
+        if owner is not None and owner not in (restaurant.name, old_name):
+            raise AddressTakenError(address, owner, restaurant.name)
+    return None
+
+
+def check_batch(restaurants, owner_of, addresses_of, errors=None):
+    """
+    return the restaurants of a batch that can be saved in order, each checked as
+    save checks it against the saved owners and the restaurants before it,
+    owner_of returns the saved name at an address and addresses_of the saved
+    addresses of a name, a taken address raises AddressTakenError, or with an
+    errors list the restaurant is left out and its error appended
+    """
+    owners = {}  # key: address, value: its owner once the batch so far is written, None if freed
+    written = {}  # key: name, value: addresses once the batch so far is written
+
+    def owner(address):
+        return owners[address] if address in owners else owner_of(address)
+
+    accepted = []
+    for restaurant in restaurants:
+        try:
+            check_addresses(restaurant, None, owner)
+        except AddressTakenError as error:
+            if errors is None:
+                raise
+            errors.append(error)
+            continue
+        old = written[restaurant.name] if restaurant.name in written else addresses_of(restaurant.name)
+        for address in old:
+            if owner(address) == restaurant.name:
+                owners[address] = None
+        for address in restaurant.address:
+            owners[address] = restaurant.name
+        written[restaurant.name] = restaurant.address
+        accepted.append(restaurant)
+    return accepted
+
+
+class ShelveStorage:
+    """
+    restaurant records in a shelve, with a second shelve indexing the addresses,
+    a third holding the restaurant summaries and a fourth the change log, every
+    shelve is opened under a file lock, shared for reading and exclusive for writing
+    """
+    def __init__(self, database):
+        self.database = database
+        self.address_database = database + '_addresses'  # key: address, value: restaurant name
+        self.summary_database = database + '_summaries'  # key: restaurant name, value: Summary
+        # key: version as text, value: (kind, restaurant name), plus 'version' and 'first'
+        self.change_database = database + '_changes'
+        # the version as text, read without opening the change log, which is slow to open
+        self.version_file = database + '.version'
+        self.lock = FileLock(database + '.lock')
+        if not os.path.exists(self.version_file):
+            with self.lock.exclusive(), shelve.open(self.change_database) as changes:
+                self.write_version(changes.get('version', 0))
+        if None in (dbm.whichdb(self.address_database), dbm.whichdb(self.summary_database)):
+            with self.lock.exclusive():  # checked again, another program may have built them
+                if dbm.whichdb(self.address_database) is None:
+                    self.rebuild_address_index()
+                if dbm.whichdb(self.summary_database) is None:
+                    self.rebuild_summaries()
+        self.price_index = None  # PriceIndex built on the first price query
+        self.price_version = None  # database version the PriceIndex was built at
+
+    def __contains__(self, name):
+        with self.lock.shared(), shelve.open(self.database) as db:
+            return name in db
+
+    def get(self, name):
+        """return the restaurant saved under name, raise KeyError if there is none"""
+        with self.lock.shared(), shelve.open(self.database) as db:
+            return decode(db[name])
+
+    def values(self):
+        """return a list of every restaurant"""
+        with self.lock.shared(), shelve.open(self.database) as db:
+            return [decode(record) for record in db.values()]
+
+    def summaries(self, names=None):
+        """return a list of every restaurant summary, or of the restaurants in names"""
+        with self.lock.shared(), shelve.open(self.summary_database) as summaries:
+            if names is None:
+                return [decode(record) for record in summaries.values()]
+            return [decode(summaries[name]) for name in names if name in summaries]
+
+    def version(self):
+        """return the version of the database, the number of changes ever logged"""
+        with self.lock.shared():
+            try:
+                with open(self.version_file) as file:
+                    return int(file.read())
+            except (OSError, ValueError):
+                with shelve.open(self.change_database) as changes:
+                    return changes.get('version', 0)
+
+    def write_version(self, version):
+        """write the version file, the write lock is held"""
+        with open(self.version_file, 'w') as file:
+            file.write(str(version))
+        return None
+
+    def changes(self, since):
+        """
+        return (version, list of (kind, name) changes after version since), the
+        list is None if the changes after since are no longer kept
+        """
+        with self.lock.shared():
+            version = self.version()
+            if since == version:  # the usual answer of a poll, without opening the log
+                return version, []
+            with shelve.open(self.change_database) as changes:
+                version = changes.get('version', 0)
+                if since < changes.get('first', 1) - 1:
+                    return version, None
+                return version, [changes[str(v)] for v in range(since + 1, version + 1)]
+
+    def log_changes(self, changes, records):
+        """append (kind, name) records to an open change log and drop the oldest"""
+        start = changes.get('version', 0)
+        old_first = changes.get('first', 1)
+        version = start + len(records)
+        first = max(old_first, version - CHANGE_LOG_SIZE + 1)
+        for v in range(old_first, min(first, start + 1)):
+            del changes[str(v)]
+        for v, record in enumerate(records, start + 1):
+            if v >= first:
+                changes[str(v)] = record
+        changes['first'] = first
+        changes['version'] = version
+        self.write_version(version)
+        return None
+
+    def check_version(self, changes, names, version):
+        """
+        raise ConflictError if a restaurant in names changed after version in an
+        open change log, or if the log no longer reaches back to version
+        """
+        if version is None:
+            return None
+        if version < changes.get('first', 1) - 1:
+            raise ConflictError(f'the changes since version {version} are no longer kept')
+        for v in range(version + 1, changes.get('version', 0) + 1):
+            _, name = changes[str(v)]
+            if name in names:
+                raise ConflictError(f'{name} was changed after version {version}')
+        return None
+
+    def open_all(self):
+        """open the restaurants, address index, summaries and change log shelves for writing"""
+        return (
+            shelve.open(self.database), shelve.open(self.address_database),
+            shelve.open(self.summary_database), shelve.open(self.change_database)
+            )
+
+    def save(self, restaurant, old_name=None, version=None):
+        """
+        write a restaurant, replacing the record saved under old_name if given, with
+        version raise ConflictError if either name was written after that version,
+        raise AddressTakenError if one of its addresses belongs to another restaurant
+        """
+        with self.lock.exclusive():
+            db, index, summaries, changes = self.open_all()
+            with db, index, summaries, changes:
+                self.check_version(changes, {old_name, restaurant.name}, version)
+                check_addresses(restaurant, old_name, index.get)
+                records = []
+                if old_name is not None and old_name != restaurant.name and old_name in db:
+                    records.append(('delete', old_name))
+                for name in {old_name, restaurant.name} - {None}:
+                    if name in db:
+                        self.unindex(index, decode(db[name]))
+                        del db[name]
+                        summaries.pop(name, None)
+                db[restaurant.name] = encode_restaurant(restaurant)
+                summaries[restaurant.name] = encode_summary(restaurant.summary())
+                for address in restaurant.address:
+                    index[address] = restaurant.name
+                self.log_changes(changes, records + [('upsert', restaurant.name)])
+        return None
+
+    def save_many(self, restaurants, keep_menus=False, errors=None):
+        """
+        write many restaurants at once, return the number written, with keep_menus
+        a restaurant that is already saved keeps its menus, a taken address raises
+        AddressTakenError before anything is written, or with an errors list the
+        restaurant is skipped and its error appended
+        """
+        names = []
+        with self.lock.exclusive():
+            db, index, summaries, changes = self.open_all()
+            with db, index, summaries, changes:
+                # checked before the first write, the shelves can not roll back
+                restaurants = check_batch(
+                    restaurants, index.get,
+                    lambda name: decode(summaries[name]).address if name in summaries else [],
+                    errors
+                    )
+                for restaurant in restaurants:
+                    if restaurant.name in db:
+                        old = decode(db[restaurant.name])
+                        self.unindex(index, old)
+                        if keep_menus:
+                            restaurant.menus = old.menus
+                    db[restaurant.name] = encode_restaurant(restaurant)
+                    summaries[restaurant.name] = encode_summary(restaurant.summary())
+                    for address in restaurant.address:
+                        index[address] = restaurant.name
+                    names.append(restaurant.name)
+                self.log_changes(changes, [('upsert', name) for name in names])
+        return len(names)
+
+    def add_menu_items(self, items):
+        """
+        add or replace menu items given as (restaurant, menu title, item, price) tuples,
+        a missing menu is created, return (items written, names of unknown restaurants)
+        """
+        by_restaurant = {}
+        for restaurant, title, name, price in items:
+            by_restaurant.setdefault(restaurant, []).append((title, name, price))
+        count = 0
+        missing = []
+        with self.lock.exclusive():
+            db, summaries = shelve.open(self.database), shelve.open(self.summary_database)
+            with db, summaries, shelve.open(self.change_database) as changes:
+                for restaurant_name, restaurant_items in by_restaurant.items():
+                    if restaurant_name not in db:
+                        missing.append(restaurant_name)
+                        continue
+                    restaurant = decode(db[restaurant_name])
+                    menus = {menu.title: menu for menu in restaurant.menus}
+                    for title, name, price in restaurant_items:
+                        if title not in menus:
+                            menus[title] = Menu(title, {})
+                            restaurant.add_menu(menus[title])
+                        menus[title].add_item(name, price)
+                        count += 1
+                    db[restaurant_name] = encode_restaurant(restaurant)
+                    summaries[restaurant_name] = encode_summary(restaurant.summary())
+                missing_names = set(missing)
+                self.log_changes(changes, [
+                    ('upsert', name) for name in by_restaurant if name not in missing_names
+                    ])
+        return count, sorted(missing)
+
+    def menu_items(self, names):
+        """return the (restaurant, menu title, item, price) items of the restaurants in names"""
+        items = []
+        with self.lock.shared(), shelve.open(self.database) as db:
+            for name in names:
+                if name in db:
+                    for menu in decode(db[name]).menus:
+                        items += [(name, menu.title, item, price) for item, price in menu.items.items()]
+        return items
+
+    def remove_menu_items(self, items):
+        """remove menu items given as (restaurant, menu title, item) tuples, return the number removed"""
+        by_restaurant = {}
+        for restaurant, title, name in items:
+            by_restaurant.setdefault(restaurant, []).append((title, name))
+        count = 0
+        records = []
+        with self.lock.exclusive():
+            db, summaries = shelve.open(self.database), shelve.open(self.summary_database)
+            with db, summaries, shelve.open(self.change_database) as changes:
+                for restaurant_name, restaurant_items in by_restaurant.items():
+                    if restaurant_name not in db:
+                        continue
+                    restaurant = decode(db[restaurant_name])
+                    menus = {menu.title: menu for menu in restaurant.menus}
+                    removed = 0
+                    for title, name in restaurant_items:
+                        if title in menus and menus[title].items.pop(name, None) is not None:
+                            removed += 1
+                    if removed:
+                        db[restaurant_name] = encode_restaurant(restaurant)
+                        summaries[restaurant_name] = encode_summary(restaurant.summary())
+                        records.append(('upsert', restaurant_name))
+                        count += removed
+                self.log_changes(changes, records)
+        return count
+
+    def delete(self, name, version=None):
+        """
+        remove a restaurant, raise KeyError if there is none, with version raise
+        ConflictError if it was written after that version
+        """
+        with self.lock.exclusive():
+            db, index, summaries, changes = self.open_all()
+            with db, index, summaries, changes:
+                self.check_version(changes, {name}, version)
+                self.unindex(index, decode(db[name]))
+                del db[name]
+                summaries.pop(name, None)
+                self.log_changes(changes, [('delete', name)])
+        return None
+
+    def unindex(self, index, restaurant):
+        """remove the addresses of restaurant from an open address index"""
+        for address in restaurant.address:
+            if index.get(address) == restaurant.name:
+                del index[address]
+        return None
+
+    def find_by_address(self, address):
+        """return the name of the restaurant at address, or None if the address is free"""
+        with self.lock.shared(), shelve.open(self.address_database) as index:
+            return index.get(address)
+
+    def rebuild_address_index(self):
+        """rebuild the address index from every restaurant in the database"""
+        with self.lock.exclusive():
+            db, index = shelve.open(self.database), shelve.open(self.address_database, 'n')
+            with db, index:
+                for name, record in db.items():
+                    for address in decode(record).address:
+                        index[address] = name
+        return None
+
+    def rebuild_summaries(self):
+        """rebuild the summaries from every restaurant in the database"""
+        with self.lock.exclusive():
+            db, summaries = shelve.open(self.database), shelve.open(self.summary_database, 'n')
+            with db, summaries:
+                for name, record in db.items():
+                    summaries[name] = encode_summary(decode(record).summary())
+        return None
+
+    def search(self, query):
+        """return the sorted names of restaurants whose name, cuisine or menu items contain query"""
+        query = query.lower()
+        names = []
+        for restaurant in self.values():
+            texts = [restaurant.name, restaurant.cuisine]
+            texts += [item for menu in restaurant.menus for item in menu.items]
+            if any(query in text.lower() for text in texts):
+                names.append(restaurant.name)
+        return sorted(names)
+
+    def nearest(self, x, y, k=1):
+        """return up to k (distance, name, address) tuples closest to x, y, nearest first"""
+        locations = []
+        for restaurant in self.values():
+            for address in restaurant.address:
+                px, py = parse_address(address)
+                locations.append((math.hypot(px - x, py - y), restaurant.name, address))
+        locations.sort()
+        return locations[:k]
+
+    def open_at(self, minute):
+        """return the sorted names of restaurants open at a minute of the week"""
+        names = []
+        for restaurant in self.summaries():
+            for start, end in week_intervals(restaurant.hours):
+                if start <= minute < end:
+                    names.append(restaurant.name)
+                    break
+        return sorted(names)
+
+    def prices(self):
+        """
+        return the PriceIndex of every restaurant, building it again if the database
+        was written since, by this or any other program
+        """
+        with self.lock.shared():
+            version = self.version()
+            if self.price_index is None or self.price_version != version:
+                self.price_index = PriceIndex()
+                self.price_index.add_many(self.values())
+                self.price_version = version
+        return self.price_index
+
+    def price_range(self, low, high, cuisine=None, menu=None, item=None):
+        """
+        return the (amount, restaurant, menu title, item, variant) entries priced
+        from low to high cents, cheapest first, menu is a (restaurant, title) pair
+        """
+        return self.prices().price_range(low, high, cuisine, menu, item)
+
+    def price_stats(self, cuisine=None, menu=None, item=None):
+        """return the count, min, lower median and max amount in cents of the filtered entries"""
+        return self.prices().price_stats(cuisine, menu, item)
+
+    def close(self):
+        """nothing to close, every method opens and closes the shelve itself"""
+        return None
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS restaurants (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    cuisine TEXT NOT NULL,
+    isfranchise INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS restaurants_cuisine ON restaurants (cuisine);
+
+CREATE TABLE IF NOT EXISTS addresses (
+    restaurant_id INTEGER NOT NULL REFERENCES restaurants (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    address TEXT NOT NULL,
+    x INTEGER NOT NULL,
+    y INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS addresses_restaurant ON addresses (restaurant_id);
+CREATE INDEX IF NOT EXISTS addresses_address ON addresses (address);
+CREATE INDEX IF NOT EXISTS addresses_xy ON addresses (x, y);
+
+-- the database itself rejects an address of another restaurant, the index above
+-- is not UNIQUE because a restaurant may list one address twice and databases
+-- written before the check may already hold taken addresses, which stay readable
+CREATE TRIGGER IF NOT EXISTS addresses_taken BEFORE INSERT ON addresses
+WHEN EXISTS (SELECT 1 FROM addresses WHERE address = NEW.address AND restaurant_id != NEW.restaurant_id) BEGIN
+    SELECT RAISE(ABORT, 'address taken');
+END;
+
+CREATE TABLE IF NOT EXISTS hours (
+    restaurant_id INTEGER NOT NULL REFERENCES restaurants (id) ON DELETE CASCADE,
+    day TEXT NOT NULL,
+    opening TEXT NOT NULL,
+    closing TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS hours_restaurant ON hours (restaurant_id);
+
+CREATE TABLE IF NOT EXISTS open_intervals (
+    restaurant_id INTEGER NOT NULL REFERENCES restaurants (id) ON DELETE CASCADE,
+    start_minute INTEGER NOT NULL,
+    end_minute INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS open_intervals_restaurant ON open_intervals (restaurant_id);
+CREATE INDEX IF NOT EXISTS open_intervals_start ON open_intervals (start_minute, end_minute);
+
+CREATE TABLE IF NOT EXISTS menus (
+    id INTEGER PRIMARY KEY,
+    restaurant_id INTEGER NOT NULL REFERENCES restaurants (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    title TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS menus_restaurant ON menus (restaurant_id);
+
+CREATE TABLE IF NOT EXISTS items (
+    menu_id INTEGER NOT NULL REFERENCES menus (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    price TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS items_menu_name ON items (menu_id, name);
+CREATE INDEX IF NOT EXISTS items_name ON items (name);
+
+CREATE TABLE IF NOT EXISTS prices (
+    menu_id INTEGER NOT NULL REFERENCES menus (id) ON DELETE CASCADE,
+    item TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    amount INTEGER NOT NULL  -- cents
+);
+CREATE INDEX IF NOT EXISTS prices_amount ON prices (amount);
+CREATE INDEX IF NOT EXISTS prices_menu ON prices (menu_id, item);
+CREATE INDEX IF NOT EXISTS prices_item ON prices (item COLLATE NOCASE, amount);
+
+-- how many price entries of each amount every group holds, and its total, kept by
+-- insert_prices and the triggers below, a group is every entry ('all', '') or a
+-- cuisine, the entries of a menu or an item are few and read off their indexes
+CREATE TABLE IF NOT EXISTS price_counts (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (kind, key, amount)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS price_totals (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (kind, key)
+) WITHOUT ROWID;
+
+-- the two groups of every price entry
+CREATE VIEW IF NOT EXISTS price_groups AS
+SELECT p.rowid AS id, p.menu_id, m.restaurant_id, 'all' AS kind, '' AS key, p.amount
+    FROM prices p JOIN menus m ON m.id = p.menu_id
+UNION ALL SELECT p.rowid, p.menu_id, m.restaurant_id, 'cuisine', r.cuisine, p.amount
+    FROM prices p JOIN menus m ON m.id = p.menu_id JOIN restaurants r ON r.id = m.restaurant_id;
+
+-- inserting (kind, key, amount, delta) into price_changes adds delta to both counts
+CREATE VIEW IF NOT EXISTS price_changes AS SELECT kind, key, amount, count AS delta FROM price_counts;
+
+CREATE TRIGGER IF NOT EXISTS price_changes_insert INSTEAD OF INSERT ON price_changes BEGIN
+    INSERT INTO price_counts (kind, key, amount, count) VALUES (NEW.kind, NEW.key, NEW.amount, NEW.delta)
+        ON CONFLICT (kind, key, amount) DO UPDATE SET count = count + excluded.count;
+    DELETE FROM price_counts
+        WHERE kind = NEW.kind AND key = NEW.key AND amount = NEW.amount AND count = 0;
+    INSERT INTO price_totals (kind, key, count) VALUES (NEW.kind, NEW.key, NEW.delta)
+        ON CONFLICT (kind, key) DO UPDATE SET count = count + excluded.count;
+    DELETE FROM price_totals WHERE kind = NEW.kind AND key = NEW.key AND count = 0;
+END;
+
+-- a cascade deletes the parent row first, the trigger of the deleted parent
+-- has already taken the entries out, so the child triggers check their parent
+CREATE TRIGGER IF NOT EXISTS prices_delete AFTER DELETE ON prices
+WHEN EXISTS (SELECT 1 FROM menus WHERE id = OLD.menu_id) BEGIN
+    INSERT INTO price_changes SELECT kind, key, OLD.amount, -1 FROM (
+        SELECT 'all' AS kind, '' AS key
+        UNION ALL SELECT 'cuisine', r.cuisine
+            FROM menus m JOIN restaurants r ON r.id = m.restaurant_id WHERE m.id = OLD.menu_id
+        );
+END;
+
+CREATE TRIGGER IF NOT EXISTS menus_delete BEFORE DELETE ON menus
+WHEN EXISTS (SELECT 1 FROM restaurants WHERE id = OLD.restaurant_id) BEGIN
+    INSERT INTO price_changes SELECT kind, key, amount, -count(*) FROM price_groups
+        WHERE menu_id = OLD.id GROUP BY kind, key, amount;
+END;
+
+CREATE TRIGGER IF NOT EXISTS restaurants_delete BEFORE DELETE ON restaurants BEGIN
+    INSERT INTO price_changes SELECT kind, key, amount, -count(*) FROM price_groups
+        WHERE restaurant_id = OLD.id GROUP BY kind, key, amount;
+END;
+
+CREATE TRIGGER IF NOT EXISTS restaurants_cuisine AFTER UPDATE OF cuisine ON restaurants
+WHEN OLD.cuisine IS NOT NEW.cuisine BEGIN
+    INSERT INTO price_changes SELECT 'cuisine', OLD.cuisine, p.amount, -count(*)
+        FROM prices p JOIN menus m ON m.id = p.menu_id WHERE m.restaurant_id = NEW.id GROUP BY p.amount;
+    INSERT INTO price_changes SELECT 'cuisine', NEW.cuisine, p.amount, count(*)
+        FROM prices p JOIN menus m ON m.id = p.menu_id WHERE m.restaurant_id = NEW.id GROUP BY p.amount;
+END;
+
+CREATE TABLE IF NOT EXISTS changes (
+    version INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,  -- 'upsert' or 'delete'
+    name TEXT NOT NULL
+);
+'''
+
+
+class SQLiteStorage:
+    """restaurants normalized into indexed SQLite tables"""
+    def __init__(self, database):
+        self.database = database
+        # the repository lock serializes access, the worker thread may share the connection
+        self.connection = sqlite3.connect(database, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute('PRAGMA synchronous = NORMAL')
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        self.connection.executescript(SCHEMA)
+        # databases written before the prices table existed get their prices parsed once
+        missing_prices = self.connection.execute(
+            'SELECT NOT EXISTS (SELECT 1 FROM prices) AND EXISTS (SELECT 1 FROM items)'
+            ).fetchone()[0]
+        if missing_prices:
+            self.rebuild_prices()
+        # and databases written before the price counts existed get them counted once
+        missing_counts = self.connection.execute(
+            'SELECT NOT EXISTS (SELECT 1 FROM price_totals) AND EXISTS (SELECT 1 FROM prices)'
+            ).fetchone()[0]
+        if missing_counts:
+            self.rebuild_price_counts()
+
+    @contextmanager
+    def snapshot(self):
+        """run the queries of a with block in one read transaction, on one version of the data"""
+        if self.connection.in_transaction:
+            yield
+            return
+        self.connection.execute('BEGIN')
+        try:
+            yield
+        finally:
+            self.connection.commit()
+
+    def __contains__(self, name):
+        row = self.connection.execute(
+            'SELECT 1 FROM restaurants WHERE name = ?', (name,)
+            ).fetchone()
+        return row is not None
+
+    def get(self, name):
+        """return the restaurant saved under name, raise KeyError if there is none"""
+        row = self.connection.execute(
+            'SELECT id FROM restaurants WHERE name = ?', (name,)
+            ).fetchone()
+        if row is None:
+            raise KeyError(name)
+        return self.restaurants('WHERE r.id = ?', row)[0]
+
+    def values(self):
+        """return a list of every restaurant"""
+        return self.restaurants()
+
+    def summaries(self, names=None):
+        """
+        return a list of every restaurant summary, or of the restaurants in names,
+        the items table is not read
+        """
+        if names is None:
+            return self.summary_rows()
+        names = list(names)
+        summaries = []
+        for i in range(0, len(names), 500):
+            chunk = names[i:i + 500]
+            summaries += self.summary_rows(f'WHERE r.name IN ({", ".join("?" * len(chunk))})', chunk)
+        return summaries
+
+    def summary_rows(self, where='', params=()):
+        """build the summaries matching an optional WHERE clause on restaurants r"""
+        with self.snapshot():
+            summaries = {}
+            for id, name, cuisine, isfranchise in self.connection.execute(
+                    f'SELECT r.id, r.name, r.cuisine, r.isfranchise FROM restaurants r {where} '
+                    'ORDER BY r.id', params):
+                summaries[id] = Summary(name, cuisine, bool(isfranchise), [], {}, [])
+            if not summaries:
+                return []
+            # without a WHERE clause the child tables are read whole, without joins
+            join = f'JOIN restaurants r ON r.id = restaurant_id {where}' if where else ''
+            for id, address in self.connection.execute(
+                    f'SELECT restaurant_id, address FROM addresses {join} '
+                    'ORDER BY restaurant_id, position', params):
+                summaries[id].address.append(address)
+            for id, day, opening, closing in self.connection.execute(
+                    f'SELECT restaurant_id, day, opening, closing FROM hours {join} '
+                    'ORDER BY hours.rowid', params):
+                summaries[id].hours[day] = [opening, closing]
+            for id, title in self.connection.execute(
+                    f'SELECT restaurant_id, title FROM menus {join} '
+                    'ORDER BY restaurant_id, position', params):
+                summaries[id].menu_titles.append(title)
+            return list(summaries.values())
+
+    def version(self):
+        """return the version of the database, the number of changes ever logged"""
+        return self.connection.execute('SELECT coalesce(max(version), 0) FROM changes').fetchone()[0]
+
+    def changes(self, since):
+        """
+        return (version, list of (kind, name) changes after version since), the
+        list is None if the changes after since are no longer kept
+        """
+        with self.snapshot():
+            first = self.connection.execute('SELECT min(version) FROM changes').fetchone()[0]
+            if first is not None and since < first - 1:
+                return self.version(), None
+            rows = self.connection.execute(
+                'SELECT version, kind, name FROM changes WHERE version > ? ORDER BY version', (since,)
+                ).fetchall()
+            return (rows[-1][0] if rows else since), [(kind, name) for _, kind, name in rows]
+
+    def log_changes(self, records):
+        """log (kind, name) records and drop the oldest, the caller owns the transaction"""
+        self.connection.executemany('INSERT INTO changes (kind, name) VALUES (?, ?)', records)
+        self.connection.execute(
+            'DELETE FROM changes WHERE version <= (SELECT max(version) FROM changes) - ?',
+            (CHANGE_LOG_SIZE,)
+            )
+        return None
+
+    def restaurants(self, where='', params=()):
+        """build the restaurants matching an optional WHERE clause on restaurants r"""
+        with self.snapshot():
+            restaurants = {}
+            for id, name, cuisine, isfranchise in self.connection.execute(
+                    f'SELECT r.id, r.name, r.cuisine, r.isfranchise FROM restaurants r {where} '
+                    'ORDER BY r.id', params):
+                restaurants[id] = Restaurant(name, cuisine, bool(isfranchise), [], {}, [])
+            if not restaurants:
+                return []
+            # the child tables are read with one query each, joined back on restaurant id
+            for id, address in self.connection.execute(
+                    'SELECT a.restaurant_id, a.address FROM addresses a '
+                    f'JOIN restaurants r ON r.id = a.restaurant_id {where} '
+                    'ORDER BY a.restaurant_id, a.position', params):
+                restaurants[id].address.append(address)
+            for id, day, opening, closing in self.connection.execute(
+                    'SELECT h.restaurant_id, h.day, h.opening, h.closing FROM hours h '
+                    f'JOIN restaurants r ON r.id = h.restaurant_id {where} '
+                    'ORDER BY h.rowid', params):
+                restaurants[id].hours[day] = [opening, closing]
+            menus = {}
+            for menu_id, id, title in self.connection.execute(
+                    'SELECT m.id, m.restaurant_id, m.title FROM menus m '
+                    f'JOIN restaurants r ON r.id = m.restaurant_id {where} '
+                    'ORDER BY m.restaurant_id, m.position', params):
+                menus[menu_id] = Menu(title, {})
+                restaurants[id].menus.append(menus[menu_id])
+            for menu_id, name, price in self.connection.execute(
+                    'SELECT i.menu_id, i.name, i.price FROM items i '
+                    'JOIN menus m ON m.id = i.menu_id '
+                    f'JOIN restaurants r ON r.id = m.restaurant_id {where} '
+                    'ORDER BY i.menu_id, i.position', params):
+                menus[menu_id].add_item(name, price)
+            return list(restaurants.values())
+
+    def insert(self, restaurant):
+        """insert a restaurant and its child rows, the caller owns the transaction"""
+        cursor = self.connection.execute(
+            'INSERT INTO restaurants (name, cuisine, isfranchise) VALUES (?, ?, ?)',
+            (restaurant.name, restaurant.cuisine, int(restaurant.isfranchise))
+            )
+        id = cursor.lastrowid
+        self.insert_details(id, restaurant)
+        prices = []
+        for position, menu in enumerate(restaurant.menus):
+            cursor = self.connection.execute(
+                'INSERT INTO menus (restaurant_id, position, title) VALUES (?, ?, ?)',
+                (id, position, menu.title)
+                )
+            menu_id = cursor.lastrowid
+            self.connection.executemany(
+                'INSERT INTO items (menu_id, position, name, price) VALUES (?, ?, ?, ?)',
+                [
+                    (menu_id, position, name, price)
+                    for position, (name, price) in enumerate(menu.items.items())
+                    ]
+                )
+            prices += [(menu_id, name, price) for name, price in menu.items.items()]
+        self.insert_prices(prices)
+        return id
+
+    def insert_prices(self, items):
+        """parse and insert the prices of (menu id, item, price) tuples"""
+        last = self.connection.execute('SELECT coalesce(max(rowid), 0) FROM prices').fetchone()[0]
+        self.connection.executemany(
+            'INSERT INTO prices (menu_id, item, variant, amount) VALUES (?, ?, ?, ?)',
+            [
+                (menu_id, name, variant, amount)
+                for menu_id, name, price in items
+                for variant, amount in parse_price(price)
+                ]
+            )
+        # the new entries are counted here in one pass, a trigger per entry was several
+        # times slower on bulk writes, counts only go up so nothing is deleted
+        self.connection.execute(
+            'INSERT INTO price_counts SELECT kind, key, amount, count(*) FROM price_groups '
+            'WHERE id > ? GROUP BY kind, key, amount '
+            'ON CONFLICT (kind, key, amount) DO UPDATE SET count = count + excluded.count', (last,)
+            )
+        self.connection.execute(
+            'INSERT INTO price_totals SELECT kind, key, count(*) FROM price_groups '
+            'WHERE id > ? GROUP BY kind, key '
+            'ON CONFLICT (kind, key) DO UPDATE SET count = count + excluded.count', (last,)
+            )
+        return None
+
+    def insert_details(self, id, restaurant):
+        """insert the address, hours and open interval rows of a restaurant"""
+        self.connection.executemany(
+            'INSERT INTO addresses (restaurant_id, position, address, x, y) VALUES (?, ?, ?, ?, ?)',
+            [
+                (id, position, address, *parse_address(address))
+                for position, address in enumerate(restaurant.address)
+                ]
+            )
+        self.connection.executemany(
+            'INSERT INTO hours (restaurant_id, day, opening, closing) VALUES (?, ?, ?, ?)',
+            [(id, day, opening, closing) for day, (opening, closing) in restaurant.hours.items()]
+            )
+        self.connection.executemany(
+            'INSERT INTO open_intervals (restaurant_id, start_minute, end_minute) VALUES (?, ?, ?)',
+            [(id, start, end) for start, end in week_intervals(restaurant.hours)]
+            )
+        return None
+
+    def check_version(self, names, version):
+        """
+        raise ConflictError if a restaurant in names changed after version, or if
+        the change log no longer reaches back to version
+        """
+        if version is None:
+            return None
+        first = self.connection.execute('SELECT min(version) FROM changes').fetchone()[0]
+        if first is not None and version < first - 1:
+            raise ConflictError(f'the changes since version {version} are no longer kept')
+        names = [name for name in names if name is not None]
+        row = self.connection.execute(
+            'SELECT name FROM changes WHERE version > ? AND name IN '
+            f'({", ".join("?" * len(names))}) LIMIT 1', [version] + names
+            ).fetchone()
+        if row:
+            raise ConflictError(f'{row[0]} was changed after version {version}')
+        return None
+
+    def save(self, restaurant, old_name=None, version=None):
+        """
+        write a restaurant, replacing the record saved under old_name if given, with
+        version raise ConflictError if either name was written after that version,
+        raise AddressTakenError if one of its addresses belongs to another restaurant
+        """
+        with self.connection:
+            # the write lock is taken before the checks, no writer can come in between
+            self.connection.execute('BEGIN IMMEDIATE')
+            self.check_version({old_name, restaurant.name}, version)
+            check_addresses(restaurant, old_name, self.find_by_address)
+            records = []
+            for name in {old_name, restaurant.name} - {None}:
+                cursor = self.connection.execute('DELETE FROM restaurants WHERE name = ?', (name,))
+                if cursor.rowcount and name != restaurant.name:
+                    records.append(('delete', name))
+            self.insert(restaurant)
+            self.log_changes(records + [('upsert', restaurant.name)])
+        return None
+
+    def save_many(self, restaurants, keep_menus=False, errors=None):
+        """
+        write many restaurants in one transaction, return the number written, with
+        keep_menus a restaurant that is already saved keeps its menus, a taken address
+        raises AddressTakenError and rolls the batch back, or with an errors list the
+        restaurant is skipped and its error appended
+        """
+        names = []
+        with self.connection:
+            # the write lock is taken before the checks, no writer can come in between
+            self.connection.execute('BEGIN IMMEDIATE')
+            for restaurant in restaurants:
+                # the restaurants written before it in the batch are in the table already
+                try:
+                    check_addresses(restaurant, None, self.find_by_address)
+                except AddressTakenError as error:
+                    if errors is None:
+                        raise
+                    errors.append(error)
+                    continue
+                row = self.connection.execute(
+                    'SELECT id FROM restaurants WHERE name = ?', (restaurant.name,)
+                    ).fetchone()
+                if row and keep_menus:
+                    id, = row
+                    self.connection.execute(
+                        'UPDATE restaurants SET cuisine = ?, isfranchise = ? WHERE id = ?',
+                        (restaurant.cuisine, int(restaurant.isfranchise), id)
+                        )
+                    for table in ('addresses', 'hours', 'open_intervals'):
+                        self.connection.execute(
+                            f'DELETE FROM {table} WHERE restaurant_id = ?', (id,)
+                            )
+                    self.insert_details(id, restaurant)
+                else:
+                    if row:
+                        self.connection.execute('DELETE FROM restaurants WHERE id = ?', row)
+                    self.insert(restaurant)
+                names.append(restaurant.name)
+            self.log_changes([('upsert', name) for name in names])
+        return len(names)
+
+    def add_menu_items(self, items):
+        """
+        add or replace menu items given as (restaurant, menu title, item, price) tuples
+        in one transaction, a missing menu is created,
+        return (items written, names of unknown restaurants)
+        """
+        items = list(items)
+        names = list({restaurant for restaurant, _, _, _ in items})
+        restaurant_ids = {}  # key: restaurant name, value: id
+        menu_ids = {}  # key: (restaurant id, menu title), value: menu id
+        with self.connection:
+            # ids are looked up in chunks to stay under the SQLite variable limit
+            for i in range(0, len(names), 500):
+                chunk = names[i:i + 500]
+                restaurant_ids.update(self.connection.execute(
+                    'SELECT name, id FROM restaurants WHERE name IN '
+                    f'({", ".join("?" * len(chunk))})', chunk
+                    ))
+            ids = list(set(restaurant_ids.values()))
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                for menu_id, id, title in self.connection.execute(
+                        'SELECT id, restaurant_id, title FROM menus WHERE restaurant_id IN '
+                        f'({", ".join("?" * len(chunk))})', chunk):
+                    menu_ids[id, title] = menu_id
+            rows = []
+            for restaurant, title, name, price in items:
+                id = restaurant_ids.get(restaurant)
+                if id is None:
+                    continue
+                if (id, title) not in menu_ids:
+                    menu_ids[id, title] = self.connection.execute(
+                        'INSERT INTO menus (restaurant_id, position, title) VALUES '
+                        '(?, (SELECT count(*) FROM menus WHERE restaurant_id = ?), ?)',
+                        (id, id, title)
+                        ).lastrowid
+                rows.append([menu_ids[id, title], name, price])
+            positions = {}  # key: menu id, value: position for the next new item
+            touched = list({menu_id for menu_id, _, _ in rows})
+            for i in range(0, len(touched), 500):
+                chunk = touched[i:i + 500]
+                positions.update(self.connection.execute(
+                    'SELECT menu_id, max(position) + 1 FROM items WHERE menu_id IN '
+                    f'({", ".join("?" * len(chunk))}) GROUP BY menu_id', chunk
+                    ))
+            for row in rows:
+                position = positions.get(row[0], 0)
+                positions[row[0]] = position + 1
+                row.insert(1, position)
+            # new items go after the last item of their menu, existing items get the new price
+            self.connection.executemany(
+                'INSERT INTO items (menu_id, position, name, price) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (menu_id, name) DO UPDATE SET price = excluded.price', rows
+                )
+            self.connection.executemany(
+                'DELETE FROM prices WHERE menu_id = ? AND item = ?',
+                [(menu_id, name) for menu_id, _, name, _ in rows]
+                )
+            self.insert_prices([(menu_id, name, price) for menu_id, _, name, price in rows])
+            self.log_changes([('upsert', name) for name in names if name in restaurant_ids])
+        missing = sorted(set(names) - set(restaurant_ids))
+        return len(rows), missing
+
+    def menu_items(self, names):
+        """return the (restaurant, menu title, item, price) items of the restaurants in names"""
+        names = list(names)
+        items = []
+        with self.snapshot():
+            for i in range(0, len(names), 500):
+                chunk = names[i:i + 500]
+                items += self.connection.execute(
+                    'SELECT r.name, m.title, i.name, i.price FROM items i '
+                    'JOIN menus m ON m.id = i.menu_id '
+                    'JOIN restaurants r ON r.id = m.restaurant_id '
+                    f'WHERE r.name IN ({", ".join("?" * len(chunk))}) '
+                    'ORDER BY r.id, m.position, i.position', chunk
+                    ).fetchall()
+        return items
+
+    def remove_menu_items(self, items):
+        """
+        remove menu items given as (restaurant, menu title, item) tuples in one
+        transaction, return the number removed
+        """
+        menu_ids = {}  # key: (restaurant name, menu title), value: menu id or None
+        rows = []
+        touched = set()
+        with self.connection:
+            for restaurant, title, name in items:
+                if (restaurant, title) not in menu_ids:
+                    row = self.connection.execute(
+                        'SELECT m.id FROM menus m JOIN restaurants r ON r.id = m.restaurant_id '
+                        'WHERE r.name = ? AND m.title = ? ORDER BY m.position DESC', (restaurant, title)
+                        ).fetchone()
+                    menu_ids[restaurant, title] = row and row[0]
+                if menu_ids[restaurant, title] is not None:
+                    rows.append((menu_ids[restaurant, title], name))
+                    touched.add(restaurant)
+            count = self.connection.executemany(
+                'DELETE FROM items WHERE menu_id = ? AND name = ?', rows
+                ).rowcount
+            self.connection.executemany('DELETE FROM prices WHERE menu_id = ? AND item = ?', rows)
+            self.log_changes([('upsert', name) for name in sorted(touched)])
+        return count
+
+    def delete(self, name, version=None):
+        """
+        remove a restaurant, raise KeyError if there is none, with version raise
+        ConflictError if it was written after that version
+        """
+        with self.connection:
+            self.connection.execute('BEGIN IMMEDIATE')
+            self.check_version({name}, version)
+            cursor = self.connection.execute('DELETE FROM restaurants WHERE name = ?', (name,))
+            if cursor.rowcount:
+                self.log_changes([('delete', name)])
+        if not cursor.rowcount:
+            raise KeyError(name)
+        return None
+
+    def find_by_address(self, address):
+        """return the name of the restaurant at address, or None if the address is free"""
+        row = self.connection.execute(
+            'SELECT r.name FROM addresses a JOIN restaurants r ON r.id = a.restaurant_id '
+            'WHERE a.address = ?', (address,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def rebuild_address_index(self):
+        """the address index is a SQLite index, nothing to rebuild"""
+        return None
+
+    def rebuild_prices(self):
+        """parse the prices of every menu item again"""
+        with self.connection:
+            self.connection.execute('DELETE FROM prices')
+            self.insert_prices(self.connection.execute('SELECT menu_id, name, price FROM items'))
+        return None
+
+    def rebuild_price_counts(self):
+        """count the price entries of every group again"""
+        with self.connection:
+            self.connection.execute('DELETE FROM price_counts')
+            self.connection.execute('DELETE FROM price_totals')
+            self.connection.execute(
+                'INSERT INTO price_counts SELECT kind, key, amount, count(*) FROM price_groups '
+                'GROUP BY kind, key, amount'
+                )
+            self.connection.execute(
+                'INSERT INTO price_totals SELECT kind, key, sum(count) FROM price_counts GROUP BY kind, key'
+                )
+        return None
+
+    def price_filter(self, cuisine=None, menu=None, item=None):
+        """return the SQL conditions and parameters for the price filters"""
+        conditions, params = [], []
+        if cuisine is not None:
+            conditions.append('r.cuisine = ?')
+            params.append(cuisine)
+        if menu is not None:
+            conditions.append('r.name = ? AND m.title = ?')
+            params.extend(menu)
+        if item is not None:
+            conditions.append('p.item = ? COLLATE NOCASE')
+            params.append(item)
+        return conditions, params
+
+    def price_range(self, low, high, cuisine=None, menu=None, item=None):
+        """
+        return the (amount, restaurant, menu title, item, variant) entries priced
+        from low to high cents, cheapest first, menu is a (restaurant, title) pair
+        """
+        conditions, params = self.price_filter(cuisine, menu, item)
+        rows = self.connection.execute(
+            'SELECT p.amount, r.name, m.title, p.item, p.variant FROM prices p '
+            'JOIN menus m ON m.id = p.menu_id JOIN restaurants r ON r.id = m.restaurant_id '
+            f'WHERE {" AND ".join(["p.amount BETWEEN ? AND ?"] + conditions)} '
+            'ORDER BY p.amount, r.name, m.title, p.item, p.variant', [low, high] + params
+            )
+        return rows.fetchall()
+
+    def price_stats(self, cuisine=None, menu=None, item=None):
+        """return the count, min, lower median and max amount in cents of the filtered entries"""
+        if menu is None and item is None:
+            return self.group_stats('all', '') if cuisine is None else self.group_stats('cuisine', cuisine)
+        # a menu or an item holds few entries, they are read once in amount order
+        conditions, params = self.price_filter(cuisine, menu, item)
+        amounts = [amount for amount, in self.connection.execute(
+            'SELECT p.amount FROM prices p '
+            'JOIN menus m ON m.id = p.menu_id JOIN restaurants r ON r.id = m.restaurant_id '
+            f'WHERE {" AND ".join(conditions)} ORDER BY p.amount', params
+            )]
+        if not amounts:
+            return {'count': 0, 'min': None, 'median': None, 'max': None}
+        return {
+            'count': len(amounts), 'min': amounts[0],
+            'median': amounts[(len(amounts) - 1) // 2], 'max': amounts[-1],
+            }
+
+    def group_stats(self, kind, key):
+        """
+        return the stats of a counted group, min and max are the ends of its amount
+        index and the median is found walking its distinct amounts, not its entries
+        """
+        row = self.connection.execute(
+            'SELECT count FROM price_totals WHERE kind = ? AND key = ?', (kind, key)
+            ).fetchone()
+        if row is None:
+            return {'count': 0, 'min': None, 'median': None, 'max': None}
+        count, = row
+        stats = {'count': count}
+        for name, order in (('min', 'ASC'), ('max', 'DESC')):
+            stats[name] = self.connection.execute(
+                'SELECT amount FROM price_counts WHERE kind = ? AND key = ? '
+                f'ORDER BY amount {order} LIMIT 1', (kind, key)
+                ).fetchone()[0]
+        stats['median'] = self.connection.execute(
+            'SELECT amount FROM (SELECT amount, sum(count) OVER (ORDER BY amount) AS running '
+            'FROM price_counts WHERE kind = ? AND key = ?) WHERE running > ? LIMIT 1',
+            (kind, key, (count - 1) // 2)
+            ).fetchone()[0]
+        return stats
+
+    def search(self, query):
+        """return the sorted names of restaurants whose name, cuisine or menu items contain query"""
+        pattern = '%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        rows = self.connection.execute(
+            "SELECT name FROM restaurants WHERE name LIKE :p ESCAPE '\\' "
+            "OR cuisine LIKE :p ESCAPE '\\' "
+            'UNION SELECT r.name FROM items i JOIN menus m ON m.id = i.menu_id '
+            'JOIN restaurants r ON r.id = m.restaurant_id '
+            "WHERE i.name LIKE :p ESCAPE '\\' ORDER BY name", {'p': pattern}
+            )
+        return [name for name, in rows]
+
+    def nearest(self, x, y, k=1):
+        """
+        return up to k (distance, name, address) tuples closest to x, y, nearest first,
+        the search box around x, y doubles until it holds k locations within its radius
+        """
+        extent = self.connection.execute(
+            'SELECT count(*), min(x), max(x), min(y), max(y) FROM addresses'
+            ).fetchone()
+        count, min_x, max_x, min_y, max_y = extent
+        if not count or k < 1:
+            return []
+        k = min(k, count)
+        radius = 8
+        while True:
+            rows = self.connection.execute(
+                'SELECT (a.x - :x) * (a.x - :x) + (a.y - :y) * (a.y - :y) AS d, r.name, a.address '
+                'FROM addresses a JOIN restaurants r ON r.id = a.restaurant_id '
+                'WHERE a.x BETWEEN :x - :r AND :x + :r AND a.y BETWEEN :y - :r AND :y + :r '
+                'ORDER BY d, r.name LIMIT :k', {'x': x, 'y': y, 'r': radius, 'k': k}
+                ).fetchall()
+            covers_all = (
+                x - radius <= min_x and x + radius >= max_x
+                and y - radius <= min_y and y + radius >= max_y
+                )
+            if covers_all or (len(rows) == k and rows[-1][0] <= radius * radius):
+                break
+            radius *= 2
+        return [(math.sqrt(d), name, address) for d, name, address in rows]
+
+    def open_at(self, minute):
+        """return the sorted names of restaurants open at a minute of the week"""
+        # no interval is longer than a day, so only a day of start minutes is read
+        rows = self.connection.execute(
+            'SELECT DISTINCT r.name FROM open_intervals o '
+            'JOIN restaurants r ON r.id = o.restaurant_id '
+            'WHERE o.start_minute BETWEEN :m - :day AND :m AND o.end_minute > :m '
+            'ORDER BY r.name', {'m': minute, 'day': MINUTES_PER_DAY}
+            )
+        return [name for name, in rows]
+
+    def close(self):
+        """close the database connection"""
+        self.connection.close()
+        return None
@@ -0,0 +1,233 @@
+"""
+This module generates large synthetic restaurant catalogs for load testing.
+
+usage: python synthetic.py [-d DATABASE] [-s SEED] [-p PRESET]
+                           [-r RESTAURANTS] [-l LOCATIONS] [-m MENUS] [-i ITEMS]
+
+The same seed and counts always generate the same catalog. Locations are
+the total number of addresses, the locations beyond one per restaurant go
+to franchises, a few big chains and many small ones. Addresses are unique
+points on a grid that grows with the number of locations. Cuisines, hours
+(with closed days and closings after midnight) and price strings follow
+the shapes of the hand made data in generatedb.py.
+
+The presets are sized by locations: 10k, 100k and 1m.
+
+Written by Wenbin Wu
+"""
+
+import argparse
+import math
+import random
+import time
+from restaurant import *
+from hours import DAYS
+
+PRESETS = {  # key: preset name, value: (restaurants, locations, menus, items)
+    '10k': (8_000, 10_000, 16_000, 80_000),
+    '100k': (80_000, 100_000, 160_000, 800_000),
+    '1m': (800_000, 1_000_000, 1_600_000, 8_000_000),
+    }
+
+CUISINES = {  # key: cuisine, value: (weight, dishes)
+    'Pizza': (14, ('Pizza', 'Calzone', 'Wings', 'Garlic Knots', 'Stromboli')),
+    'Chinese': (12, ('Fried Rice', 'Lo Mein', 'Dumplings', 'Chow Fun', 'Wonton Soup')),
+    'Fast Food': (12, ('Burger', 'Chicken Sandwich', 'Nuggets', 'Fries', 'Milk Shake')),
+    'Mexican': (9, ('Tacos', 'Burrito', 'Quesadilla', 'Enchiladas', 'Nachos')),
+    'Italian': (8, ('Spaghetti', 'Lasagna', 'Risotto', 'Ravioli', 'Tiramisu')),
+    'Japanese': (7, ('Sushi Roll', 'Ramen', 'Udon', 'Teriyaki', 'Tempura')),
+    'Diner': (6, ('Pancakes', 'Omelette', 'Club Sandwich', 'Meatloaf', 'Cheesecake')),
+    'Bakery': (5, ('Cake', 'Croissant', 'Muffin', 'Bagel', 'Cookies')),
+    'Indian': (5, ('Curry', 'Biryani', 'Tikka Masala', 'Samosa', 'Naan')),
+    'Thai': (4, ('Pad Thai', 'Green Curry', 'Tom Yum', 'Spring Rolls', 'Satay')),
+    'Steakhouse': (3, ('Filet Mignon', 'Ribeye', 'NY Strip', 'Prime Ribs', 'Baked Potato')),
+    'Seafood & Bar': (3, ('Oysters', 'Clams', 'Lobster Tails', 'Fish Tacos', 'Calamari')),
+    'Salads': (2, ('Caesar Salad', 'Greek Salad', 'Cobb Salad', 'Grain Bowl', 'Smoothie')),
+    }
+
+NAME_WORDS = (
+    'Golden', 'Happy', 'Lucky', 'Little', 'Big', 'Red', 'Green', 'Blue', 'Royal', 'Old',
+    'Sunny', 'Fiery', 'Yummy', 'Flushing', 'Evergreen', 'Corner', 'Family', 'Urban',
+    'Harbor', 'Main Street', 'Jenny\'s', 'Ben\'s', 'Tony\'s', 'Mama\'s', 'Uncle\'s',
+    )
+NAME_PLACES = (
+    'Kitchen', 'House', 'Grill', 'Cafe', 'Bistro', 'Diner', 'Express', 'Garden',
+    'Palace', 'Place', 'Corner', 'Spot', 'Eatery', 'Table', 'Shack', 'Bar',
+    )
+ITEM_WORDS = (
+    'House Special', 'Classic', 'Spicy', 'Crispy', 'Grilled', 'Veggie', 'Chicken',
+    'Beef', 'Shrimp', 'Pork', 'Deluxe', 'Mini', 'Family', 'Supreme', 'Homemade',
+    )
+MENU_TITLES = (
+    'Lunch Specials', 'Dinner', 'Appetizers', 'Sides', 'Desserts', 'Drinks',
+    'Kids Menu', 'Breakfast', 'Combos', 'Chef Specials',
+    )
+SIZES = (
+    ('Small', 'Medium', 'Large'), ('Medium', 'Large'), ('Half', 'Whole'),
+    ('6pc', '12pc'), ('Slice', 'Whole Pie'), ('Regular', 'Combo'),
+    )
+
+
+def distribute(rng, total, count, minimum=1, weights=None):
+    """split total into count random parts of at least minimum each"""
+    parts = [minimum] * count
+    if count:
+        for i in rng.choices(range(count), weights, k=total - minimum * count):
+            parts[i] += 1
+    return parts
+
+
+def random_price(rng, low, high):
+    """return a price string such as '$9.99' or '$12' between low and high dollars"""
+    dollars = rng.randint(low, high)
+    if rng.random() < 0.7:
+        return f'${dollars}.99'
+    return f'${dollars}'
+
+
+def random_prices(rng):
+    """return the price string of one menu item, with size variants for some items"""
+    roll = rng.random()
+    if roll < 0.6:
+        return random_price(rng, 2, 30)
+    if roll < 0.9:
+        sizes = rng.choice(SIZES)
+        low = rng.randint(2, 20)
+        variants = []
+        for size in sizes:
+            variants.append(f'{size} {random_price(rng, low, low + 3)}')
+            low += rng.randint(2, 5)
+        return '   '.join(variants)
+    return f'Each {random_price(rng, 1, 5)}'
+
+
+def random_hours(rng):
+    """return an hours dict, most restaurants keep the same hours every day"""
+    roll = rng.random()
+    if roll < 0.05:  # open around the clock
+        return {day: ['0:00AM', '11:59PM'] for day in DAYS}
+    opening = rng.choice(('6:00AM', '7:00AM', '8:00AM', '9:00AM', '10:00AM', '11:00AM'))
+    closing = rng.choice(('7:00PM', '8:00PM', '9:00PM', '10:00PM', '11:00PM'))
+    hours = {day: [opening, closing] for day in DAYS}
+    if roll < 0.35:  # late on the weekend, closes after midnight
+        late = rng.choice(('12:00AM', '1:00AM', '2:00AM'))
+        hours['friday'] = [opening, late]
+        hours['saturday'] = [opening, late]
+    if rng.random() < 0.3:  # closed one day of the week
+        hours[rng.choice(DAYS)] = ['', 'Closed']
+    return hours
+
+
+def random_menu(rng, title, dishes, count):
+    """return a menu with count items"""
+    menu = Menu(title=title, items=dict())
+    while len(menu.items) < count:
+        name = f'{rng.choice(ITEM_WORDS)} {rng.choice(dishes)}'
+        if name in menu.items:
+            name = f'{name} #{len(menu.items) + 1}'
+        menu.add_item(name, random_prices(rng))
+    return menu
+
+
+def generate(seed=0, restaurants=1000, locations=None, menus=None, items=None):
+    """
+    yield synthetic restaurants, the same arguments always yield the same
+    restaurants, locations, menus and items are totals over the catalog
+    """
+    locations = restaurants if locations is None else locations
+    menus = 2 * restaurants if menus is None else menus
+    items = 5 * menus if items is None else items
+    if locations < restaurants or menus < restaurants or items < menus:
+        raise ValueError('every restaurant needs a location and a menu, every menu needs an item')
+    rng = random.Random(seed)
+
+    # ----- plan the catalog -----
+    extra = locations - restaurants
+    chains = min(restaurants, math.ceil(extra / 5))  # about 6 locations per chain
+    franchises = rng.sample(range(restaurants), chains)
+    chain_sizes = distribute(rng, extra, chains, weights=[1 / (i + 1) for i in range(chains)])
+    location_counts = [1] * restaurants
+    for i, size in zip(franchises, chain_sizes):
+        location_counts[i] += size
+    menu_counts = distribute(rng, menus, restaurants)
+    item_counts = distribute(rng, items, menus)
+
+    # unique grid points, the grid is at least the original 99 x 99 map
+    extent = max(99, math.ceil(math.sqrt(2 * locations)))
+    cells = rng.sample(range(extent * extent), locations)
+
+    cuisines = list(CUISINES)
+    cuisine_weights = [CUISINES[cuisine][0] for cuisine in cuisines]
+    franchise_set = set(franchises)
+    names = set()
+    next_cell = 0
+    next_menu = 0
+
+    # ----- build each restaurant -----
+    for i in range(restaurants):
+        cuisine = rng.choices(cuisines, cuisine_weights)[0]
+        dishes = CUISINES[cuisine][1]
+        name = f'{rng.choice(NAME_WORDS)} {rng.choice(dishes)} {rng.choice(NAME_PLACES)}'
+        if name in names:
+            name = f'{name} #{i + 1}'
+        names.add(name)
+
+        address = []
+        for cell in cells[next_cell:next_cell + location_counts[i]]:
+            address.append(f'{cell % extent + 1}, {cell // extent + 1}')
+        next_cell += location_counts[i]
+
+        titles = [cuisine] + rng.sample(MENU_TITLES, min(menu_counts[i], len(MENU_TITLES)) - 1)
+        titles += [f'Menu {n + 1}' for n in range(len(titles), menu_counts[i])]
+        restaurant_menus = []
+        for title in titles:
+            restaurant_menus.append(random_menu(rng, title, dishes, item_counts[next_menu]))
+            next_menu += 1
+
+        yield Restaurant(
+            name=name,
+            cuisine=cuisine,
+            isfranchise=i in franchise_set,
+            address=address,
+            hours=random_hours(rng),
+            menus=restaurant_menus
+            )
+
+
+def write(repository, restaurants, batch_size=5000, report=None):
+    """save restaurants to the repository in batches, return the number saved"""
+    count = 0
+    batch = []
+    for restaurant in restaurants:
+        batch.append(restaurant)
+        if len(batch) == batch_size:
+            count += repository.save_many(batch)
+            batch = []
+            if report:
+                report(f'{count:,} restaurants saved')
+    if batch:
+        count += repository.save_many(batch)
+    return count
+
+
+if __name__ == '__main__':
+    from repository import RestaurantRepository
+
+    parser = argparse.ArgumentParser(description='Generate a synthetic restaurant catalog.')
+    parser.add_argument('-d', '--database', default='synthetic.sqlite3', help='database to write')
+    parser.add_argument('-s', '--seed', type=int, default=0, help='random seed')
+    parser.add_argument('-p', '--preset', choices=PRESETS, help='counts sized by locations')
+    parser.add_argument('-r', '--restaurants', type=int, default=1000)
+    parser.add_argument('-l', '--locations', type=int, default=None, help='default: one per restaurant')
+    parser.add_argument('-m', '--menus', type=int, default=None, help='default: two per restaurant')
+    parser.add_argument('-i', '--items', type=int, default=None, help='default: five per menu')
+    args = parser.parse_args()
+    counts = (args.restaurants, args.locations, args.menus, args.items)
+    if args.preset:
+        counts = PRESETS[args.preset]
+
+    start = time.perf_counter()
+    repository = RestaurantRepository(args.database)
+    count = write(repository, generate(args.seed, *counts), report=print)
+    repository.close()
+    print(f'{count:,} restaurants written to {args.database} in {time.perf_counter() - start:.2f}s')
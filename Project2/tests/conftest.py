@@ -0,0 +1,39 @@
+"""
+shared fixtures, the modules of Project2 are imported by name like the
+programs do, so the directory above the tests goes on the path
+"""
+
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from restaurant import Menu, Restaurant
+
+
+def make_restaurant(name, address, cuisine='Thai', menus=None, hours=None, isfranchise=None):
+    """return a restaurant at a list of addresses with one small menu by default"""
+    if menus is None:
+        menus = [Menu('Lunch', {'Pad Thai': '$9.50', 'Spring Rolls': '$4.00'})]
+    if hours is None:
+        hours = {'monday': ['11:00AM', '9:00PM']}
+    if isfranchise is None:
+        isfranchise = len(address) > 1
+    return Restaurant(name, cuisine, isfranchise, list(address), hours, menus)
+
+
+@pytest.fixture(params=['shelve', 'sqlite'])
+def database(request, tmp_path):
+    """path of an empty database of each storage backend"""
+    if request.param == 'sqlite':
+        return str(tmp_path / 'restaurants.sqlite3')
+    return str(tmp_path / 'restaurants')
+
+
+@pytest.fixture
+def repository(database):
+    from repository import RestaurantRepository
+    repository = RestaurantRepository(database)
+    yield repository
+    repository.close()
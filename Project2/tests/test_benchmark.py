@@ -0,0 +1,16 @@
+from benchmark import compare, run_scale
+
+
+def test_run_scale(tmp_path):
+    times, counts = run_scale(10, str(tmp_path))
+    assert {'shelve_write', 'sqlite_get', 'load_database', 'calculate_distances'} <= times.keys()
+    assert all(seconds >= 0 for seconds in times.values())
+    assert counts['rows'] == 10 and counts['restaurants'] == 8
+    assert counts['record_bytes'] < counts['pickle_bytes']
+
+
+def test_compare_flags_regressions():
+    previous = {'results': {'10': {'load': 1.0, 'search': 1.0}}}
+    current = {'results': {'10': {'load': 1.1, 'search': 1.5, 'new': 9.0}, '1k': {'load': 5.0}}}
+    assert compare(previous, current, 0.2) == ['10 search: 1.000000s -> 1.500000s (+50%)']
+    assert compare(previous, current, 0.6) == []
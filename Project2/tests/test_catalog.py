@@ -0,0 +1,145 @@
+import pytest
+from conftest import make_restaurant
+import catalog as catalog_module
+from catalog import RestaurantCatalog
+from restaurant import Menu
+
+
+@pytest.fixture
+def catalog(repository):
+    repository.save_many([
+        make_restaurant('Fiery Wok', ['1, 1'], cuisine='Chinese'),
+        make_restaurant('pizza palace', ['10, 2', '3, 30'], cuisine='Italian'),
+        make_restaurant('Thai Garden', ['9, 0'], cuisine='Thai'),
+        ])
+    catalog = RestaurantCatalog(repository)
+    catalog.load()
+    return catalog
+
+
+def names(catalog):
+    return [catalog.text(key, 0) for key in catalog.view]
+
+
+def test_reloaded_keeps_the_settings(catalog):
+    catalog.search('a', update=False)
+    catalog.sort(0)
+    reloaded = catalog.reloaded()
+    assert names(reloaded) == names(catalog)
+    assert not reloaded.copy_settings(catalog)
+
+
+def test_copy_settings_reports_a_change(catalog):
+    other = RestaurantCatalog(catalog.repository)
+    other.set_location((0, 0), update=False)
+    assert catalog.copy_settings(other)
+    assert catalog.location == (0, 0)
+    catalog.update_view()
+    assert catalog.nearest is not None
+
+
+def test_patch_drops_removed_rows_from_the_view(catalog):
+    catalog.set_location((10, 2))
+    nearest = catalog.nearest
+    catalog.repository.delete('pizza palace')
+    read = catalog.read_changes()
+    # reading leaves the rows and the view alone
+    assert 'pizza palace' in names(catalog)
+    assert catalog.patch(read) == 1
+    # the view is not recomputed yet, but every row it shows can be drawn
+    assert sorted(names(catalog)) == ['Fiery Wok', 'Thai Garden']
+    assert nearest not in catalog.rows and catalog.nearest is None
+    for position in range(len(catalog)):
+        catalog.row(position)
+
+
+def test_patch_skips_changes_read_for_an_older_version(catalog):
+    catalog.repository.save(make_restaurant('Green Curry', ['5, 5']))
+    read = catalog.read_changes()
+    assert catalog.apply_changes() == 1
+    assert catalog.patch(read) == 0
+    assert catalog.patch(catalog.read_changes()) == 0
+    catalog.update_view()
+    assert names(catalog).count('Green Curry') == 1
+
+
+def test_patch_asks_for_a_reload_when_the_log_is_too_short(catalog):
+    catalog.version = -100
+    assert catalog.patch((-100, 0, None, [])) is None
+
+
+@pytest.fixture
+def sorting(repository):
+    repository.save_many([
+        make_restaurant('beta', ['10, 2'], cuisine='thai', menus=[]),
+        make_restaurant('Alpha', ['9, 40', '2, 2'], cuisine='Zambian'),
+        make_restaurant('gamma', ['100, 1'], cuisine='Thai', menus=[Menu('A', {}), Menu('B', {}), Menu('C', {})]),
+        make_restaurant('Delta', ['9, 5'], cuisine='Italian'),
+        ])
+    catalog = RestaurantCatalog(repository)
+    catalog.load()
+    return catalog
+
+
+def rows(catalog, column):
+    return [catalog.text(key, column) for key in catalog.view]
+
+
+def test_sort_by_typed_keys(sorting):
+    sorting.sort(0)
+    assert names(sorting) == ['Alpha', 'Alpha', 'beta', 'Delta', 'gamma']
+    # cuisines ignore case, ties are in name order
+    sorting.sort(1)
+    assert names(sorting) == ['Delta', 'beta', 'gamma', 'Alpha', 'Alpha']
+    # addresses sort by x then y, not as text
+    sorting.sort(2)
+    assert rows(sorting, 2) == ['2, 2', '9, 5', '9, 40', '10, 2', '100, 1']
+    # menus by their number
+    sorting.sort(3)
+    assert names(sorting)[0] == 'beta' and names(sorting)[-1] == 'gamma'
+
+
+def test_sort_again_reverses(sorting):
+    sorting.sort(2)
+    ascending = rows(sorting, 2)
+    sorting.sort(2)
+    assert not sorting.sort_ascending
+    assert rows(sorting, 2) == ascending[::-1]
+    # ties keep their name order when reversed
+    sorting.sort(1)
+    sorting.sort(1)
+    assert names(sorting) == ['Alpha', 'Alpha', 'beta', 'gamma', 'Delta']
+
+
+def test_sort_by_distance(sorting):
+    sorting.sort(4)
+    # there is no distance without a location, the view stays in key order
+    assert names(sorting) == ['beta', 'Alpha', 'Alpha', 'gamma', 'Delta']
+    sorting.set_location((10, 0))
+    assert [float(d) for d in rows(sorting, 4)] == sorted(float(d) for d in rows(sorting, 4))
+    assert names(sorting)[0] == 'beta'
+    sorting.set_location((100, 0))
+    assert names(sorting)[0] == 'gamma'
+
+
+def test_filtered_views_are_sorted(sorting, monkeypatch):
+    sorting.sort(0)
+    sorting.search('ta')
+    assert names(sorting) == ['beta', 'Delta']
+    # a view too large for the small view shortcut is read off the cached order
+    monkeypatch.setattr(catalog_module, 'SMALL_VIEW', 1)
+    sorting.search('a')
+    assert names(sorting) == ['Alpha', 'Alpha', 'beta', 'Delta', 'gamma']
+    assert (0, True) in sorting.sort_orders
+
+
+def test_sort_orders_follow_the_rows(sorting):
+    sorting.sort(0)
+    assert (0, True) in sorting.sort_orders
+    sorting.add_rows(make_restaurant('aardvark', ['1, 1']).summary())
+    assert not sorting.sort_orders
+    sorting.update_view()
+    assert names(sorting)[0] == 'aardvark'
+    sorting.remove_rows('Alpha', '2, 2')
+    sorting.update_view()
+    assert names(sorting) == ['aardvark', 'Alpha', 'beta', 'Delta', 'gamma']
@@ -0,0 +1,49 @@
+import json
+import pytest
+import cli
+from conftest import make_restaurant
+from repository import RestaurantRepository
+
+
+@pytest.fixture
+def database(database):
+    repository = RestaurantRepository(database)
+    repository.save_many([
+        make_restaurant('Fiery Wok', ['1, 1'], cuisine='Chinese'),
+        make_restaurant('Thai Garden', ['9, 0']),
+        ])
+    repository.close()
+    return database
+
+
+def run(capsys, *argv):
+    status = cli.main(list(argv))
+    return status, capsys.readouterr()
+
+
+def test_search_and_nearest(database, capsys):
+    status, out = run(capsys, '-d', database, 'search', 'garden')
+    assert status == 0 and out.out.split('\n')[0] == 'Thai Garden'
+    status, out = run(capsys, '-d', database, '--json', 'nearest', '8', '0', '-k', '1')
+    assert json.loads(out.out) == [{'distance': 1.0, 'name': 'Thai Garden', 'address': '9, 0'}]
+
+
+def test_show(database, capsys):
+    status, out = run(capsys, '-d', database, '--json', 'show', 'Fiery Wok')
+    assert status == 0 and json.loads(out.out)['cuisine'] == 'Chinese'
+    status, out = run(capsys, '-d', database, 'show', 'Nope')
+    assert status == 1 and "no restaurant named 'Nope'" in out.err
+
+
+def test_bad_day_is_reported(database, capsys):
+    status, out = run(capsys, '-d', database, 'open', 'someday', '7:00PM')
+    assert status == 2 and 'someday' in out.err
+
+
+def test_key_error_of_another_command_is_not_hidden(database, capsys, monkeypatch):
+    def search(self, query):
+        raise KeyError(query)
+
+    monkeypatch.setattr(RestaurantRepository, 'search', search)
+    with pytest.raises(KeyError):
+        cli.main(['-d', database, 'search', 'wok'])
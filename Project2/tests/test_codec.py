@@ -0,0 +1,71 @@
+import pickle
+import pytest
+from conftest import make_restaurant
+from codec import OTHER_DAY, PACKED_ADDRESSES, HEADER, decode, encode_restaurant, encode_summary
+from restaurant import Menu, Restaurant, Summary
+
+RESTAURANTS = [
+    make_restaurant('Fiery Wok', ['1, 1', '-20, 300']),
+    make_restaurant('Café Ünïcode', ['5, 5'], cuisine='Français', menus=[
+        Menu('Brunch', {'Crêpe': '$7', 'Empty': ''}), Menu('Empty menu', {}),
+        ]),
+    make_restaurant('No menus', ['0, 0'], menus=[], hours={}),
+    make_restaurant('Street address', ['12 Main St', '01, 2', '3, 99999999999']),
+    make_restaurant('Holiday hours', ['7, 7'], hours={'monday': ['Closed', 'Closed'], 'holiday': ['10:00AM', '2:00PM']}),
+    ]
+
+
+@pytest.mark.parametrize('restaurant', RESTAURANTS, ids=lambda restaurant: restaurant.name)
+def test_round_trip(restaurant):
+    record = encode_restaurant(restaurant)
+    assert record[0] != pickle.dumps(restaurant)[0]
+    decoded = decode(record)
+    assert decoded == restaurant
+    assert list(decoded.hours) == list(restaurant.hours)
+    assert [list(menu.items) for menu in decoded.menus] == [list(menu.items) for menu in restaurant.menus]
+    summary = restaurant.summary()
+    assert decode(encode_summary(summary)) == summary
+
+
+def test_addresses_are_packed_only_in_their_usual_form():
+    flags = lambda restaurant: HEADER.unpack_from(encode_restaurant(restaurant))[1]
+    assert flags(RESTAURANTS[0]) & PACKED_ADDRESSES
+    assert not flags(RESTAURANTS[3]) & PACKED_ADDRESSES
+
+
+def test_other_days_keep_their_key():
+    record = encode_restaurant(RESTAURANTS[4])
+    days = record[HEADER.size + 2:HEADER.size + 4]
+    assert days[1] == OTHER_DAY
+    assert decode(record).hours['holiday'] == ['10:00AM', '2:00PM']
+
+
+@pytest.mark.parametrize('restaurant', [
+    make_restaurant('Nul\0name', ['1, 1']),
+    make_restaurant('Huge menu', ['1, 1'], menus=[Menu('All', {str(i): '$1' for i in range(70000)})]),
+    make_restaurant('Odd hours', ['1, 1'], hours={'monday': ['11:00AM']}),
+    ], ids=['nul', 'huge', 'hours'])
+def test_records_that_do_not_fit_are_pickled(restaurant):
+    record = encode_restaurant(restaurant)
+    assert record == pickle.dumps(restaurant)
+    assert decode(record) == restaurant
+    assert decode(encode_summary(restaurant.summary())) == restaurant.summary()
+
+
+def test_legacy_records():
+    restaurant = RESTAURANTS[0]
+    # the shelve returns records written before the format as unpickled objects
+    assert decode(restaurant) is restaurant
+    # objects pickled before __slots__ carry a plain __dict__ state
+    old = Restaurant.__new__(Restaurant)
+    old.__setstate__({field: getattr(restaurant, field) for field in Restaurant.__slots__})
+    assert old == restaurant
+    menu = Menu.__new__(Menu)
+    menu.__setstate__((None, {'title': 'Lunch', 'items': {}}))
+    assert menu == Menu('Lunch', {})
+    assert pickle.loads(pickle.dumps(restaurant.summary())) == restaurant.summary()
+
+
+def test_slots_leave_no_dict():
+    assert not hasattr(RESTAURANTS[0], '__dict__')
+    assert not hasattr(Summary('a', 'b', False, [], {}, []), '__dict__')
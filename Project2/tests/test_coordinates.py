@@ -0,0 +1,33 @@
+import math
+import pytest
+import coordinates
+from coordinates import CoordinateColumns
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def columns(request, monkeypatch):
+    if request.param == 'python':
+        monkeypatch.setattr(coordinates, 'numpy', None)
+    elif coordinates.numpy is None:
+        pytest.skip('numpy is not installed')
+    columns = CoordinateColumns()
+    for key, (x, y) in {'a': (0, 0), 'b': (3, 4), 'c': (-6, 8)}.items():
+        columns.add(key, x, y)
+    return columns
+
+
+def test_distances_in_column_order(columns):
+    assert dict(zip(columns.keys, columns.distances(0, 0))) == {'a': 0.0, 'b': 5.0, 'c': 10.0}
+
+
+def test_remove_moves_the_last_location(columns):
+    columns.remove('a')
+    assert sorted(columns.keys) == ['b', 'c']
+    assert columns.location('c') == (-6, 8)
+    assert 'a' not in columns
+
+
+def test_nearest_and_batch_nearest(columns):
+    assert columns.nearest(-5, 7) == (math.hypot(1, 1), 'c')
+    assert [key for _, key in columns.batch_nearest([(0, 1), (3, 3), (-6, 9)], chunk_size=2)] == ['a', 'b', 'c']
+    assert CoordinateColumns().nearest(0, 0) is None
@@ -0,0 +1,69 @@
+import random
+import pytest
+from hours import (
+    MINUTES_PER_DAY, MINUTES_PER_WEEK, IntervalIndex, closing_minute, minute_of_week,
+    parse_time, week_intervals
+    )
+
+SUNDAY = 6 * MINUTES_PER_DAY
+
+
+@pytest.mark.parametrize('text, minutes', [
+    ('7:00AM', 420), ('12:00AM', 0), ('12:30PM', 750), ('11:59 pm', 1439),
+    ('9pm', 1260), ('21:15', 1275), ('0:00', 0),
+    ])
+def test_parse_time(text, minutes):
+    assert parse_time(text) == minutes
+
+
+@pytest.mark.parametrize('text', ['', 'Closed', '13:00PM', '24:00', '7:60AM', 'noon', ':30'])
+def test_parse_time_rejects(text):
+    assert parse_time(text) is None
+
+
+def test_week_intervals():
+    hours = {
+        'monday': ['9:00AM', '5:00PM'],
+        'tuesday': ['', 'Closed'],
+        'friday': ['6:00PM', '2:00AM'],  # closes after midnight
+        'sunday': ['10:00PM', '3:00AM'],  # wraps around to monday
+        'holiday': ['9:00AM', '5:00PM'],
+        }
+    assert week_intervals(hours) == [
+        (0, 180), (540, 1020),
+        (4 * MINUTES_PER_DAY + 1080, 5 * MINUTES_PER_DAY + 120),
+        (SUNDAY + 1320, MINUTES_PER_WEEK),
+        ]
+
+
+def test_minute_of_week():
+    assert minute_of_week('Sunday', '11:00PM') == SUNDAY + 1380
+    with pytest.raises(ValueError):
+        minute_of_week('someday', '7:00PM')
+
+
+def test_closing_minute_joins_intervals_across_the_week():
+    intervals = week_intervals({'sunday': ['10:00PM', '3:00AM'], 'monday': ['3:00AM', '6:00AM']})
+    assert closing_minute(intervals, SUNDAY + 1380) == MINUTES_PER_WEEK + 360
+    assert closing_minute(intervals, 400) is None
+    # open around the clock never closes within the week
+    always = week_intervals({day: ['12:00AM', '12:00AM'] for day in ('monday', 'tuesday')})
+    assert closing_minute(always, 0) == 2 * MINUTES_PER_DAY
+
+
+def test_interval_index_matches_a_scan():
+    rng = random.Random(5)
+    index = IntervalIndex(bucket_size=45)
+    hours = {}
+    for key in range(200):
+        days = rng.sample(['monday', 'wednesday', 'saturday', 'sunday'], 2)
+        hours[key] = {day: [f'{rng.randint(1, 12)}:00PM', f'{rng.randint(1, 12)}:30AM'] for day in days}
+        index.add(key, hours[key])
+    for key in range(0, 200, 3):
+        index.remove(key)
+        del hours[key]
+    for minute in range(0, MINUTES_PER_WEEK, 97):
+        expected = {key for key, h in hours.items() if any(s <= minute < e for s, e in week_intervals(h))}
+        assert index.open_at(minute) == expected
+        closing = {key for key in expected if closing_minute(week_intervals(hours[key]), minute) <= minute + 90}
+        assert index.closing_within(minute, 90) == closing
@@ -0,0 +1,125 @@
+import pytest
+from importer import (
+    diff_items, export_items, group_items, import_files, make_restaurant, parse_day, read_items, write_items,
+    )
+
+
+def write(path, text):
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+@pytest.fixture
+def files(tmp_path):
+    restaurants = write(tmp_path / 'restaurants.csv', (
+        'name,cuisine,isfranchise,address,monday,tuesday\n'
+        'Fiery Wok,Chinese,yes,"1, 1;2, 2",11:00AM-9:00PM,Closed\n'
+        ',Chinese,no,"3, 3",,\n'
+        'Thai Garden,Thai,no,"4, 4",10:00AM-10:00PM,\n'
+        ))
+    items = write(tmp_path / 'items.jsonl', (
+        '{"restaurant": "Fiery Wok", "menu": "Dinner", "item": "Kung Pao", "price": "$12"}\n'
+        '{"restaurant": "Thai Garden", "menu": "Lunch", "item": "Pad Thai", "price": "$9"}\n'
+        '{"restaurant": "Nowhere", "menu": "Lunch", "item": "Soup", "price": "$3"}\n'
+        '[1, 2]\n'
+        ))
+    return restaurants, items
+
+
+def test_parse_day():
+    assert parse_day('7:00AM - 9:00PM') == ['7:00AM', '9:00PM']
+    assert parse_day('Closed') == parse_day('') == ['', 'Closed']
+    with pytest.raises(ValueError):
+        parse_day('all day')
+
+
+def test_make_restaurant_checks_the_record():
+    restaurant = make_restaurant({'name': 'A', 'cuisine': 'B', 'address': ['1,2']})
+    assert restaurant.address == ['1, 2'] and restaurant.hours['monday'] == ['', 'Closed']
+    with pytest.raises(ValueError):
+        make_restaurant({'name': 'A', 'cuisine': 'B', 'address': '1, 1;2, 2'})
+    with pytest.raises(ValueError):
+        make_restaurant({'name': 'A', 'cuisine': 'B', 'address': 'here'})
+    for record in ({'address': 5}, {'address': [5]}, {'hours': '9-5'}, {'hours': {'monday': [1, 2, 3]}}):
+        with pytest.raises(ValueError):
+            make_restaurant({'name': 'A', 'cuisine': 'B', **record})
+
+
+def test_import_files(repository, files):
+    # the item file is listed first, restaurants are still imported before items
+    stats = import_files(repository, list(reversed(files)), workers=0, batch_size=2)
+    assert stats['restaurants'] == 2 and stats['items'] == 2
+    assert len(stats['errors']) == 3
+    assert any('restaurants.csv:3' in error for error in stats['errors'])
+    assert any('Nowhere' in error for error in stats['errors'])
+    wok = repository.get('Fiery Wok')
+    assert wok.address == ['1, 1', '2, 2'] and wok.hours['tuesday'] == ['', 'Closed']
+    assert wok.menus[0].items == {'Kung Pao': '$12'}
+
+
+def test_import_again_keeps_menus_and_skips_unchanged_items(repository, files):
+    import_files(repository, files, workers=0)
+    stats = import_files(repository, files, workers=0)
+    assert stats['items'] == 0 and stats['unchanged'] == 2
+    assert repository.get('Thai Garden').menus[0].items == {'Pad Thai': '$9'}
+
+
+def test_group_and_diff_items():
+    saved = group_items([('A', 'Lunch', 'Soup', '$3'), ('A', 'Lunch', 'Tea', '$1'), ('B', 'Dinner', 'Rice', '$2')])
+    assert saved == {('A', 'Lunch'): {'Soup': '$3', 'Tea': '$1'}, ('B', 'Dinner'): {'Rice': '$2'}}
+    changed, unchanged = diff_items(saved, [
+        ('A', 'Lunch', 'Soup', '$3'), ('A', 'Lunch', 'Tea', '$2'), ('A', 'Lunch', 'Tea', '$1'),
+        ('A', 'Dinner', 'Soup', '$3'), ('C', 'Lunch', 'Soup', '$3'),
+        ])
+    # Tea is listed twice and its last price is the saved one
+    assert unchanged == 2
+    assert changed == [('A', 'Dinner', 'Soup', '$3'), ('C', 'Lunch', 'Soup', '$3')]
+
+
+def test_replace_menus_removes_unlisted_items(repository, files, tmp_path):
+    import_files(repository, files, workers=0)
+    repository.add_menu_items([('Thai Garden', 'Lunch', 'Tea', '$1'), ('Thai Garden', 'Dinner', 'Curry', '$12')])
+    stats = import_files(repository, [files[1]], workers=0, replace_menus=True)
+    assert stats['removed'] == 1
+    menus = {menu.title: menu.items for menu in repository.get('Thai Garden').menus}
+    # a menu the file does not list is left alone
+    assert menus == {'Lunch': {'Pad Thai': '$9'}, 'Dinner': {'Curry': '$12'}}
+
+
+@pytest.mark.parametrize('name', ['items.csv', 'items.jsonl'])
+def test_export_round_trip(repository, files, tmp_path, name):
+    import_files(repository, files, workers=0)
+    repository.add_menu_items([('Fiery Wok', 'Dinner', 'Soup, hot', '"small" $3\nlarge $5')])
+    path = str(tmp_path / name)
+    assert export_items(repository, path) == 3
+    assert list(read_items(path)) == repository.menu_items(['Fiery Wok', 'Thai Garden'])
+    assert export_items(repository, path, ['Thai Garden']) == 1
+    assert write_items(path, []) == 0 and list(read_items(path)) == []
+
+
+def test_import_reports_taken_addresses(repository, files, tmp_path):
+    import_files(repository, files, workers=0)
+    taken = write(tmp_path / 'more.csv', (
+        'name,cuisine,isfranchise,address\n'
+        'Copy Wok,Chinese,no,"2, 2"\n'
+        'Fresh Place,Thai,no,"5, 5"\n'
+        ))
+    stats = import_files(repository, [taken], workers=0)
+    assert stats['restaurants'] == 1
+    assert stats['errors'] == ["restaurant 'Copy Wok' was skipped, 2, 2 is taken by Fiery Wok"]
+    assert repository.find_by_address('2, 2') == 'Fiery Wok'
+
+
+def test_malformed_records_are_reported(repository, tmp_path):
+    path = write(tmp_path / 'restaurants.jsonl', (
+        'not json\n'
+        '{"name": "A", "cuisine": "Thai", "address": 5}\n'
+        '{"name": "B", "cuisine": "Thai", "hours": "9-5"}\n'
+        '{"name": "C", "cuisine": "Thai", "address": "1, 1"}\n'
+        ))
+    stats = import_files(repository, [path], workers=0)
+    assert stats['restaurants'] == 1 and 'C' in repository
+    assert [error.split(': ')[0] for error in stats['errors']] == [f'{path}:{line}' for line in (1, 2, 3)]
+    # a file of bad lines is still read, so its lines are reported
+    garbage = write(tmp_path / 'garbage.jsonl', 'not json\n[1, 2]\n')
+    assert len(import_files(repository, [garbage], workers=0)['errors']) == 2
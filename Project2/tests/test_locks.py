@@ -0,0 +1,113 @@
+import os
+import subprocess
+import sys
+import threading
+import pytest
+from conftest import make_restaurant
+import storage
+from locks import FileLock
+from storage import ConflictError, open_storage
+
+PROJECT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_lock_is_reentrant_but_not_upgraded(tmp_path):
+    lock = FileLock(str(tmp_path / 'r.lock'))
+    with lock.exclusive():
+        with lock.shared():
+            pass
+    with lock.shared():
+        with pytest.raises(RuntimeError):
+            with lock.exclusive():
+                pass
+
+
+def test_writer_excludes_readers(tmp_path):
+    path = str(tmp_path / 'r.lock')
+    acquired = threading.Event()
+
+    def read():
+        # a second FileLock opens the file again, as another process would
+        with FileLock(path).shared():
+            acquired.set()
+
+    with FileLock(path).exclusive():
+        reader = threading.Thread(target=read)
+        reader.start()
+        assert not acquired.wait(0.2)
+    assert acquired.wait(5)
+    reader.join()
+
+
+def test_readers_share_the_lock(tmp_path):
+    path = str(tmp_path / 'r.lock')
+    acquired = threading.Event()
+
+    def read():
+        with FileLock(path).shared():
+            acquired.set()
+
+    with FileLock(path).shared():
+        reader = threading.Thread(target=read)
+        reader.start()
+        assert acquired.wait(5)
+    reader.join()
+
+
+def test_stale_versions_conflict(database):
+    store = open_storage(database)
+    store.save(make_restaurant('Fiery Wok', ['1, 1']))
+    store.save(make_restaurant('Thai Garden', ['2, 2']))
+    version = store.version()
+    store.save(make_restaurant('Fiery Wok', ['1, 1'], cuisine='Chinese'))
+    # a write to another restaurant does not conflict
+    store.save(make_restaurant('Thai Garden', ['2, 2'], cuisine='Lao'), version=version)
+    with pytest.raises(ConflictError):
+        store.save(make_restaurant('Fiery Wok', ['1, 1']), version=version)
+    with pytest.raises(ConflictError):
+        store.save(make_restaurant('Wok', ['1, 1']), old_name='Fiery Wok', version=version)
+    with pytest.raises(ConflictError):
+        store.delete('Fiery Wok', version=version)
+    assert store.get('Fiery Wok').cuisine == 'Chinese'
+    store.delete('Fiery Wok', version=store.version())
+    assert 'Fiery Wok' not in store
+    store.close()
+
+
+def test_versions_older_than_the_log_conflict(database, monkeypatch):
+    monkeypatch.setattr(storage, 'CHANGE_LOG_SIZE', 2)
+    store = open_storage(database)
+    version = store.version()
+    for i in range(4):
+        store.save(make_restaurant(f'R{i}', [f'{i}, 0']))
+    assert store.changes(version)[1] is None
+    with pytest.raises(ConflictError):
+        store.save(make_restaurant('Other', ['9, 9']), version=version)
+    store.close()
+
+
+WRITER = '''
+import sys
+sys.path.insert(0, sys.argv[1])
+from conftest import make_restaurant
+from storage import open_storage
+store = open_storage(sys.argv[2])
+for i in range(15):
+    store.save(make_restaurant(f'{sys.argv[3]} {i}', [f'{sys.argv[4]}, {i}']))
+store.close()
+'''
+
+
+def test_processes_write_at_once(database):
+    open_storage(database).close()
+    writers = [
+        subprocess.Popen([sys.executable, '-c', WRITER, os.path.join(PROJECT, 'tests'), database, prefix, x],
+                         env={**os.environ, 'PYTHONPATH': PROJECT})
+        for prefix, x in (('A', '1'), ('B', '2'), ('C', '3'))
+        ]
+    assert [writer.wait(60) for writer in writers] == [0, 0, 0]
+    store = open_storage(database)
+    assert len(store.summaries()) == 45
+    assert store.version() == 45
+    assert store.find_by_address('2, 7') == 'B 7'
+    store.close()
@@ -0,0 +1,69 @@
+import pytest
+from restaurant import Menu
+from menumodel import MenuModel, menu_rows, parse_items
+
+
+def test_menu_rows():
+    menus = [Menu('Lunch', {'Pad Thai': '$9.50', 'Tea': '$1'}), Menu('Empty', {}), Menu('Dinner', {'Curry': '$12'})]
+    assert menu_rows(menus) == [
+        ('Lunch', '', True), ('Pad Thai', '$9.50', False), ('Tea', '$1', False),
+        ('Empty', '', True),
+        ('Dinner', '', True), ('Curry', '$12', False),
+        ]
+    assert menu_rows([]) == []
+
+
+def check_positions(model):
+    assert model.positions == {name: i for i, name in enumerate(model.names)}
+    assert len(model.names) == len(model.prices) == len(model)
+
+
+def test_parse_items():
+    text = 'Pad Thai\t$9.50\r\nno tab here\n\t$3\nTea\t\n  Curry \t small $7 large $11 \n'
+    assert parse_items(text) == [('Pad Thai', '$9.50'), ('Curry', 'small $7 large $11')]
+    assert parse_items('') == []
+
+
+def test_add_and_set():
+    model = MenuModel({'Pad Thai': '$9.50'})
+    assert model.add('Tea', '$1') == 1
+    assert model.add('Pad Thai', '$10') == 0
+    assert model.row(0) == ('Pad Thai', '$10') and len(model) == 2
+    model.set(1, 'Green Tea', '$2')
+    assert 'Tea' not in model and model.position('Green Tea') == 1
+    model.set(1, 'Green Tea', '$3')
+    with pytest.raises(ValueError):
+        model.set(1, 'Pad Thai', '$3')
+    assert model.items() == {'Pad Thai': '$10', 'Green Tea': '$3'}
+    check_positions(model)
+
+
+def test_remove_renumbers_the_rest():
+    model = MenuModel({name: '$1' for name in 'abcde'})
+    model.remove(1)
+    model.remove(0)
+    assert model.names == ['c', 'd', 'e'] and model.position('e') == 2
+    check_positions(model)
+    model.clear()
+    assert len(model) == 0 and model.position('c') is None
+
+
+def test_paste_update():
+    model = MenuModel({'Pad Thai': '$9.50', 'Tea': '$1'})
+    assert model.update([('Tea', '$2'), ('Curry', '$12'), ('Pad Thai', '$9.50')], replace=False) == (1, 0)
+    assert model.items() == {'Pad Thai': '$9.50', 'Tea': '$1', 'Curry': '$12'}
+    assert model.update([('Tea', '$2'), ('Pad Thai', '$9.50'), ('Rice', '$2')]) == (1, 1)
+    assert model.items() == {'Pad Thai': '$9.50', 'Tea': '$2', 'Curry': '$12', 'Rice': '$2'}
+    check_positions(model)
+
+
+def test_menu_is_a_copy():
+    model = MenuModel({'Pad Thai': '$9.50'})
+    menu = model.menu('Lunch')
+    assert menu == Menu('Lunch', {'Pad Thai': '$9.50'})
+    model.add('Tea', '$1')
+    model.load(menu.items)
+    assert menu.items == {'Pad Thai': '$9.50'} and model.items() == menu.items
+    model.add('Rice', '$2')
+    # loading keeps a copy, the saved menu does not change with the model
+    assert menu.items == {'Pad Thai': '$9.50'}
@@ -0,0 +1,109 @@
+import sqlite3
+import pytest
+from conftest import make_restaurant
+from restaurant import Menu
+from prices import PriceIndex, format_amount, parse_price
+from storage import SQLiteStorage, open_storage
+
+FILTERS = [
+    {}, {'cuisine': 'Thai'}, {'cuisine': 'Italian'}, {'cuisine': 'French'},
+    {'menu': ('Thai Garden', 'Lunch')}, {'menu': ('Thai Garden', 'Lunch'), 'cuisine': 'Italian'},
+    {'item': 'pad thai'}, {'item': 'Pad Thai', 'cuisine': 'Thai'}, {'item': 'Pizza', 'menu': ('Pizza Palace', 'Lunch')},
+    ]
+
+
+@pytest.fixture
+def storage(database):
+    storage = open_storage(database)
+    yield storage
+    storage.close()
+
+
+def fill(storage):
+    storage.save_many([
+        make_restaurant('Thai Garden', ['9, 0']),
+        make_restaurant('Thai Town', ['8, 0'], menus=[
+            Menu('Lunch', {'Pad Thai': '$8', 'Curry': 'small $7 large $11'}),
+            Menu('Dinner', {'Pad Thai': '$12.50', 'Tea': 'ask'}),
+            ]),
+        make_restaurant('Pizza Palace', ['10, 2'], cuisine='Italian', menus=[
+            Menu('Lunch', {'Pizza': '6 inches $5 9 inches $7.25', 'Pad Thai': '$9.50'}),
+            ]),
+        ])
+    return None
+
+
+def expected(storage, filters):
+    """the stats a fresh in-memory index gives for the stored restaurants"""
+    index = PriceIndex()
+    index.add_many(storage.values())
+    return index.price_stats(**filters)
+
+
+def test_parse_price():
+    assert parse_price('$12.99') == [('', 1299)]
+    assert parse_price('$4.5') == [('', 450)]
+    assert parse_price('6 inches $50   9 inches $70') == [('6 inches', 5000), ('9 inches', 7000)]
+    assert parse_price('market price') == []
+    assert format_amount(1205) == '$12.05'
+
+
+def test_price_index():
+    index = PriceIndex()
+    index.add(make_restaurant('Thai Garden', ['9, 0']))
+    index.add(make_restaurant('Pizza Palace', ['10, 2'], cuisine='Italian', menus=[
+        Menu('Lunch', {'Pizza': '6 inches $5 9 inches $7.25'}),
+        ]))
+    assert len(index) == 4 and 'Pizza Palace' in index
+    assert index.price_stats() == {'count': 4, 'min': 400, 'median': 500, 'max': 950}
+    assert [entry[0] for entry in index.price_range(500, 800)] == [500, 725]
+    assert index.price_stats(menu=('Pizza Palace', 'Lunch'), item='pizza')['count'] == 2
+    index.remove('Pizza Palace')
+    assert index.price_stats(cuisine='Italian')['count'] == 0
+    assert index.price_stats() == {'count': 2, 'min': 400, 'median': 400, 'max': 950}
+
+
+def test_price_stats_follow_every_write(storage):
+    fill(storage)
+    for filters in FILTERS:
+        assert storage.price_stats(**filters) == expected(storage, filters), filters
+    storage.add_menu_items([('Pizza Palace', 'Dinner', 'Pad Thai', '$20'), ('Thai Garden', 'Lunch', 'Tea', '$1')])
+    storage.remove_menu_items([('Thai Town', 'Lunch', 'Curry')])
+    storage.save(make_restaurant('Thai Palace', ['8, 0'], cuisine='Italian'), old_name='Thai Town')
+    storage.save_many([make_restaurant('Thai Garden', ['9, 0'], cuisine='French', menus=[])], keep_menus=True)
+    storage.delete('Pizza Palace')
+    for filters in FILTERS:
+        assert storage.price_stats(**filters) == expected(storage, filters), filters
+
+
+def count_rows(connection):
+    return sorted(connection.execute('SELECT * FROM price_counts')), sorted(
+        connection.execute('SELECT * FROM price_totals'))
+
+
+def test_sqlite_price_counts_match_a_recount(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / 'r.sqlite3'))
+    fill(storage)
+    storage.save_many([make_restaurant('Thai Town', ['8, 0'], cuisine='Italian', menus=[])], keep_menus=True)
+    storage.remove_menu_items([('Thai Garden', 'Lunch', 'Pad Thai')])
+    storage.delete('Pizza Palace')
+    counted = count_rows(storage.connection)
+    storage.rebuild_price_counts()
+    assert count_rows(storage.connection) == counted
+    # no count is left at zero
+    assert all(row[-1] > 0 for rows in counted for row in rows)
+    storage.close()
+
+
+def test_sqlite_counts_a_database_without_them(tmp_path):
+    path = str(tmp_path / 'r.sqlite3')
+    storage = SQLiteStorage(path)
+    fill(storage)
+    stats = storage.price_stats(cuisine='Thai')
+    storage.close()
+    with sqlite3.connect(path) as connection:
+        connection.execute('DELETE FROM price_counts')
+        connection.execute('DELETE FROM price_totals')
+    storage = SQLiteStorage(path)
+    assert storage.price_stats(cuisine='Thai') == stats
+    storage.close()
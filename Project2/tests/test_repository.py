@@ -0,0 +1,77 @@
+import pytest
+from storage import ConflictError
+from conftest import make_restaurant
+from repository import RestaurantRepository
+from restaurant import Menu
+
+
+def test_get_reads_the_storage_once(repository):
+    repository.save(make_restaurant('Fiery Wok', ['1, 1']))
+    repository.invalidate()
+    first = repository.get('Fiery Wok')
+    assert repository.get('Fiery Wok') is first
+    assert repository.stats() == {'hits': 1, 'misses': 1, 'cached': 1}
+
+
+def test_save_replaces_old_name(repository):
+    repository.save(make_restaurant('Fiery Wok', ['1, 1']))
+    repository.save(make_restaurant('Fiery Wok II', ['1, 1']), old_name='Fiery Wok')
+    assert 'Fiery Wok' not in repository
+    assert repository.get('Fiery Wok II').address == ['1, 1']
+    assert [r.name for r in repository.values()] == ['Fiery Wok II']
+
+
+def test_get_for_update_skips_the_cache(repository):
+    repository.save(make_restaurant('Fiery Wok', ['1, 1']))
+    cached = repository.get('Fiery Wok')
+    version, restaurant = repository.get_for_update('Fiery Wok')
+    assert version == repository.version()
+    assert restaurant is not cached
+    assert restaurant == cached
+
+
+def test_values_are_cached_until_invalidated(repository):
+    repository.save_many([make_restaurant(f'R{i}', [f'{i}, 0']) for i in range(3)])
+    assert sorted(r.name for r in repository.values()) == ['R0', 'R1', 'R2']
+    assert repository.complete
+    repository.invalidate('R1')
+    assert not repository.complete
+    assert len(repository.values()) == 3
+
+
+def test_delete(repository):
+    repository.save(make_restaurant('Fiery Wok', ['1, 1']))
+    repository.delete('Fiery Wok')
+    assert 'Fiery Wok' not in repository
+    assert repository.find_by_address('1, 1') is None
+
+
+def test_delete_address_of_a_franchise_keeps_the_others(repository):
+    repository.save(make_restaurant('Fiery Wok', ['1, 1', '2, 2']))
+    assert repository.delete_address('1, 1') == 'Fiery Wok'
+    assert repository.get('Fiery Wok').address == ['2, 2']
+    assert repository.find_by_address('1, 1') is None
+    assert repository.delete_address('1, 1') is None
+
+
+def test_delete_address_checks_the_name(repository):
+    repository.save(make_restaurant('Fiery Wok', ['1, 1']))
+    repository.save(make_restaurant('Thai Garden', ['2, 2']))
+    with pytest.raises(ConflictError):
+        repository.delete_address('1, 1', 'Thai Garden')
+    with pytest.raises(ConflictError):
+        repository.delete_address('1, 1', 'Gone')
+    assert 'Fiery Wok' in repository and 'Thai Garden' in repository
+    assert repository.delete_address('1, 1', 'Fiery Wok') == 'Fiery Wok'
+    assert 'Fiery Wok' not in repository
+
+
+def test_item_search_follows_writes_of_other_clients(database, repository):
+    repository.save(make_restaurant('Fiery Wok', ['1, 1'], menus=[Menu('Dinner', {'Kung Pao': '$12'})]))
+    assert repository.item_search('kung') == {'Fiery Wok'}
+    other = RestaurantRepository(database)
+    other.save(make_restaurant('Thai Garden', ['2, 2'], menus=[Menu('Lunch', {'Kung Pao Noodles': '$9'})]))
+    other.delete('Fiery Wok')
+    other.close()
+    assert repository.item_search('kung') == {'Thai Garden'}
+    assert repository.item_search('pad thai') == set()
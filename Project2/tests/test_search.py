@@ -0,0 +1,54 @@
+from search import ItemIndex, NGramIndex
+
+
+def build():
+    index = NGramIndex()
+    index.add('wok', 'Fiery Wok', 'Chinese')
+    index.add('pizza', 'Pizza Palace', 'Italian')
+    index.add('thai', 'Thai Garden', 'Thai')
+    return index
+
+
+def test_search_ignores_case_and_matches_any_field():
+    index = build()
+    assert index.search('WOK') == {'wok'}
+    assert index.search('ital') == {'pizza'}
+    assert index.search('a') == {'pizza', 'thai'}
+    assert index.search('') == {'wok', 'pizza', 'thai'}
+
+
+def test_long_query_and_refined_query():
+    index = build()
+    assert index.search('pizza pal') == {'pizza'}
+    assert index.search('pizza pala') == {'pizza'}
+    assert index.search('pizza palx') == set()
+
+
+def test_query_does_not_span_fields():
+    index = build()
+    assert index.search('wokchinese') == set()
+    assert index.search('wok chinese') == set()
+
+
+def test_add_again_and_remove():
+    index = build()
+    index.add('wok', 'Calm Wok', 'Chinese')
+    assert index.search('fiery') == set()
+    assert index.search('calm') == {'wok'}
+    index.remove('wok')
+    assert index.search('wok') == set()
+    assert 'wok' not in index and len(index) == 2
+
+
+def test_item_index_shares_items_between_restaurants():
+    index = ItemIndex()
+    index.add('Fiery Wok', ['Fried Rice', 'Kung Pao'])
+    index.add('Thai Garden', ['Fried Rice', 'Pad Thai'])
+    assert index.search('fried') == {'Fiery Wok', 'Thai Garden'}
+    assert index.search('pao') == {'Fiery Wok'}
+    index.add('Fiery Wok', ['Wonton Soup'])
+    assert index.search('fried') == {'Thai Garden'}
+    index.remove('Thai Garden')
+    assert index.search('fried') == set()
+    assert 'Fried Rice' not in index.restaurants and len(index) == 1
+    index.remove('Nowhere')
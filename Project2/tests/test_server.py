@@ -0,0 +1,88 @@
+import asyncio
+import pytest
+from conftest import make_restaurant
+from server import MAX_RESULTS, HTTPError, RestaurantServer, nearest, search
+
+
+@pytest.fixture
+def server(database):
+    from repository import RestaurantRepository
+    repository = RestaurantRepository(database)
+    repository.save_many([make_restaurant(f'Place {i}', [f'{i}, {i}']) for i in range(MAX_RESULTS + 5)])
+    repository.close()
+    server = RestaurantServer(database, workers=1)
+    yield server
+    server.close()
+
+
+def respond(server, target):
+    try:
+        return asyncio.run(server.respond('GET', target))
+    except HTTPError as error:
+        return error.status, str(error)
+
+
+def test_nearest_checks_k(server):
+    status, rows = respond(server, '/nearest?x=0&y=0&k=2')
+    assert status == 200 and [row['name'] for row in rows] == ['Place 0', 'Place 1']
+    assert respond(server, '/nearest?x=0&y=0&k=0') == (400, 'k must be at least 1')
+    assert respond(server, '/nearest?x=0&y=0&k=-3')[0] == 400
+    assert respond(server, '/nearest?x=0&y=0&k=many')[0] == 400
+    assert respond(server, '/nearest?x=0')[0] == 400
+    assert len(respond(server, '/nearest?x=0&y=0&k=100000')[1]) == MAX_RESULTS
+
+
+def test_search_limit(server):
+    assert respond(server, '/search?q=place&limit=3')[1] == ['Place 0', 'Place 1', 'Place 10']
+    assert len(respond(server, '/search?q=place')[1]) == MAX_RESULTS
+    assert len(respond(server, '/search?q=place&limit=100000')[1]) == MAX_RESULTS
+    assert respond(server, '/search?q=place&limit=0')[0] == 400
+
+
+def test_endpoints_on_a_repository(repository):
+    repository.save(make_restaurant('Thai Garden', ['9, 0']))
+    assert search(repository, {'q': 'garden'}) == ['Thai Garden']
+    assert nearest(repository, {'x': '9', 'y': '0'}) == [
+        {'distance': 0, 'name': 'Thai Garden', 'address': '9, 0'}
+        ]
+    with pytest.raises(HTTPError):
+        nearest(repository, {'x': '9', 'y': '0', 'k': '0'})
+
+
+def test_unknown_paths(server):
+    assert respond(server, '/restaurants/Nope')[0] == 404
+    assert respond(server, '/nothing')[0] == 404
+    assert asyncio.run(server.respond('GET', '/restaurants/Place 1'))[1]['menus'] == ['Lunch']
+
+
+def test_writes_of_other_programs_are_served(server, database):
+    from repository import RestaurantRepository
+    assert respond(server, '/restaurants/Place 1')[1]['cuisine'] == 'Thai'
+    other = RestaurantRepository(database)
+    other.save(make_restaurant('Place 1', ['1, 1'], cuisine='Changed', menus=[]))
+    other.close()
+    assert respond(server, '/restaurants/Place 1')[1]['cuisine'] == 'Changed'
+    assert respond(server, '/restaurants/Place 1/menus')[1] == []
+    # the pooled handles cache nothing
+    assert all(not repository.cache for repository in server.pool.repositories.queue)
+
+
+def test_loadgen_spreads_every_request(server, monkeypatch):
+    import loadgen
+    monkeypatch.setattr(loadgen, 'QUERIES', ('place',))
+
+    async def load(connections, requests):
+        listener = await asyncio.start_server(server.handle, '127.0.0.1', 0)
+        port = listener.sockets[0].getsockname()[1]
+        try:
+            return await loadgen.run('127.0.0.1', port, connections, requests)
+        finally:
+            listener.close()
+
+    results = asyncio.run(load(4, 10))
+    assert results['requests'] == 10 and results['p50_ms'] is not None
+    # fewer requests than kiosks leaves some kiosks idle, none is dropped
+    assert asyncio.run(load(4, 3))['requests'] == 3
+    results = asyncio.run(load(2, 0))
+    assert results['requests'] == 0 and results['p99_ms'] is None
+    assert loadgen.format_ms(results['p99_ms']) == 'n/a' and loadgen.format_ms(1.25) == '1.2 ms'
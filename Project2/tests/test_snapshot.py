@@ -0,0 +1,94 @@
+import math
+import pytest
+from conftest import make_restaurant
+from catalog import RestaurantCatalog
+from hours import minute_of_week
+from snapshot import export, open_snapshot, snapshot_path
+
+
+@pytest.fixture
+def snapshot(repository, tmp_path):
+    repository.save_many([
+        make_restaurant('Fiery Wok', ['1, 1'], cuisine='Chinese'),
+        make_restaurant('pizza palace', ['10, 2', '3, 30'], cuisine='Italian', hours={'friday': ['5:00PM', '11:00PM']}),
+        make_restaurant('Thai Garden', ['9, 0'], hours={'sunday': ['10:00PM', '2:00AM']}),
+        make_restaurant('Closed', [], cuisine='Gone'),
+        ])
+    path = snapshot_path(str(tmp_path / 'restaurants'))
+    assert export(repository, path) == repository.version()
+    snapshot = open_snapshot(path)
+    yield snapshot
+    snapshot.close()
+
+
+def names(catalog):
+    return [catalog.text(key, 0) for key in catalog.view]
+
+
+def test_rows_and_lookups(snapshot):
+    assert len(snapshot) == 4
+    rows = [snapshot.row(key) for key in range(len(snapshot))]
+    assert ['pizza palace', 'Italian', '3, 30', 'Lunch'] in rows
+    palace = snapshot.find('pizza palace')
+    assert [snapshot.text(key, 2) for key in snapshot.rows_of(palace)] == ['10, 2', '3, 30']
+    assert snapshot.find('Closed') is None and snapshot.find('nope') is None
+    assert {snapshot.name(r) for r in snapshot.search('garden')} == {'Thai Garden'}
+    # the menu items are searched too
+    assert {snapshot.name(r) for r in snapshot.search('SPRING ROLL')} == {'Fiery Wok', 'pizza palace', 'Thai Garden'}
+    assert {snapshot.name(r) for r in snapshot.search('PIZZA PAL')} == {'pizza palace'}
+
+
+def test_hours(snapshot):
+    late = snapshot.open_at(minute_of_week('monday', '1:00AM'))
+    assert {snapshot.name(r) for r in late} == {'Thai Garden'}
+    closing = snapshot.closing_within(minute_of_week('friday', '10:45PM'), 30)
+    assert {snapshot.name(r) for r in closing} == {'pizza palace'}
+
+
+def test_nearest_matches_a_scan(snapshot):
+    for x, y in ((0, 0), (9, 1), (100, -40), (3, 29)):
+        scan = sorted((math.hypot(px - x, py - y), key)
+                      for key, (px, py) in enumerate(zip(snapshot.xs, snapshot.ys)))
+        assert snapshot.nearest(x, y, 3) == scan[:3]
+        assert snapshot.distances(x, y) == [round(d, 2) for d, _ in sorted(scan, key=lambda row: row[1])]
+    nearest = snapshot.nearest(9, 0, 1)[0][1]
+    assert snapshot.nearest(9, 0, 1, hidden={nearest})[0][1] != nearest
+
+
+def test_bad_files_are_not_opened(tmp_path):
+    assert open_snapshot(None) is None
+    assert open_snapshot(str(tmp_path / 'missing')) is None
+    (tmp_path / 'garbage').write_bytes(b'not a snapshot' * 100)
+    assert open_snapshot(str(tmp_path / 'garbage')) is None
+
+
+def test_catalog_on_a_snapshot_follows_the_changes(repository, snapshot):
+    catalog = RestaurantCatalog(repository, snapshot)
+    catalog.load()
+    assert sorted(names(catalog)) == ['Fiery Wok', 'Thai Garden', 'pizza palace', 'pizza palace']
+    repository.delete('Fiery Wok')
+    repository.save(make_restaurant('Thai Garden', ['9, 1'], cuisine='Lao'), old_name='Thai Garden')
+    repository.save(make_restaurant('Green Curry', ['5, 5']))
+    assert catalog.apply_changes() == 3
+    plain = RestaurantCatalog(repository)
+    plain.load()
+    for column in (0, 1, 2, 3, 0):
+        catalog.sort(column)
+        plain.sort(column)
+        assert [catalog.row(i) for i in range(len(catalog))] == [plain.row(i) for i in range(len(plain))]
+    catalog.search('lao')
+    assert names(catalog) == ['Thai Garden']
+
+
+def test_catalog_on_a_snapshot_searches_items_without_an_item_index(repository, snapshot):
+    from restaurant import Menu
+    catalog = RestaurantCatalog(repository, snapshot)
+    catalog.load()
+    repository.save(make_restaurant('Green Curry', ['5, 5'], menus=[Menu('Dinner', {'Larb': '$8'})]))
+    repository.save(make_restaurant('Fiery Wok', ['1, 1'], cuisine='Chinese', menus=[]), old_name='Fiery Wok')
+    catalog.apply_changes()
+    catalog.search('larb')
+    assert names(catalog) == ['Green Curry']
+    catalog.search('roll')
+    assert sorted(names(catalog)) == ['Thai Garden', 'pizza palace', 'pizza palace']
+    assert repository.item_index is None
@@ -0,0 +1,52 @@
+import math
+import random
+from spatial import GridIndex, parse_address
+
+
+def brute_nearest(points, x, y, k):
+    return sorted((math.hypot(px - x, py - y), key) for key, (px, py) in points.items())[:k]
+
+
+def test_parse_address():
+    assert parse_address('3, -4') == (3, -4)
+
+
+def test_nearest_matches_a_scan():
+    rng = random.Random(7)
+    index = GridIndex(cell_size=5)
+    points = {}
+    for key in range(300):
+        points[key] = (rng.randint(-100, 100), rng.randint(-100, 100))
+        index.insert(key, *points[key])
+    for _ in range(50):
+        x, y = rng.uniform(-150, 150), rng.uniform(-150, 150)
+        for k in (1, 5, 20):
+            assert [d for d, _ in index.nearest(x, y, k)] == [d for d, _ in brute_nearest(points, x, y, k)]
+
+
+def test_nearest_edge_cases():
+    index = GridIndex()
+    assert index.nearest(0, 0) == []
+    index.insert('a', 1, 1)
+    assert index.nearest(0, 0, 0) == []
+    assert index.nearest(0, 0, 5) == [(math.hypot(1, 1), 'a')]
+
+
+def test_insert_again_moves_and_remove_forgets():
+    index = GridIndex()
+    index.insert('a', 1, 1)
+    index.insert('a', 50, 50)
+    assert len(index) == 1
+    assert index.location('a') == (50, 50)
+    assert index.within_box(0, 0, 10, 10) == []
+    index.remove('a')
+    assert 'a' not in index
+    assert index.cells == {}
+
+
+def test_box_and_radius_include_edges():
+    index = GridIndex(cell_size=10)
+    for key, point in {'a': (0, 0), 'b': (10, 0), 'c': (11, 0), 'd': (-3, 4)}.items():
+        index.insert(key, *point)
+    assert sorted(index.within_box(10, 0, 0, 0)) == ['a', 'b']
+    assert index.within_radius(0, 0, 5) == [(0.0, 'a'), (5.0, 'd')]
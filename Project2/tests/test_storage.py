@@ -0,0 +1,148 @@
+import shelve
+import sqlite3
+import pytest
+from conftest import make_restaurant
+from restaurant import Menu
+from storage import AddressTakenError, ShelveStorage, SQLiteStorage, open_storage
+from migrate import migrate
+
+
+@pytest.fixture
+def storage(database):
+    storage = open_storage(database)
+    yield storage
+    storage.close()
+
+
+def fill(storage):
+    storage.save_many([
+        make_restaurant('Fiery Wok', ['1, 1'], cuisine='Chinese', menus=[Menu('Dinner', {'Kung Pao': '$12'})]),
+        make_restaurant('Pizza Palace', ['10, 2', '3, 30'], cuisine='Italian'),
+        make_restaurant('Thai Garden', ['9, 0'], hours={'sunday': ['10:00PM', '2:00AM']}),
+        ])
+    return None
+
+
+def test_open_storage_picks_the_backend(tmp_path):
+    assert isinstance(open_storage(str(tmp_path / 'r')), ShelveStorage)
+    sqlite = open_storage(str(tmp_path / 'r.sqlite3'))
+    assert isinstance(sqlite, SQLiteStorage)
+    sqlite.close()
+
+
+def test_round_trip(storage):
+    restaurant = make_restaurant('Fiery Wok', ['1, 1', '2, 2'], hours={'monday': ['Closed', 'Closed']})
+    storage.save(restaurant)
+    assert 'Fiery Wok' in storage and 'Nope' not in storage
+    assert storage.get('Fiery Wok') == restaurant
+    assert storage.values() == [restaurant]
+    assert storage.summaries() == [restaurant.summary()]
+    with pytest.raises(KeyError):
+        storage.get('Nope')
+
+
+def test_queries(storage):
+    fill(storage)
+    assert storage.search('kung') == ['Fiery Wok']
+    assert storage.search('GARDEN') == ['Thai Garden']
+    assert storage.search('_') == []
+    assert [(round(d, 3), name) for d, name, _ in storage.nearest(9, 1, 2)] == [(1.0, 'Thai Garden'), (1.414, 'Pizza Palace')]
+    assert storage.nearest(0, 0, 0) == []
+    # sunday 10PM to monday 2AM wraps around the week
+    assert storage.open_at(60) == ['Thai Garden']
+    assert storage.open_at(12 * 60) == ['Fiery Wok', 'Pizza Palace']
+
+
+def test_delete(storage):
+    fill(storage)
+    storage.delete('Fiery Wok')
+    assert 'Fiery Wok' not in storage
+    assert storage.find_by_address('1, 1') is None
+    with pytest.raises(KeyError):
+        storage.delete('Fiery Wok')
+
+
+def test_address_index(storage):
+    fill(storage)
+    assert storage.find_by_address('3, 30') == 'Pizza Palace'
+    storage.rebuild_address_index()
+    assert storage.find_by_address('10, 2') == 'Pizza Palace'
+    assert storage.find_by_address('5, 5') is None
+
+
+def test_migrate(tmp_path):
+    source = ShelveStorage(str(tmp_path / 'restaurants'))
+    fill(source)
+    assert migrate(source.database, str(tmp_path / 'r.sqlite3')) == 3
+    target = SQLiteStorage(str(tmp_path / 'r.sqlite3'))
+    assert sorted(r.name for r in target.values()) == ['Fiery Wok', 'Pizza Palace', 'Thai Garden']
+    assert target.get('Fiery Wok') == source.get('Fiery Wok')
+    target.close()
+
+
+def test_save_many_rejects_taken_addresses(storage):
+    fill(storage)
+    version = storage.version()
+    with pytest.raises(AddressTakenError) as error:
+        storage.save_many([make_restaurant('New Place', ['5, 5']), make_restaurant('Copy Wok', ['1, 1'])])
+    assert (error.value.name, error.value.owner) == ('Copy Wok', 'Fiery Wok')
+    # nothing of the batch is written
+    assert 'New Place' not in storage and storage.version() == version
+    # nor are two restaurants of one batch at the same address
+    with pytest.raises(AddressTakenError):
+        storage.save_many([make_restaurant('A', ['5, 5']), make_restaurant('B', ['6, 6', '5, 5'])])
+    assert storage.find_by_address('5, 5') is None
+
+
+def test_save_many_checks_in_order(storage):
+    fill(storage)
+    # an address given up earlier in the batch is free for the restaurants after it
+    storage.save_many([make_restaurant('Fiery Wok', ['7, 7']), make_restaurant('New Wok', ['1, 1'])])
+    assert storage.find_by_address('1, 1') == 'New Wok'
+    # a restaurant keeps its own addresses when saved again
+    storage.save_many([make_restaurant('Pizza Palace', ['3, 30', '10, 2'], cuisine='Italian')], keep_menus=True)
+    assert storage.find_by_address('10, 2') == 'Pizza Palace'
+
+
+def test_save_many_reports_taken_addresses(storage):
+    fill(storage)
+    errors = []
+    count = storage.save_many([
+        make_restaurant('A', ['5, 5']), make_restaurant('B', ['5, 5']), make_restaurant('C', ['9, 0']),
+        make_restaurant('D', ['6, 6']),
+        ], errors=errors)
+    assert count == 2
+    assert [(error.name, error.address, error.owner) for error in errors] == [
+        ('B', '5, 5', 'A'), ('C', '9, 0', 'Thai Garden')
+        ]
+    assert storage.find_by_address('5, 5') == 'A' and storage.find_by_address('9, 0') == 'Thai Garden'
+    assert 'B' not in storage and 'D' in storage
+
+
+def test_migrate_reports_taken_addresses(tmp_path):
+    source = ShelveStorage(str(tmp_path / 'restaurants'))
+    fill(source)
+    # a legacy shelve may hold two restaurants at one address, written before the index
+    with shelve.open(source.database) as db:
+        db['Wok Two'] = make_restaurant('Wok Two', ['1, 1'])
+    errors = []
+    assert migrate(source.database, str(tmp_path / 'r.sqlite3'), errors) == 3
+    assert [(error.name, error.owner) for error in errors] == [('Wok Two', 'Fiery Wok')]
+    with pytest.raises(AddressTakenError):
+        migrate(source.database, str(tmp_path / 'other.sqlite3'))
+
+
+def test_sqlite_rejects_taken_addresses_itself(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / 'r.sqlite3'))
+    fill(storage)
+    storage.save(make_restaurant('Twice', ['4, 4', '4, 4']))
+    id, = storage.connection.execute("SELECT id FROM restaurants WHERE name = 'Twice'").fetchone()
+    # a write that skips the checks is still refused by the database
+    with pytest.raises(sqlite3.IntegrityError):
+        with storage.connection:
+            storage.connection.execute(
+                "INSERT INTO addresses VALUES (?, 2, '1, 1', 1, 1)", (id,)
+                )
+    assert storage.find_by_address('1, 1') == 'Fiery Wok'
+    assert storage.get('Twice').address == ['4, 4', '4, 4']
+    storage.close()
@@ -0,0 +1,28 @@
+import pytest
+from synthetic import generate, write
+
+
+def test_same_seed_same_catalog():
+    assert list(generate(seed=3, restaurants=50)) == list(generate(seed=3, restaurants=50))
+    assert list(generate(seed=3, restaurants=50)) != list(generate(seed=4, restaurants=50))
+
+
+def test_totals_and_unique_names_and_addresses():
+    restaurants = list(generate(seed=1, restaurants=200, locations=260, menus=500, items=3000))
+    addresses = [address for r in restaurants for address in r.address]
+    assert len(restaurants) == 200
+    assert len(addresses) == len(set(addresses)) == 260
+    assert len({r.name for r in restaurants}) == 200
+    assert sum(len(r.menus) for r in restaurants) == 500
+    assert sum(len(menu.items) for r in restaurants for menu in r.menus) == 3000
+    assert all(r.isfranchise for r in restaurants if len(r.address) > 1)
+
+
+def test_impossible_counts():
+    with pytest.raises(ValueError):
+        list(generate(restaurants=10, menus=5))
+
+
+def test_write_in_batches(repository):
+    assert write(repository, generate(seed=2, restaurants=30), batch_size=7) == 30
+    assert len(repository.summaries()) == 30
@@ -0,0 +1,86 @@
+import threading
+from worker import QueryWorker
+
+
+def run(worker, task):
+    done = threading.Event()
+    results = []
+    generation = worker.submit(task, lambda g, result: (results.append((g, result)), done.set()))
+    return generation, results, done
+
+
+def test_result_is_delivered_with_its_generation():
+    worker = QueryWorker(delay=0)
+    generation, results, done = run(worker, lambda cancelled: 42)
+    assert done.wait(5)
+    assert results == [(generation, 42)]
+    worker.shutdown()
+
+
+def test_newer_request_cancels_an_older_one():
+    worker = QueryWorker(delay=0.05)
+    _, first, _ = run(worker, lambda cancelled: 'old')
+    generation, second, done = run(worker, lambda cancelled: 'new')
+    assert done.wait(5)
+    assert first == [] and second == [(generation, 'new')]
+    worker.shutdown()
+
+
+def test_separate_workers_do_not_cancel_each_other():
+    loader, views = QueryWorker(delay=0), QueryWorker(delay=0)
+    started = threading.Event()
+    release = threading.Event()
+
+    def load(cancelled):
+        started.set()
+        release.wait(5)
+        return 'catalog'
+
+    generation, loaded, done = run(loader, load)
+    assert started.wait(5)
+    views.submit(lambda cancelled: 'view', lambda g, result: None)
+    views.cancel()
+    release.set()
+    assert done.wait(5)
+    assert loaded == [(generation, 'catalog')]
+    loader.shutdown()
+    views.shutdown()
+
+
+def test_cancel_reaches_a_running_task():
+    worker = QueryWorker(delay=0)
+    started = threading.Event()
+    seen = []
+
+    def task(cancelled):
+        started.set()
+        while not cancelled():
+            pass
+        seen.append('stopped')
+
+    _, results, _ = run(worker, task)
+    assert started.wait(5)
+    worker.cancel()
+    worker.shutdown()
+    worker.executor.shutdown(wait=True)
+    assert seen == ['stopped'] and results == []
+
+
+def test_errors_are_reported(capsys):
+    done = threading.Event()
+    errors = []
+
+    def fail(cancelled):
+        raise RuntimeError('no database')
+
+    worker = QueryWorker(delay=0, error=lambda g, error: (errors.append((g, error)), done.set()))
+    generation, results, _ = run(worker, fail)
+    assert done.wait(5)
+    assert results == [] and [(g, str(error)) for g, error in errors] == [(generation, 'no database')]
+    worker.shutdown()
+    # without an error callback the traceback is printed
+    worker = QueryWorker(delay=0)
+    run(worker, fail)
+    worker.timer.join(5)
+    worker.executor.shutdown(wait=True)
+    assert 'RuntimeError: no database' in capsys.readouterr().err
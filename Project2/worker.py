@@ -0,0 +1,87 @@
+"""
+This module contains a background worker for catalog queries.
+
+Requests are debounced: a request only starts after no newer request has
+been submitted for the debounce delay. Every request gets a generation
+number, submitting a new request cancels all older ones, and a task can
+poll the cancelled callable it is given to stop early. Results are passed
+to the callback together with their generation, so the GUI can drop a
+result that went stale while it was waiting for the main thread. A task
+or callback that raises is passed to the error callback the same way, or
+its traceback is printed, the executor would otherwise keep it silently.
+
+Written by Wenbin Wu
+"""
+
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueryWorker:
+    """debounced, cancellable background runner, the newest request wins"""
+    def __init__(self, delay=0.15, error=None):
+        self.delay = delay  # seconds to wait for more keystrokes before starting
+        self.error = error  # called with (generation, exception) when a request fails
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.generation = 0
+        self.timer = None
+        self.lock = threading.Lock()
+
+    def submit(self, task, callback, delay=None):
+        """
+        run task(cancelled) in the background and pass (generation, result) to
+        callback, return the generation number of the request
+        """
+        delay = self.delay if delay is None else delay
+        with self.lock:
+            self.generation += 1
+            generation = self.generation
+            if self.timer is not None:
+                self.timer.cancel()
+            self.timer = threading.Timer(delay, self.start, (generation, task, callback))
+            self.timer.daemon = True
+            self.timer.start()
+        return generation
+
+    def start(self, generation, task, callback):
+        """hand a debounced request to the executor if it is still the newest"""
+        if not self.cancelled(generation):
+            self.executor.submit(self.run, generation, task, callback)
+        return None
+
+    def run(self, generation, task, callback):
+        """run a request on the executor thread"""
+        if self.cancelled(generation):
+            return None
+        try:
+            result = task(lambda: self.cancelled(generation))
+            if not self.cancelled(generation):
+                callback(generation, result)
+        except Exception as error:
+            # a request that was cancelled meanwhile has nobody left to tell
+            if self.cancelled(generation):
+                return None
+            if self.error is None:
+                traceback.print_exc()
+            else:
+                self.error(generation, error)
+        return None
+
+    def cancelled(self, generation):
+        """return True if a newer request was submitted after generation"""
+        return generation != self.generation
+
+    def cancel(self):
+        """cancel every pending and running request"""
+        with self.lock:
+            self.generation += 1
+            if self.timer is not None:
+                self.timer.cancel()
+        return None
+
+    def shutdown(self):
+        """cancel outstanding requests and stop the executor thread"""
+        self.cancel()
+        self.executor.shutdown(wait=False)
+        return None
@@ -0,0 +1,109 @@
+"""
+headless benchmark:
+times the dot matrix encoding and the styling of the message board without
+a display, at messages of 10 / 1k / 100k / 1m characters.
+
+usage: python benchmark.py [-s SCALES] [-o OUTPUT] [-c PREVIOUS] [-t THRESHOLD]
+
+The results are written as JSON. With a previous results file every time
+that got slower by more than the threshold is flagged as a regression and
+the exit status is 1. The styling can not call wx here, so it is timed up to
+the SetStyle calls and the number of calls is recorded next to the times.
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+from alphabet import encodings
+from dotmatrix import encode_message, style_runs, LIT
+
+SCALES = {'10': 10, '1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+
+
+def timed(function, *args, repeat=3):
+    """return (best time in seconds, result) of calling function repeat times"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def character_styles(encoded_msg):
+    """the original styling loop, one (start, end, lit) style call per character"""
+    return [(i, i + 1, letter == LIT) for i, letter in enumerate(encoded_msg)]
+
+
+def run(scales, seed=0):
+    """run the benchmarks at each scale, return (times, counts) dicts keyed by scale"""
+    rng = random.Random(seed)
+    letters = sorted(encodings)
+    times, counts = {}, {}
+    for scale in scales:
+        message = ''.join(rng.choices(letters, k=SCALES[scale]))
+        repeat = 3 if SCALES[scale] <= 100_000 else 1
+        times[scale], counts[scale] = {}, {}
+        seconds, encoded_msg = timed(encode_message, message, repeat=repeat)
+        times[scale]['encode_message'] = seconds
+        seconds, runs = timed(style_runs, encoded_msg, repeat=repeat)
+        times[scale]['display_msg_styles'] = seconds
+        seconds, styles = timed(character_styles, encoded_msg, repeat=repeat)
+        times[scale]['display_msg_styles_per_character'] = seconds
+        counts[scale]['set_style_calls'] = len(runs)
+        counts[scale]['set_style_calls_per_character'] = len(styles)
+    return times, counts
+
+
+def compare(previous, current, threshold):
+    """return a message for every time in current that is slower than previous by more than threshold"""
+    regressions = []
+    for scale, results in current['results'].items():
+        for name, seconds in results.items():
+            old = previous['results'].get(scale, {}).get(name)
+            if old and seconds > old * (1 + threshold):
+                regressions.append(f'{scale} {name}: {old:.6f}s -> {seconds:.6f}s (+{seconds / old - 1:.0%})')
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the message board without a display.')
+    parser.add_argument('-s', '--scales', default='10,1k,100k', help='comma separated, from 10,1k,100k,1m')
+    parser.add_argument('-o', '--output', default='benchmark.json', help='results file to write')
+    parser.add_argument('-c', '--compare', help='previous results file')
+    parser.add_argument('-t', '--threshold', type=float, default=0.2, help='allowed slowdown, 0.2 is 20%%')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    scales = args.scales.split(',')
+    for scale in scales:
+        if scale not in SCALES:
+            parser.error(f'unknown scale {scale}, use {", ".join(SCALES)}')
+
+    times, counts = run(scales, args.seed)
+    results = {
+        'suite': 'messageboard',
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': times,
+        'counts': counts,
+        }
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=2)
+    for scale in scales:
+        for name, seconds in times[scale].items():
+            print(f'{scale:>5}  {name:<34} {seconds:.6f}s')
+    print(f'results written to {args.output}')
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(json.load(file), results, args.threshold)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
@@ -0,0 +1,37 @@
+"""
+dot matrix text:
+encodes a message into the dot matrix text shown on the message board and
+finds the runs of lit and dark dots to color. Nothing here needs wx, so it
+can be timed and reused without a display.
+"""
+
+import re
+from alphabet import encodings
+
+LIT = '▇'
+DARK = '█'
+RUNS = re.compile(f'{LIT}+|[^{LIT}]+')
+
+# each encoded row of a symbol joined into one string with the empty column after it
+rows = {letter: [''.join(row) + DARK for row in matrix] for letter, matrix in encodings.items()}
+
+
+def encode_message(message):
+    """convert the message into dot matrix encoding text"""
+    symbols = [rows[letter] for letter in message]
+    lines = []
+    for i in range(7):
+        # a single empty column in front of the message, and one after each symbol
+        lines.append(DARK + ''.join(symbol[i] for symbol in symbols) + '\n')
+    return ''.join(lines)
+
+
+def style_runs(encoded_msg):
+    """return (start, end, lit) for each run of characters that share a color"""
+    runs = []
+    start = 0
+    for run in RUNS.findall(encoded_msg):
+        end = start + len(run)
+        runs.append((start, end, run[0] == LIT))
+        start = end
+    return runs
@@ -6,7 +6,7 @@ Wenbin Wu
 """
 
 import wx
-from alphabet import encodings
+from dotmatrix import encode_message, style_runs
 
 
 class MessageBoard(wx.Frame):
@@ -109,17 +109,7 @@ class MessageBoard(wx.Frame):
 
     def encode_message(self, message):
         """convert the message into dot matrix encoding text"""
-        encoding_list = [encodings[letter] for letter in message]
-        encoded_msg = ''
-        for i in range(7):
-            # add a single empty colum in from of the message
-            encoded_msg += '█'
-            for j in encoding_list:
-                encoded_msg += ''.join(j[i])
-                # add a single empty column between each symbol
-                encoded_msg += ('█')
-            encoded_msg += '\n'
-        return encoded_msg
+        return encode_message(message)
 
     def display_msg(self, target_text_ctrl):
         """prints the encoded message to the display"""
@@ -130,12 +120,11 @@ class MessageBoard(wx.Frame):
         target_text_ctrl.Clear()
         target_text_ctrl.WriteText(encoded_msg)
 
-        # change the color of encoded characters to yellow
-        for i in range(len(encoded_msg)):
-            if encoded_msg[i] == '▇':
-                target_text_ctrl.SetStyle(i, i + 1, wx.TextAttr('YELLOW', 'BLACK'))
-            else:
-                target_text_ctrl.SetStyle(i, i + 1, wx.TextAttr('BLACK', 'BLACK'))
+        # change the color of encoded characters to yellow, one style call per run of a color
+        lit_style = wx.TextAttr('YELLOW', 'BLACK')
+        dark_style = wx.TextAttr('BLACK', 'BLACK')
+        for start, end, lit in style_runs(encoded_msg):
+            target_text_ctrl.SetStyle(start, end, lit_style if lit else dark_style)
 
 
 if __name__ == '__main__':